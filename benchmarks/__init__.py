@@ -0,0 +1 @@
+"""Benchmark probes run by the ``benchmark_*`` management commands, kept out of the deployed app."""
@@ -0,0 +1,167 @@
+"""
+Concurrency probe: fires many simultaneous requests at the ASGI application, in
+process, and measures throughput and latency. The Mongo views used (sync DRF or
+async) follow ``MONGO_ASYNC_VIEWS``; ``manage.py benchmark_concurrency`` runs
+the probe once per mode, each in a fresh process:
+
+    MONGO_ASYNC_VIEWS=True python -m benchmarks.concurrency_probe \\
+        --path /api/matches-mongo/ --requests 500 --concurrency 100 --latency 50
+
+``--latency`` routes the Mongo connection through a local TCP proxy that delays
+every packet by half the given round trip in each direction, to reproduce a
+slow network to the database. A ``mongodb+srv://`` URI is resolved first and
+its first host proxied over TLS. The response cache is disabled so every
+request reaches the view.
+
+Prints one JSON object with the results.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import threading
+import time
+
+from dotenv import load_dotenv
+from pymongo.errors import ConfigurationError
+from pymongo.uri_parser import parse_uri
+
+from benchmarks.startup_probe import lifespan_startup, request
+
+
+async def _pipe(reader, writer, delay):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    async def read():
+        try:
+            while data := await reader.read(65536):
+                queue.put_nowait((loop.time() + delay, data))
+        except ConnectionError:
+            pass
+        queue.put_nowait((None, b''))
+
+    async def write():
+        try:
+            while True:
+                due, data = await queue.get()
+                if due is None:
+                    break
+                await asyncio.sleep(max(0.0, due - loop.time()))
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    await asyncio.gather(read(), write())
+
+
+def start_latency_proxy(host, port, latency):
+    """Start a delaying TCP proxy to ``host:port`` in a background thread. Returns its local port."""
+    loop = asyncio.new_event_loop()
+    delay = latency / 2
+
+    async def handle(client_reader, client_writer):
+        try:
+            server_reader, server_writer = await asyncio.open_connection(host, port)
+        except OSError:
+            client_writer.close()
+            return
+        await asyncio.gather(_pipe(client_reader, server_writer, delay), _pipe(server_reader, client_writer, delay))
+
+    server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1]
+
+
+def proxied_uri(uri, latency):
+    """``uri`` pointed at a latency proxy for its first host, as a direct connection."""
+    found = re.match(r'^mongodb(\+srv)?://([^@/]*@)?([^/?]*)(/[^?]*)?(\?.*)?$', uri or '')
+    if not found:
+        raise ValueError('--latency needs a mongodb:// or mongodb+srv:// URI in MONGODB_URI')
+    srv, userinfo, hosts, path, query = (group or '' for group in found.groups())
+    options = ['directConnection=true']
+    if srv:
+        # The SRV and TXT records give the hosts and options such as authSource; SRV implies TLS,
+        # whose certificate names the real host rather than the local proxy.
+        try:
+            parsed = parse_uri(uri)
+        except ConfigurationError as e:
+            raise ValueError(f'Could not resolve {hosts}: {e}')
+        host, port = parsed['nodelist'][0]
+        options += ['tls=true', 'tlsAllowInvalidHostnames=true']
+        if 'authsource' in parsed['options'] and 'authsource=' not in query.lower():
+            options.append(f"authSource={parsed['options']['authsource']}")
+    else:
+        host, _, port = hosts.split(',')[0].partition(':')
+    local_port = start_latency_proxy(host, int(port or 27017), latency)
+    query = f"{query}&{'&'.join(options)}" if query else f"?{'&'.join(options)}"
+    return f'mongodb://{userinfo}127.0.0.1:{local_port}{path or "/"}{query}'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def probe(path, requests, concurrency, warm_up):
+    from django.conf import settings
+    from football_calendar_backend.asgi import application
+
+    # Measure the views, not the response cache.
+    settings.RESPONSE_CACHE = {**getattr(settings, 'RESPONSE_CACHE', {}), 'MAX_ENTRIES': 0, 'BACKEND': None}
+    await lifespan_startup(application)
+    for _ in range(warm_up):
+        await request(application, path)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            status, _ = await request(application, path)
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        'path': path,
+        'async_views': settings.MONGO_ASYNC_VIEWS,
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed,
+        'p50_seconds': statistics.median(latencies),
+        'p95_seconds': percentile(latencies, 0.95),
+        'max_seconds': max(latencies),
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure throughput of the ASGI app under concurrent requests.')
+    parser.add_argument('--path', default='/api/matches-mongo/?page_size=50')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0, help='Added round-trip time to MongoDB, in milliseconds.')
+    parser.add_argument('--warm-up', type=int, default=3, help='Untimed requests sent first.')
+    args = parser.parse_args()
+
+    if args.latency:
+        load_dotenv()
+        os.environ['MONGODB_URI'] = proxied_uri(os.getenv('MONGODB_URI'), args.latency / 1000)
+    result = asyncio.run(probe(args.path, args.requests, args.concurrency, args.warm_up))
+    result['latency_ms'] = args.latency
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
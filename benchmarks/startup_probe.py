@@ -0,0 +1,111 @@
+"""
+Cold-start probe: measures, in a fresh interpreter, how long it takes to import
+the ASGI application and to serve the first requests through it.
+
+Run it in a new process each time (``manage.py benchmark_startup`` does):
+
+    python -m benchmarks.startup_probe --path /api/matches-mongo/ [--lifespan]
+
+Prints one JSON object with the timings in seconds.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+
+async def lifespan_startup(app):
+    """Send lifespan.startup and wait for the answer; the lifespan task is left running."""
+    messages = asyncio.Queue()
+    messages.put_nowait({'type': 'lifespan.startup'})
+    answered = asyncio.Event()
+    answer = {}
+
+    async def send(message):
+        answer.update(message)
+        answered.set()
+
+    task = asyncio.ensure_future(app({'type': 'lifespan', 'asgi': {'version': '3.0'}}, messages.get, send))
+    await answered.wait()
+    return answer['type'], task
+
+
+async def request(app, path):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    done = asyncio.Event()
+    status, size = None, 0
+    first_message = True
+
+    async def receive():
+        nonlocal first_message
+        if first_message:
+            first_message = False
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status, size
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            size += len(message.get('body', b''))
+            if not message.get('more_body'):
+                done.set()
+
+    await app(scope, receive, send)
+    return status, size
+
+
+async def probe(path, lifespan):
+    result = {'path': path}
+
+    started = time.perf_counter()
+    from football_calendar_backend.asgi import application
+    result['import_seconds'] = time.perf_counter() - started
+    result['modules_after_import'] = len(sys.modules)
+
+    if lifespan:
+        started = time.perf_counter()
+        result['lifespan'], _ = await lifespan_startup(application)
+        result['warm_up_seconds'] = time.perf_counter() - started
+
+    for name in ('first_request', 'second_request'):
+        started = time.perf_counter()
+        status, size = await request(application, path)
+        result[f'{name}_seconds'] = time.perf_counter() - started
+        result[f'{name}_status'] = status
+        result[f'{name}_bytes'] = size
+
+    result['modules_after_requests'] = len(sys.modules)
+    result['postgres_driver_loaded'] = any(name in sys.modules for name in ('psycopg2', 'psycopg'))
+    result['orm_views_loaded'] = 'matches_calendar.views' in sys.modules
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start import and first-request latency.')
+    parser.add_argument('--path', default='/api/matches-mongo/')
+    parser.add_argument('--lifespan', action='store_true', help='Run the lifespan warm-up before the first request.')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(probe(args.path, args.lifespan))))
+
+
+if __name__ == '__main__':
+    main()
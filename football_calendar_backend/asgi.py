@@ -11,4 +11,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'football_calendar_backend.settings')
-application = get_asgi_application()
\ No newline at end of file
+# The async Mongo views are opt-in (MONGO_ASYNC_VIEWS=True), whatever the pymongo version.
+django_application = get_asgi_application()
+
+from football_calendar_backend.lifespan import LifespanApplication
+
+# Handles the lifespan protocol (warm-up on startup) around Django's ASGI handler.
+application = LifespanApplication(django_application)
@@ -0,0 +1,93 @@
+"""
+ASGI lifespan support for the Django application.
+
+Django's ASGI handler does not implement the lifespan protocol, so the app is
+wrapped: on startup the URLconf (and with it the Mongo views) is imported and
+the Mongo connection is opened, off the request path; on shutdown the client is
+closed. With the async views the async client is opened and closed too, on the
+server's event loop. Every other scope is passed through to Django unchanged.
+"""
+
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """Import the URLconf and open the Mongo connection. Returns per-step timings."""
+    from django.urls import get_resolver
+    from utils.mongo import ping
+
+    timings = {}
+    started = time.perf_counter()
+    get_resolver().url_patterns
+    timings['urlconf'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    try:
+        ping()
+    except Exception as e:
+        logger.warning(f'MongoDB warm-up failed, connecting on first request instead: {e}')
+    timings['mongo'] = time.perf_counter() - started
+    return timings
+
+
+def shut_down():
+    from utils.mongo import close_client
+
+    close_client()
+
+
+async def async_warm_up():
+    """Open the async Mongo client on the running loop when the async views are enabled."""
+    from django.conf import settings
+    from utils.mongo import aping
+
+    if not settings.MONGO_ASYNC_VIEWS:
+        return {}
+    started = time.perf_counter()
+    try:
+        await aping()
+    except Exception as e:
+        logger.warning(f'MongoDB async warm-up failed, connecting on first request instead: {e}')
+    return {'mongo_async': time.perf_counter() - started}
+
+
+async def async_shut_down():
+    from utils.mongo import close_async_client
+
+    await close_async_client()
+
+
+class LifespanApplication:
+    def __init__(self, app, on_startup=warm_up, on_shutdown=shut_down,
+                 on_async_startup=async_warm_up, on_async_shutdown=async_shut_down):
+        self.app = app
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self.on_async_startup = on_async_startup
+        self.on_async_shutdown = on_async_shutdown
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    timings = await sync_to_async(self.on_startup, thread_sensitive=False)()
+                    timings.update(await self.on_async_startup())
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                logger.info(f'Warm-up done: {timings}')
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await sync_to_async(self.on_shutdown, thread_sensitive=False)()
+                await self.on_async_shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
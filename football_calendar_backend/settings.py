@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -95,6 +96,15 @@ DATABASES = {
     }
 }
 
+# "manage.py test" gira su SQLite in memoria: i test relazionali non toccano il Postgres di produzione.
+if sys.argv[1:2] == ['test']:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -143,3 +153,22 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 200,  # puoi anche usare 50 o 200, a seconda di quanto vuoi caricare per pagina
 }
+
+# Le viste Mongo codificano il JSON direttamente (matches_calendar/fast_json.py) invece di passare
+# dal JSONRenderer di DRF; False per tornare al percorso DRF (es. per confronti con benchmark_encoding).
+MONGO_FAST_JSON = True
+
+# Cache delle risposte degli endpoint Mongo (matches_calendar/cache.py), invalidata dalla "generation"
+# che l'ingestione incrementa a ogni sync. BACKEND è l'alias di una cache Django condivisa (opzionale).
+RESPONSE_CACHE = {
+    'MAX_ENTRIES': 512,
+    'BACKEND': None,
+    'TIMEOUT': 24 * 60 * 60,
+}
+# Ogni quanti secondi un processo rilegge la versione dei dati da Mongo (0 = a ogni richiesta).
+DATA_VERSION_TTL = 5
+
+# Viste Mongo async (matches_calendar/async_views.py) al posto di quelle DRF sincrone, solo su richiesta
+# esplicita. Servono un event loop che resta acceso (ASGI) e pymongo >= 4.11: con la 4.10
+# l'AsyncMongoClient blocca il loop a ogni round trip e serializza tutte le richieste.
+MONGO_ASYNC_VIEWS = os.getenv('MONGO_ASYNC_VIEWS', 'False').lower() in ('true', '1')
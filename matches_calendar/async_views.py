@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timezone
+
+from django.views.decorators.http import require_GET
+
+from utils.mongo import KICKOFF_ORDER, MATCH_ORDER, get_async_collection
+from .cache import cache_response, conditional_response
+from .fast_json import json_response
+from .field_selection import mongo_projection, parse_selection
+from .pagination import apaginate, mark_truncated
+from .queries import (
+    BATCH_KEYS, BATCH_LIMIT, LIST_LIMIT, batch_options, batch_query, batch_result, filter_query,
+    list_options, teams_pipeline, teams_query, upcoming_options,
+)
+from .streaming import astream_matches
+
+# Versioni async delle viste di mongo_views, sul client async di pymongo: sotto ASGI
+# un'attesa su Mongo non occupa un thread, e le query indipendenti partono insieme.
+# Sono viste Django semplici (le @api_view di DRF sono solo sincrone); urls.py le usa
+# con MONGO_ASYNC_VIEWS, stessi parametri, stessi errori e stesse risposte JSON.
+
+def error(message):
+    return json_response({"error": message}, status=400)
+
+async def matches_response(request, query):
+    params = request.GET
+    try:
+        fields, exclude, stream = list_options(params)
+    except ValueError as e:
+        return error(str(e))
+    projection = mongo_projection(fields, exclude) or {"_id": 0}
+    if stream:
+        return astream_matches(get_async_collection(), query, stream, projection)
+    if "cursor" not in params and "page_size" not in params:
+        page = await apaginate(get_async_collection(), query, None, LIST_LIMIT, fields, exclude)
+        return mark_truncated(json_response(page["results"]), request, page["next"], LIST_LIMIT)
+    try:
+        page = await apaginate(get_async_collection(), query, params.get("cursor"), params.get("page_size"), fields, exclude)
+    except ValueError as e:
+        return error(str(e))
+    return json_response(page)
+
+@conditional_response
+@cache_response
+@require_GET
+async def all_matches_mongo(request):
+    return await matches_response(request, {})
+
+@conditional_response
+@cache_response
+@require_GET
+async def all_leagues_mongo(request):
+    leagues = await get_async_collection("leagues").find({}, {"_id": 0, "id": 1, "name": 1}).sort("name", 1).to_list()
+    if not leagues:
+        leagues = await get_async_collection().distinct("league")
+    return json_response(leagues)
+
+@conditional_response
+@cache_response
+@require_GET
+async def all_teams_mongo(request):
+    try:
+        query = teams_query(request.GET)
+    except ValueError as e:
+        return error(str(e))
+
+    # La lista e il controllo "collezione vuota" sono indipendenti: un solo round trip di attesa.
+    collection = get_async_collection("teams")
+    teams, any_team = await asyncio.gather(
+        collection.find(query, {"_id": 0, "id": 1, "name": 1}).sort("name", 1).to_list(),
+        collection.find_one({}, {"_id": 1}),
+    )
+    if not teams and any_team is None:
+        teams = await (await get_async_collection().aggregate(teams_pipeline(query))).to_list()
+    return json_response(teams)
+
+@conditional_response
+@cache_response
+@require_GET
+async def filter_matches_mongo(request):
+    try:
+        query = filter_query(request.GET)
+    except ValueError as e:
+        return error(str(e))
+    return await matches_response(request, query)
+
+@conditional_response
+@cache_response
+@require_GET
+async def batch_matches_mongo(request):
+    # Stessa query e stesso limite della vista sincrona (queries.batch_query / batch_result).
+    params = request.GET
+    try:
+        team_ids, league_ids, window = batch_options(params)
+        fields, exclude = parse_selection(params)
+    except ValueError as e:
+        return error(str(e))
+    projection = mongo_projection(fields, exclude, keep=BATCH_KEYS) or {"_id": 0}
+    cursor = get_async_collection().find(batch_query(team_ids, league_ids, window), projection)
+    docs = await cursor.sort(MATCH_ORDER).limit(BATCH_LIMIT + 1).to_list()
+    return json_response(batch_result(team_ids, league_ids, docs, fields, exclude))
+
+@require_GET
+async def upcoming_matches_mongo(request):
+    try:
+        query, limit = upcoming_options(request.GET, datetime.now(timezone.utc))
+        fields, exclude = parse_selection(request.GET)
+    except ValueError as e:
+        return error(str(e))
+    projection = mongo_projection(fields, exclude) or {"_id": 0}
+    return json_response(await get_async_collection().find(query, projection).sort(KICKOFF_ORDER).limit(limit).to_list())
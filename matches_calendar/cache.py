@@ -0,0 +1,273 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .data_version import acurrent_version, current_version
+
+DEFAULTS = {
+    "MAX_ENTRIES": 512,
+    # Alias of a Django cache (e.g. Redis or Memcached) shared between processes, or None.
+    "BACKEND": None,
+    "TIMEOUT": 24 * 60 * 60,
+}
+
+
+def normalized_query(request):
+    """Query string with sorted keys and values, and empty parameters dropped (the views ignore them)."""
+    params = sorted((key, sorted(v for v in values if v)) for key, values in request.GET.lists())
+    return urlencode([(key, value) for key, values in params for value in values])
+
+
+class ResponseCache:
+    """Rendered responses tagged with the data generation they were built from.
+
+    Lookups go to an in-process LRU first, then to the optional shared Django
+    cache. The generation is part of every key, so once ingestion bumps it no
+    older entry can be served; the in-process LRU also drops them right away.
+    """
+
+    def __init__(self, max_entries=DEFAULTS["MAX_ENTRIES"], backend=None, timeout=DEFAULTS["TIMEOUT"]):
+        self.max_entries = max_entries
+        self.backend = backend
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.generation = None
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def key(generation, path, query):
+        digest = hashlib.sha1(f"{path}?{query}".encode()).hexdigest()
+        return f"matches_calendar:response:{generation}:{digest}"
+
+    def _check_generation(self, generation):
+        """Drop entries of older generations. False if ``generation`` is itself outdated."""
+        if self.generation is not None and generation < self.generation:
+            return False
+        if generation != self.generation:
+            self.counters["invalidations"] += len(self.entries)
+            self.entries.clear()
+            self.generation = generation
+        return True
+
+    def _get_local(self, key, generation):
+        with self.lock:
+            self._check_generation(generation)
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+            return payload
+
+    def _got_shared(self, key, generation, payload):
+        with self.lock:
+            if payload is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["shared_hits"] += 1
+            self._store(key, generation, payload)
+        return payload
+
+    def get(self, key, generation):
+        payload = self._get_local(key, generation)
+        if payload is not None:
+            return payload
+        return self._got_shared(key, generation, self.backend.get(key) if self.backend is not None else None)
+
+    async def aget(self, key, generation):
+        payload = self._get_local(key, generation)
+        if payload is not None:
+            return payload
+        return self._got_shared(key, generation, await self.backend.aget(key) if self.backend is not None else None)
+
+    def set(self, key, generation, payload):
+        if self.backend is not None:
+            self.backend.set(key, payload, self.timeout)
+        with self.lock:
+            self._store(key, generation, payload)
+
+    async def aset(self, key, generation, payload):
+        if self.backend is not None:
+            await self.backend.aset(key, payload, self.timeout)
+        with self.lock:
+            self._store(key, generation, payload)
+
+    def _store(self, key, generation, payload):
+        if not self._check_generation(generation):
+            return
+        self.entries[key] = payload
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["shared_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_ratio": round((self.counters["hits"] + self.counters["shared_hits"]) / lookups, 4) if lookups else 0,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "generation": self.generation,
+                "shared_backend": getattr(settings, "RESPONSE_CACHE", {}).get("BACKEND"),
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation = None
+            for name in self.counters:
+                self.counters[name] = 0
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        options = {**DEFAULTS, **getattr(settings, "RESPONSE_CACHE", {})}
+        backend = caches[options["BACKEND"]] if options["BACKEND"] else None
+        _response_cache = ResponseCache(options["MAX_ENTRIES"], backend, options["TIMEOUT"])
+    return _response_cache
+
+
+def request_version(request):
+    """The data version a request is answered from, read once so ETag, Last-Modified and cache key agree.
+
+    Async views set it beforehand with ``acurrent_version()``, so this never queries Mongo for them.
+    """
+    version = getattr(request, "_data_version", None)
+    if version is None:
+        version = request._data_version = current_version()
+    return version
+
+
+async def arequest_version(request):
+    if getattr(request, "_data_version", None) is None:
+        request._data_version = await acurrent_version()
+    return request._data_version
+
+
+# Headers that are part of a list response (see pagination.mark_truncated), kept with the body.
+CACHED_HEADERS = ("X-Truncated", "Link")
+
+
+def _payload(response):
+    return {"content": response.content, "content_type": response["Content-Type"],
+            "headers": {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}}
+
+
+def _cached(payload):
+    response = HttpResponse(payload["content"], content_type=payload["content_type"])
+    for name, value in payload.get("headers", {}).items():
+        response[name] = value
+    response["X-Cache"] = "HIT"
+    return response
+
+
+def _cacheable(response):
+    return (response.status_code == 200 and not response.streaming
+            and response.get("Content-Type", "").startswith("application/json"))
+
+
+def cache_response(view):
+    """Serve GET responses of ``view`` (sync or async) from the response cache.
+
+    Only complete 200 JSON responses are stored; streams and errors always go
+    to the view. The response carries ``X-Cache: HIT`` or ``MISS``.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return await view(request, *args, **kwargs)
+            cache = get_response_cache()
+            generation = (await arequest_version(request))["generation"]
+            key = cache.key(generation, request.path, normalized_query(request))
+            payload = await cache.aget(key, generation)
+            if payload is not None:
+                return _cached(payload)
+
+            response = await view(request, *args, **kwargs)
+            if _cacheable(response):
+                await cache.aset(key, generation, _payload(response))
+            response["X-Cache"] = "MISS"
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return view(request, *args, **kwargs)
+        cache = get_response_cache()
+        generation = request_version(request)["generation"]
+        key = cache.key(generation, request.path, normalized_query(request))
+        payload = cache.get(key, generation)
+        if payload is not None:
+            return _cached(payload)
+
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            response = response.render()
+        if _cacheable(response):
+            cache.set(key, generation, _payload(response))
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def data_etag(request, *args, **kwargs):
+    generation = request_version(request)["generation"]
+    digest = hashlib.sha1(f"{request.path}?{normalized_query(request)}".encode()).hexdigest()[:16]
+    return f'"{generation}-{digest}"'
+
+
+def data_last_modified(request, *args, **kwargs):
+    return request_version(request)["updated_at"]
+
+
+def conditional_response(view):
+    """ETag and Last-Modified from the data version and the query, 304 on a match.
+
+    Both are computed from the in-process data version, so a revalidation that
+    matches is answered without calling the view or querying the database.
+    ``Cache-Control: no-cache`` makes clients revalidate instead of guessing a
+    freshness lifetime from Last-Modified, so a new sync is seen right away.
+    Validators are only kept on 200 responses: an error must not be revalidated
+    into a 304.
+    """
+    conditional = condition(etag_func=data_etag, last_modified_func=data_last_modified)(view)
+
+    def finish(response):
+        if response.status_code not in (200, 304):
+            del response["ETag"]
+            del response["Last-Modified"]
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            await arequest_version(request)
+            return finish(await conditional(request, *args, **kwargs))
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return finish(conditional(request, *args, **kwargs))
+
+    return wrapper
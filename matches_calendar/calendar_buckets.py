@@ -0,0 +1,113 @@
+import calendar
+import logging
+import re
+
+from pymongo import ReplaceOne
+
+from matches_calendar.resolver import PLACEHOLDER_TEAM
+from utils.mongo import MATCH_ORDER
+
+logger = logging.getLogger(__name__)
+
+MONTH_RE = re.compile(r"^(\d{4})-(0[1-9]|1[0-2])$")
+ALL = "all"
+
+
+def parse_month(month):
+    """``(first day, last day)`` of a ``yyyy-mm`` month as ISO dates, or None if invalid."""
+    found = MONTH_RE.match(month or "")
+    if not found:
+        return None
+    year, number = int(found.group(1)), int(found.group(2))
+    return f"{month}-01", f"{month}-{calendar.monthrange(year, number)[1]:02d}"
+
+
+def bucket_id(month, scope=ALL):
+    return f"{month}:{scope}"
+
+
+def month_of(date):
+    return date[:7] if isinstance(date, str) and MONTH_RE.match(date[:7]) else None
+
+
+def empty_bucket(month, scope=ALL):
+    return {"_id": bucket_id(month, scope), "month": month, "scope": scope, "total": 0, "counts": {}, "days": {}}
+
+
+def build_month_buckets(month, docs):
+    """Group a month's matches (in MATCH_ORDER) into one bucket per scope.
+
+    Scopes are ``all``, ``league:<id>`` and ``team:<id>``; each bucket holds the
+    matches grouped by day and the number of matches per day.
+    """
+    buckets = {}
+
+    def add(scope, doc):
+        bucket = buckets.get(scope)
+        if bucket is None:
+            bucket = buckets[scope] = empty_bucket(month, scope)
+        bucket["days"].setdefault(doc["date"], []).append(doc)
+        bucket["counts"][doc["date"]] = bucket["counts"].get(doc["date"], 0) + 1
+        bucket["total"] += 1
+
+    for doc in docs:
+        add(ALL, doc)
+        league_id = (doc.get("league") or {}).get("id")
+        if league_id is not None:
+            add(f"league:{league_id}", doc)
+        for side in ("home_team", "away_team"):
+            team = doc.get(side) or {}
+            if team.get("id") is not None and team.get("name") != PLACEHOLDER_TEAM:
+                add(f"team:{team['id']}", doc)
+    return list(buckets.values())
+
+
+def month_matches(matches_col, month):
+    first, last = parse_month(month)
+    return matches_col.find({"date": {"$gte": first, "$lte": last}}, {"_id": 0}).sort(MATCH_ORDER)
+
+
+class CalendarBuckets:
+    """Per-month bucket documents of the ``calendar`` collection, kept by ingestion.
+
+    Ingestion ``touch()``es the date of every fixture it writes or deletes;
+    ``flush()`` then rebuilds the buckets of just those months, each from one
+    range query on the matches collection.
+    """
+
+    def __init__(self, db):
+        self.collection = db["calendar"]
+        self.months = set()
+
+    def is_empty(self):
+        return self.collection.find_one({}, {"_id": 1}) is None
+
+    def touch(self, date):
+        month = month_of(date)
+        if month:
+            self.months.add(month)
+
+    def flush(self, matches_col):
+        """Rebuild the buckets of every touched month. Returns the number of months rebuilt.
+
+        Buckets are replaced in place and only the scopes left without matches are
+        deleted afterwards, so a concurrent read never finds the month empty.
+        """
+        for month in sorted(self.months):
+            buckets = build_month_buckets(month, month_matches(matches_col, month))
+            if buckets:
+                self.collection.bulk_write(
+                    [ReplaceOne({"_id": bucket["_id"]}, bucket, upsert=True) for bucket in buckets], ordered=False
+                )
+            self.collection.delete_many({"month": month, "_id": {"$nin": [bucket["_id"] for bucket in buckets]}})
+        count = len(self.months)
+        self.months = set()
+        return count
+
+    def rebuild(self, matches_col):
+        """Rebuild the buckets of every month with stored matches or existing buckets."""
+        for date in matches_col.distinct("date"):
+            self.touch(date)
+        self.months.update(self.collection.distinct("month"))
+        count = self.flush(matches_col)
+        logger.info(f"Built calendar buckets for {count} months from stored matches.")
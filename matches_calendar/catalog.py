@@ -0,0 +1,109 @@
+import logging
+from collections import defaultdict
+
+from pymongo import ReplaceOne, UpdateOne
+
+from matches_calendar.resolver import PLACEHOLDER_TEAM
+
+logger = logging.getLogger(__name__)
+
+
+class Catalog:
+    """The ``teams`` and ``leagues`` collections, maintained by ingestion.
+
+    Every written fixture adds its teams, league and season with ``add()``;
+    ``flush()`` then upserts only the teams and leagues seen in the run, using
+    ``$addToSet`` so memberships accumulate across incremental syncs. Documents
+    are keyed by their registry id:
+
+        teams:   {_id, id, name, leagues: [league id], memberships: [{league, season}]}
+        leagues: {_id, id, name, seasons: [season]}
+    """
+
+    def __init__(self, db):
+        self.teams_col = db["teams"]
+        self.leagues_col = db["leagues"]
+        self._reset()
+
+    def _reset(self):
+        self.teams, self.leagues = {}, {}
+        self.memberships = defaultdict(set)
+        self.seasons = defaultdict(set)
+
+    def is_empty(self):
+        # Documents left by migrate_to_mongo.py ({id, name}, Postgres ids) do not count.
+        return self.leagues_col.find_one({"seasons": {"$exists": True}}, {"_id": 1}) is None
+
+    def add(self, doc):
+        league, season = doc.get("league", {}), doc.get("season")
+        if league.get("id") is None:
+            return
+        self.leagues[league["id"]] = league.get("name")
+        if season is not None:
+            self.seasons[league["id"]].add(season)
+        for side in ("home_team", "away_team"):
+            team = doc.get(side, {})
+            if team.get("id") is None or team.get("name") in (None, PLACEHOLDER_TEAM):
+                continue
+            self.teams[team["id"]] = team["name"]
+            self.memberships[team["id"]].add((league["id"], season))
+
+    def flush(self):
+        """Upsert the teams and leagues seen since the last flush. Returns the number of documents sent."""
+        league_ops = [
+            UpdateOne({"_id": league_id}, {
+                "$set": {"id": league_id, "name": name},
+                "$addToSet": {"seasons": {"$each": sorted(self.seasons[league_id])}},
+            }, upsert=True)
+            for league_id, name in self.leagues.items()
+        ]
+        team_ops = [
+            UpdateOne({"_id": team_id}, {
+                "$set": {"id": team_id, "name": name},
+                "$addToSet": {
+                    "leagues": {"$each": sorted({league for league, _ in self.memberships[team_id]})},
+                    "memberships": {"$each": [
+                        {"league": league, "season": season}
+                        for league, season in sorted(self.memberships[team_id], key=str)
+                    ]},
+                },
+            }, upsert=True)
+            for team_id, name in self.teams.items()
+        ]
+        if league_ops:
+            self.leagues_col.bulk_write(league_ops, ordered=False)
+        if team_ops:
+            self.teams_col.bulk_write(team_ops, ordered=False)
+        self._reset()
+        return len(league_ops) + len(team_ops)
+
+    def rebuild(self, matches_col):
+        """Replace the catalog with one built from every stored match.
+
+        Documents are replaced one by one and the ones left over (teams that no
+        longer play, or written by migrate_to_mongo.py) deleted afterwards, so
+        readers never see an empty catalog meanwhile.
+        """
+        self._reset()
+        fields = {"_id": 0, "season": 1, "league.id": 1, "league.name": 1,
+                  "home_team.id": 1, "home_team.name": 1, "away_team.id": 1, "away_team.name": 1}
+        for doc in matches_col.find({}, fields):
+            self.add(doc)
+        leagues = [
+            {"_id": league_id, "id": league_id, "name": name, "seasons": sorted(self.seasons[league_id])}
+            for league_id, name in self.leagues.items()
+        ]
+        teams = [
+            {"_id": team_id, "id": team_id, "name": name,
+             "leagues": sorted({league for league, _ in self.memberships[team_id]}),
+             "memberships": [{"league": league, "season": season}
+                             for league, season in sorted(self.memberships[team_id], key=str)]}
+            for team_id, name in self.teams.items()
+        ]
+        for collection, docs in ((self.leagues_col, leagues), (self.teams_col, teams)):
+            if docs:
+                collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+                                      ordered=False)
+            collection.delete_many({"_id": {"$nin": [doc["_id"] for doc in docs]}})
+        self._reset()
+        logger.info(f"Built the teams/leagues catalog from stored matches ({len(leagues) + len(teams)} documents).")
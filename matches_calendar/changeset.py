@@ -0,0 +1,41 @@
+DESCRIBED_FIELDS = ("match_key", "season", "matchday", "date", "time")
+
+
+def describe(doc):
+    """Compact, JSON-serializable identification of a fixture."""
+    summary = {field: doc.get(field) for field in DESCRIBED_FIELDS}
+    summary["league"] = doc.get("league", {}).get("name")
+    summary["home_team"] = doc.get("home_team", {}).get("name")
+    summary["away_team"] = doc.get("away_team", {}).get("name")
+    if "_id" in doc:
+        summary["_id"] = str(doc["_id"])
+    return summary
+
+
+class ChangeSet:
+    """Inserts, updates and deletions a sync would apply, computed without writing."""
+
+    def __init__(self):
+        self.inserts = []
+        self.updates = []
+        self.deletes = []
+
+    def insert(self, doc):
+        self.inserts.append(describe(doc))
+
+    def update(self, stored, doc):
+        changes = {
+            field: [stored.get(field), value] for field, value in doc.items() if stored.get(field) != value
+        }
+        self.updates.append({**describe(stored), "changes": changes})
+
+    def delete(self, stored):
+        self.deletes.append(describe(stored))
+
+    def as_dict(self):
+        return {
+            "summary": {"inserts": len(self.inserts), "updates": len(self.updates), "deletes": len(self.deletes)},
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "deletes": self.deletes,
+        }
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from django.conf import settings
+
+from utils.mongo import aread_data_version, get_async_db, get_db, read_data_version
+
+_lock = threading.Lock()
+_version = None
+_checked_at = 0.0
+
+
+def _stale(now):
+    return _version is None or now - _checked_at >= getattr(settings, "DATA_VERSION_TTL", 5)
+
+
+def _remember(doc, now):
+    global _version, _checked_at
+    _version = {"generation": doc.get("generation", 0), "updated_at": doc.get("updated_at")}
+    _checked_at = now
+    return _version
+
+
+def current_version():
+    """The data version ingestion last recorded: ``{"generation": int, "updated_at": datetime or None}``.
+
+    It is read from Mongo at most once every ``DATA_VERSION_TTL`` seconds per
+    process, so between checks requests can be answered without any query.
+    ``DATA_VERSION_TTL = 0`` checks on every request.
+    """
+    now = time.monotonic()
+    if _stale(now):
+        with _lock:
+            if _stale(now):
+                return _remember(read_data_version(get_db()), now)
+    return _version
+
+
+async def acurrent_version():
+    """``current_version()`` for async views: refreshed with the async client, same TTL and cache."""
+    now = time.monotonic()
+    if _stale(now):
+        return _remember(await aread_data_version(get_async_db()), now)
+    return _version
+
+
+def reset():
+    global _version
+    _version = None
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib C encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    # Datetimes as DRF's encoder writes them: ISO 8601, with "Z" for UTC.
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return str(value)
+
+
+# Same output as DRF's JSONRenderer defaults (UNICODE_JSON, COMPACT_JSON, STRICT_JSON).
+# Documents come straight from Mongo and cannot be self-referencing, so the
+# circular-reference bookkeeping is skipped.
+_encoder = json.JSONEncoder(
+    ensure_ascii=False, separators=(",", ":"), check_circular=False, allow_nan=False, default=_default
+)
+
+
+def dumps(data):
+    """Encode ``data`` to UTF-8 JSON bytes in a single pass, byte for byte as DRF's JSONRenderer."""
+    if orjson is not None:
+        encoded = orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    else:
+        encoded = _encoder.encode(data).encode()
+    # DRF escapes the two line separators JavaScript does not allow in strings.
+    if b"\xe2\x80\xa8" in encoded or b"\xe2\x80\xa9" in encoded:
+        encoded = encoded.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return encoded
+
+
+def json_response(data, status=200):
+    """JSON response that skips DRF's renderer and content negotiation."""
+    return HttpResponse(dumps(data), content_type="application/json", status=status)
@@ -0,0 +1,79 @@
+"""``fields=`` / ``exclude=`` query parameters: comma-separated, dotted for nested objects.
+
+``?fields=date,time,home_team.name`` keeps only those paths, ``?exclude=league``
+drops them; the two cannot be combined. The Mongo endpoints turn the selection
+into a server-side projection, MatchSerializer into a dynamic field subset.
+"""
+
+NESTED = ("home_team", "away_team", "league")
+MATCH_FIELDS = frozenset(
+    ("match_key", "date", "time", "kickoff", "matchday", "season", "is_cancelled", "score_home", "score_away",
+     "team_ids")
+    + NESTED + tuple(f"{name}.{sub}" for name in NESTED for sub in ("id", "name"))
+)
+
+
+def _split(value):
+    return {part.strip() for part in value.split(",") if part.strip()}
+
+
+def parse_selection(params, allowed=MATCH_FIELDS):
+    """``(fields, exclude)`` from query params: ``fields`` is None when not given.
+
+    Raises ValueError for unknown paths or when both parameters are used.
+    """
+    fields = _split(params.get("fields") or "") or None
+    exclude = _split(params.get("exclude") or "")
+    if fields is not None and exclude:
+        raise ValueError("Use either fields or exclude, not both")
+    unknown = (fields or set()) | exclude
+    if allowed is not None:
+        unknown -= allowed
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields, exclude
+
+
+def _collapse(paths):
+    # Mongo rejects "home_team" together with "home_team.name" (path collision).
+    return {path for path in paths if not any(path.startswith(other + ".") for other in paths)}
+
+
+def mongo_projection(fields, exclude, keep=()):
+    """Projection for a selection. ``keep`` paths (e.g. the cursor's sort keys) are always fetched
+    and must be removed again with ``select()``. Returns None when nothing is selected."""
+    if fields is None and not exclude:
+        return None
+    if fields is not None:
+        projection = {path: 1 for path in _collapse(set(fields) | set(keep))}
+    else:
+        kept = [path for path in exclude if not any(k == path or k.startswith(path + ".") for k in keep)]
+        projection = {path: 0 for path in _collapse(kept)}
+    if "_id" not in keep:
+        projection["_id"] = 0
+    return projection
+
+
+def select(doc, fields, exclude):
+    """Apply a selection to a document in Python (calendar buckets, fields fetched only for the cursor)."""
+    if fields is None and not exclude:
+        return doc
+    if fields is not None:
+        selected = _collapse(fields)
+        out = {}
+        for key, value in doc.items():
+            if key in selected:
+                out[key] = value
+                continue
+            subs = {path.partition(".")[2] for path in selected if path.startswith(key + ".")}
+            if subs and isinstance(value, dict):
+                out[key] = {sub: sub_value for sub, sub_value in value.items() if sub in subs}
+        return out
+    out = dict(doc)
+    for path in exclude:
+        head, _, sub = path.partition(".")
+        if not sub:
+            out.pop(head, None)
+        elif isinstance(out.get(head), dict):
+            out[head] = {key: value for key, value in out[head].items() if key != sub}
+    return out
@@ -0,0 +1,61 @@
+import logging
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("team", "league")
+
+
+class IdRegistry:
+    """Name -> compact integer id dictionary for teams and leagues.
+
+    The mapping lives in the ``id_registry`` collection and is loaded once per
+    ingestion run; new names get the next free id of their kind and are saved
+    with ``flush()`` before any match referencing them is written. Ids never
+    change once assigned, so clients can cache them across syncs.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.ids = {kind: {} for kind in KINDS}
+        self.next_id = {kind: 1 for kind in KINDS}
+        self.pending = []
+
+    def ensure_indexes(self):
+        self.collection.create_index([("kind", 1), ("name", 1)], unique=True)
+        self.collection.create_index([("kind", 1), ("id", 1)], unique=True)
+
+    def load(self):
+        for doc in self.collection.find({"kind": {"$in": list(KINDS)}}, {"_id": 0, "kind": 1, "name": 1, "id": 1}):
+            self.ids[doc["kind"]][doc["name"]] = doc["id"]
+            self.next_id[doc["kind"]] = max(self.next_id[doc["kind"]], doc["id"] + 1)
+        return self
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.ids.values())
+
+    def get(self, kind, name):
+        if name is None:
+            return None
+        ids = self.ids[kind]
+        if name not in ids:
+            ids[name] = self.next_id[kind]
+            self.next_id[kind] += 1
+            self.pending.append({"kind": kind, "name": name, "id": ids[name]})
+        return ids[name]
+
+    def flush(self):
+        """Persist newly assigned ids. Returns True if a round trip was made."""
+        if not self.pending:
+            return False
+        try:
+            self.collection.insert_many(self.pending, ordered=False)
+        except BulkWriteError as e:
+            raise RuntimeError(
+                "ID registry changed during ingestion (is another sync running?): "
+                f"{e.details.get('writeErrors', [])[:1]}"
+            ) from e
+        logger.info(f"Registered {len(self.pending)} new team/league ids.")
+        self.pending = []
+        return True
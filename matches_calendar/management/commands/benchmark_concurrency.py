@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import pymongo
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PATHS = (
+    '/api/matches-mongo/?page_size=50',
+    '/api/matches-mongo/filter/?league=1&page_size=50',
+    '/api/leagues-mongo/',
+    '/api/teams-mongo/',
+)
+
+class Command(BaseCommand):
+    help = 'Compare throughput of the sync and async Mongo views under ASGI with many simultaneous requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help=f'Request path to load (repeatable). Default: {", ".join(PATHS)}.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per path and mode.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at the same time.')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Round-trip time added to every MongoDB exchange, in ms (default: none, the real network).')
+        parser.add_argument('--json', action='store_true', help='Print the raw results as JSON.')
+
+    def handle(self, *args, **options):
+        results = []
+        for path in options['path'] or PATHS:
+            for async_views in (False, True):
+                command = [
+                    sys.executable, '-m', 'benchmarks.concurrency_probe', '--path', path,
+                    '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+                    '--latency', str(options['latency']),
+                ]
+                env = {**os.environ, 'MONGO_ASYNC_VIEWS': str(async_views)}
+                result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+                if result.returncode != 0:
+                    raise CommandError(f'Concurrency probe failed:\n{result.stderr}')
+                results.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        network = f"+{options['latency']:g} ms per MongoDB round trip" if options['latency'] else 'no added latency'
+        self.stdout.write(
+            f"{options['requests']} requests per run, {options['concurrency']} concurrent, {network}, pymongo {pymongo.version}"
+        )
+        for sync_run, async_run in zip(results[::2], results[1::2]):
+            self.stdout.write(sync_run['path'])
+            for label, run in (('sync', sync_run), ('async', async_run)):
+                self.stdout.write(
+                    f"  {label:<6} {run['requests_per_second']:8.1f} req/s   p50 {run['p50_seconds'] * 1000:8.1f} ms"
+                    f"   p95 {run['p95_seconds'] * 1000:8.1f} ms   statuses {run['statuses']}"
+                )
+            self.stdout.write(
+                f"  async/sync throughput: {async_run['requests_per_second'] / sync_run['requests_per_second']:.2f}x"
+            )
@@ -0,0 +1,80 @@
+import json
+import time
+import bson
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+from matches_calendar import fast_json
+
+PATHS = ['/api/matches-mongo/', '/api/matches-mongo/filter/?league=1', '/api/teams-mongo/']
+
+def synthetic_matches(count):
+    return [{
+        'match_key': f'{i:040x}',
+        'date': f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+        'time': '20:45',
+        'matchday': f'Matchday {i % 38 + 1}',
+        'season': '2024/25',
+        'is_cancelled': False,
+        'score_home': i % 4,
+        'score_away': None if i % 5 else 1,
+        'home_team': {'id': i % 20 + 1, 'name': f'Home Team {i % 20}'},
+        'away_team': {'id': i % 19 + 2, 'name': f'Away Team {i % 19}'},
+        'league': {'id': 1, 'name': 'Serie A'},
+    } for i in range(count)]
+
+class Command(BaseCommand):
+    help = 'Compare requests/second of the fast JSON path against the DRF renderer on the Mongo endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests (or renders) per path and mode.')
+        parser.add_argument('--path', action='append', help=f'Endpoint to call (repeatable, default: {", ".join(PATHS)}).')
+        parser.add_argument('--synthetic', type=int, metavar='N',
+                            help='Skip MongoDB: decode and render N synthetic matches from BSON instead.')
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            self.benchmark_synthetic(options['synthetic'], options['requests'])
+        else:
+            for path in options['path'] or PATHS:
+                self.benchmark_path(path, options['requests'])
+
+    def report(self, label, drf_seconds, fast_seconds, count, size):
+        drf_rate, fast_rate = count / drf_seconds, count / fast_seconds
+        self.stdout.write(
+            f'{label}: {size} bytes | DRF {drf_rate:8.1f} req/s | fast {fast_rate:8.1f} req/s'
+            f' | x{fast_rate / drf_rate:.2f} (encoder: {"orjson" if fast_json.orjson else "json"})'
+        )
+
+    def benchmark_path(self, path, count):
+        client = Client(HTTP_HOST='localhost')
+        timings, bodies = {}, {}
+        for fast in (False, True):
+            with override_settings(MONGO_FAST_JSON=fast):
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{path} returned {response.status_code}')
+                bodies[fast] = response.content
+                started = time.perf_counter()
+                for _ in range(count):
+                    client.get(path)
+                timings[fast] = time.perf_counter() - started
+        if json.loads(bodies[False]) != json.loads(bodies[True]):
+            raise CommandError(f'{path}: fast and DRF responses differ')
+        self.report(path, timings[False], timings[True], count, len(bodies[True]))
+
+    def benchmark_synthetic(self, size, count):
+        # Same work a cursor does per response: decode the BSON batch with the C extension, then encode.
+        raw = b''.join(bson.encode(doc) for doc in synthetic_matches(size))
+        renderer = JSONRenderer()
+        encoders = {False: renderer.render, True: fast_json.dumps}
+        timings, bodies = {}, {}
+        for fast, encode in encoders.items():
+            bodies[fast] = encode(bson.decode_all(raw))
+            started = time.perf_counter()
+            for _ in range(count):
+                encode(bson.decode_all(raw))
+            timings[fast] = time.perf_counter() - started
+        if json.loads(bodies[False]) != json.loads(bodies[True]):
+            raise CommandError('fast and DRF encodings differ')
+        self.report(f'{size} synthetic matches', timings[False], timings[True], count, len(bodies[True]))
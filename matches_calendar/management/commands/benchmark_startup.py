@@ -0,0 +1,47 @@
+import json
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+TIMINGS = ('import_seconds', 'warm_up_seconds', 'first_request_seconds', 'second_request_seconds')
+
+class Command(BaseCommand):
+    help = 'Measure cold-start import time and first-request latency of the ASGI app, each run in a fresh process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/matches-mongo/', help='Request path to time.')
+        parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to measure.')
+        parser.add_argument('--lifespan', action='store_true', help='Run the ASGI lifespan warm-up before the first request.')
+        parser.add_argument('--json', action='store_true', help='Print the raw per-run results as JSON.')
+
+    def handle(self, *args, **options):
+        command = [sys.executable, '-m', 'benchmarks.startup_probe', '--path', options['path']]
+        if options['lifespan']:
+            command.append('--lifespan')
+
+        runs = []
+        for _ in range(options['runs']):
+            result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise CommandError(f'Startup probe failed:\n{result.stderr}')
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        if options['json']:
+            self.stdout.write(json.dumps(runs, indent=2))
+            return
+
+        last = runs[-1]
+        self.stdout.write(f"{options['path']}: {len(runs)} cold starts, status {last['first_request_status']}")
+        for key in TIMINGS:
+            values = [run[key] for run in runs if key in run]
+            if values:
+                self.stdout.write(
+                    f"  {key.replace('_seconds', ''):<15} median {statistics.median(values) * 1000:8.1f} ms"
+                    f"   min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms"
+                )
+        self.stdout.write(
+            f"  modules loaded: {last['modules_after_import']} after import, {last['modules_after_requests']} after requests;"
+            f" ORM views loaded: {last['orm_views_loaded']}; Postgres driver loaded: {last['postgres_driver_loaded']}"
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from matches_calendar.standings import Standings
+from utils.mongo import bump_data_version, get_collection, get_db
+
+class Command(BaseCommand):
+    help = 'Verify the stored league standings against a full recompute from the matches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Replace the tables that differ with the recomputed ones.')
+
+    def handle(self, *args, **options):
+        mismatches = Standings(get_db()).verify(get_collection(), fix=options['fix'])
+        for standing, rows in mismatches.items():
+            for team, counters in rows.items():
+                diffs = ', '.join(f'{name} {stored} != {expected}' for name, (stored, expected) in counters.items())
+                self.stdout.write(f'{standing} team {team}: {diffs}')
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Standings match the matches.'))
+        elif options['fix']:
+            # Cached responses are keyed by data generation: the corrected tables must invalidate them.
+            bump_data_version(get_db())
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(mismatches)} standings tables.'))
+        else:
+            raise CommandError(f'{len(mismatches)} standings tables differ from a full recompute (use --fix).')
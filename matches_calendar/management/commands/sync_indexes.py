@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.mongo import COLLECTION_INDEXES, explain_endpoint_queries, get_collection, sync_indexes
+
+class Command(BaseCommand):
+    help = 'Reconcile the MongoDB indexes with the declared ones and verify endpoint query plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only print what would change.')
+        parser.add_argument('--keep-unknown', action='store_true', help='Do not drop undeclared indexes.')
+        parser.add_argument('--explain', action='store_true', help='Check that every endpoint query uses IXSCAN.')
+
+    def handle(self, *args, **options):
+        prefix = 'Would have ' if options['dry_run'] else ''
+        for name, specs in COLLECTION_INDEXES.items():
+            actions = sync_indexes(
+                get_collection(name), specs, drop_unknown=not options['keep_unknown'], dry_run=options['dry_run']
+            )
+            for action, names in actions.items():
+                if names:
+                    self.stdout.write(f'{name}: {prefix}{action}: {", ".join(names)}')
+        self.stdout.write(self.style.SUCCESS('Indexes are in sync.' if not options['dry_run'] else 'Dry run done.'))
+
+        if not options['explain']:
+            return
+        failed = []
+        for endpoint, result in explain_endpoint_queries(get_collection()).items():
+            stages = ' > '.join(result['stages'])
+            if result['ok']:
+                self.stdout.write(f'IXSCAN  {endpoint}: {stages}')
+            else:
+                self.stdout.write(self.style.ERROR(f'NO IDX  {endpoint}: {stages}'))
+                failed.append(endpoint)
+        if failed:
+            raise CommandError(f'{len(failed)} endpoint queries do not use an index: {", ".join(failed)}')
@@ -1,3 +1,5 @@
+import argparse
+import json
 import os
 import os
 import sys
@@ -5,18 +7,77 @@ import sys
 # Aggiungi la cartella del modulo 'matches_calendar' al path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from matches_calendar.utils import update_matches_from_remote_repo
+from matches_calendar.sources import DEFAULT_MIRROR_DIR, GitMirrorSource, LocalDirectorySource, TarballSource
+from matches_calendar.utils import DEFAULT_BATCH_SIZE, update_matches_from_remote_repo
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Sync matches from the football_calendar_project repo into MongoDB.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Number of fixtures written per bulk_write round trip.")
+    parser.add_argument("--force", action="store_true",
+                        help="Ignore the recorded ingest state and rewrite every fixture.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used to parse and normalize season files (1 = serial).")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Parse season files incrementally, one matchday at a time (bounded memory).")
+    parser.add_argument("--source", choices=["git", "dir", "tarball"], default="git",
+                        help="Where season files come from: persistent git mirror, local directory or tarball.")
+    parser.add_argument("--source-path",
+                        help="Directory (--source dir) or tarball path/URL (--source tarball).")
+    parser.add_argument("--mirror-dir", default=DEFAULT_MIRROR_DIR,
+                        help="Location of the persistent git mirror (--source git).")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Compute the change set without writing anything and print it as JSON.")
+    parser.add_argument("--diff-output",
+                        help="With --dry-run, write the JSON diff to this file instead of stdout.")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete stored fixtures that are no longer in their season file.")
+    parser.add_argument("--report",
+                        help="Write a JSON report with per-stage timings, per-file/per-league breakdowns "
+                             "and Mongo round-trip counts to this file.")
+    parser.add_argument("--profile",
+                        help="Capture a cProfile dump of the whole run to this file.")
+    parser.add_argument("--snapshot-dir",
+                        help="Write static gzip/brotli JSON snapshots per league-season, team-season and month, "
+                             "plus manifest.json, to this directory (e.g. staticfiles/snapshots).")
+    seasons = parser.add_mutually_exclusive_group()
+    seasons.add_argument("--min-season", type=int, default=2024,
+                         help="Oldest season start year to ingest.")
+    seasons.add_argument("--all-seasons", action="store_const", dest="min_season", const=None,
+                         help="Ingest every season file (historical backfill).")
+    args = parser.parse_args()
+
     repo_url = "https://github.com/walele993/football_calendar_project.git"
+    if args.source == "git":
+        source = GitMirrorSource(repo_url, mirror_dir=args.mirror_dir)
+    elif not args.source_path:
+        parser.error(f"--source {args.source} requires --source-path")
+    elif args.source == "dir":
+        source = LocalDirectorySource(args.source_path)
+    else:
+        source = TarballSource(args.source_path)
     mongo_uri = os.getenv("MONGO_URI")
 
     if not mongo_uri:
         print("Error: MONGO_URI environment variable is not set.")
         return
 
-    message = update_matches_from_remote_repo(repo_url=repo_url, mongo_uri=mongo_uri)
+    message = update_matches_from_remote_repo(repo_url=repo_url, mongo_uri=mongo_uri, batch_size=args.batch_size,
+                                              force=args.force, workers=args.workers,
+                                              min_season_start=args.min_season, streaming=args.streaming,
+                                              source=source, dry_run=args.dry_run, prune=args.prune,
+                                              report_path=args.report, cprofile_path=args.profile,
+                                              snapshot_dir=args.snapshot_dir)
+    if args.dry_run and message is not None:
+        diff = json.dumps(message, default=str, separators=(",", ":"))
+        if args.diff_output:
+            with open(args.diff_output, "w", encoding="utf-8") as f:
+                f.write(diff)
+            print(f"Dry run diff written to {args.diff_output}: {message['summary']}")
+        else:
+            print(diff)
+        return
     print(message)
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_participations(apps, schema_editor):
+    Match = apps.get_model('matches_calendar', 'Match')
+    MatchParticipation = apps.get_model('matches_calendar', 'MatchParticipation')
+    rows = []
+    for match_id, home_id, away_id, date in Match.objects.values_list('id', 'home_team_id', 'away_team_id', 'date').iterator():
+        for team_id in {home_id, away_id}:
+            rows.append(MatchParticipation(match_id=match_id, team_id=team_id, date=date))
+        if len(rows) >= 1000:
+            MatchParticipation.objects.bulk_create(rows)
+            rows = []
+    MatchParticipation.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches_calendar', '0011_match_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchParticipation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(null=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to='matches_calendar.match')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to='matches_calendar.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['team', 'date'], name='matches_cal_team_id_c69d94_idx')],
+                'constraints': [models.UniqueConstraint(fields=('match', 'team'), name='unique_match_participation')],
+            },
+        ),
+        migrations.RunPython(create_participations, migrations.RunPython.noop),
+    ]
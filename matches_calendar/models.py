@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 class Team(models.Model):
     name = models.CharField(max_length=255)
@@ -12,6 +12,55 @@ class League(models.Model):
     def __str__(self):
         return self.name
 
+# Campi di Match copiati in MatchParticipation: chi li cambia deve riscrivere le partecipazioni.
+PARTICIPATION_FIELDS = {'home_team', 'home_team_id', 'away_team', 'away_team_id', 'date'}
+
+
+class MatchQuerySet(models.QuerySet):
+    # update(), bulk_create() e bulk_update() non passano da Match.save(): qui riscrivono le
+    # partecipazioni delle partite toccate, nella stessa transazione. L'SQL grezzo resta escluso:
+    # dopo, va chiamato Match.objects.filter(...).sync_participations() sulle partite modificate.
+
+    def update(self, **kwargs):
+        if not PARTICIPATION_FIELDS & kwargs.keys():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            # Gli id prima dell'update: il filtro può non selezionarle più (es. cambiando la data).
+            ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            self.model.objects.filter(pk__in=ids).sync_participations()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            # Senza pk (backend che non li restituiscono) la partita va sincronizzata a mano.
+            self.model.objects.filter(pk__in=[obj.pk for obj in objs if obj.pk is not None]).sync_participations()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if not PARTICIPATION_FIELDS & set(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            self.model.objects.filter(pk__in=[obj.pk for obj in objs]).sync_participations()
+        return rows
+
+    def sync_participations(self):
+        # Riscrive le partecipazioni delle partite selezionate (inserite a blocchi di 1000 righe).
+        with transaction.atomic(using=self.db):
+            ids = list(self.values_list('pk', flat=True))
+            MatchParticipation.objects.filter(match_id__in=ids).delete()
+            rows = [
+                MatchParticipation(match_id=match_id, team_id=team_id, date=date)
+                for match_id, home_id, away_id, date in self.model.objects.filter(pk__in=ids)
+                .values_list('id', 'home_team_id', 'away_team_id', 'date').iterator()
+                for team_id in {home_id, away_id}
+            ]
+            MatchParticipation.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
 class Match(models.Model):
     matchday = models.CharField(max_length=255, null=True, blank=True)
     date = models.DateField(null=True)
@@ -24,9 +73,26 @@ class Match(models.Model):
     season = models.CharField(max_length=255, null=True, blank=True)
     is_cancelled = models.BooleanField(default=False)
 
+    objects = MatchQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.home_team} vs {self.away_team} ({self.league.name})"
 
+    def save(self, *args, **kwargs):
+        # Partita e partecipazioni nella stessa transazione: mai una senza le altre.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.sync_participations()
+
+    def sync_participations(self):
+        # Una riga per squadra (casa e trasferta), con la data della partita copiata:
+        # si riscrivono con una delete e un bulk_create invece di una query per squadra.
+        self.participations.all().delete()
+        MatchParticipation.objects.bulk_create([
+            MatchParticipation(match=self, team_id=team_id, date=self.date)
+            for team_id in {self.home_team_id, self.away_team_id}
+        ])
+
     class Meta:
         indexes = [
             models.Index(fields=['date']),  # Aggiunge un indice sul campo 'date'
@@ -34,3 +100,20 @@ class Match(models.Model):
             models.Index(fields=['home_team']),  # Aggiunge un indice sul campo 'home_team'
             models.Index(fields=['away_team']),  # Aggiunge un indice sul campo 'away_team'
         ]
+
+
+# Una riga per (partita, squadra), mantenuta da Match.save() e da MatchQuerySet (update, bulk_create,
+# bulk_update): il filtro per squadra diventa una scansione dell'indice (team, date) invece di un OR
+# tra home_team e away_team. La cancellazione segue la partita con il CASCADE.
+class MatchParticipation(models.Model):
+    match = models.ForeignKey(Match, related_name="participations", on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, related_name="participations", on_delete=models.CASCADE)
+    date = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'team'], name='unique_match_participation'),
+        ]
+        indexes = [
+            models.Index(fields=['team', 'date']),  # Calendario di una squadra in ordine di data
+        ]
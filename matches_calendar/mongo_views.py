@@ -0,0 +1,196 @@
+from datetime import datetime, timezone
+from django.conf import settings
+from rest_framework.decorators import api_view, authentication_classes
+from rest_framework.response import Response
+from utils.mongo import KICKOFF_ORDER, MATCH_ORDER, get_collection
+from .calendar_buckets import ALL, bucket_id, build_month_buckets, empty_bucket, month_matches, parse_month
+from .cache import cache_response, conditional_response, get_response_cache
+from .fast_json import json_response
+from .field_selection import mongo_projection, parse_selection, select
+from .pagination import mark_truncated, paginate
+from .standings import ranked, standing_id
+from .queries import (
+    BATCH_KEYS, BATCH_LIMIT, LIST_LIMIT, batch_options, batch_query, batch_result, filter_query,
+    list_options, teams_pipeline, teams_query, upcoming_options,
+)
+from .streaming import stream_matches
+
+# Viste servite da MongoDB. Stanno in un modulo separato da views.py così una richiesta
+# Mongo non importa DRF generics, i modelli ORM e il driver Postgres. Gli endpoint sono
+# pubblici in sola lettura: senza authentication_classes DRF non tocca sessione e utenti.
+
+def render(data):
+    # Le liste di partite e squadre sono codificate in un solo passaggio, senza il JSONRenderer
+    # di DRF (vedi fast_json). Con MONGO_FAST_JSON = False si torna alla Response di DRF.
+    if getattr(settings, "MONGO_FAST_JSON", True):
+        return json_response(data)
+    return Response(data)
+
+def matches_response(request, query):
+    # Con ?stream=json|ndjson tutte le partite vengono codificate e inviate a blocchi;
+    # con ?cursor= o ?page_size= la risposta è una pagina {"next", "results"};
+    # senza, resta la vecchia lista di al massimo LIST_LIMIT partite: se è stata tagliata lo dicono
+    # X-Truncated e un Link rel="next" alla pagina a cursore che la continua.
+    # ?fields= / ?exclude= diventano una proiezione: Mongo legge e invia solo quei campi.
+    params = request.query_params
+    try:
+        fields, exclude, stream = list_options(params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    projection = mongo_projection(fields, exclude) or {"_id": 0}
+    if stream:
+        return stream_matches(request, get_collection(), query, stream, projection)
+    if "cursor" not in params and "page_size" not in params:
+        page = paginate(get_collection(), query, None, LIST_LIMIT, fields, exclude)
+        return mark_truncated(render(page["results"]), request, page["next"], LIST_LIMIT)
+    try:
+        page = paginate(get_collection(), query, params.get("cursor"), params.get("page_size"), fields, exclude)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return render(page)
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def all_matches_mongo(request):
+    return matches_response(request, {})
+
+# Squadre e leghe si leggono dalle collezioni compatte "teams" e "leagues" mantenute
+# dall'ingestione; finché non esistono si ricade sulle vecchie query su "matches".
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def all_leagues_mongo(request):
+    leagues = list(get_collection("leagues").find({}, {"_id": 0, "id": 1, "name": 1}).sort("name", 1))
+    if not leagues:
+        leagues = get_collection().distinct("league")
+    return render(leagues)
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def all_teams_mongo(request):
+    try:
+        query = teams_query(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    teams = list(get_collection("teams").find(query, {"_id": 0, "id": 1, "name": 1}).sort("name", 1))
+    if not teams and get_collection("teams").find_one({}, {"_id": 1}) is None:
+        teams = list(get_collection().aggregate(teams_pipeline(query)))
+    return render(teams)
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def filter_matches_mongo(request):
+    try:
+        query = filter_query(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return matches_response(request, query)
+ 
+# Endpoint batch per la home dell'app: partite di tutte le squadre e leghe seguite con
+# una sola query $in (ogni ramo dell'$or usa il suo indice), raggruppate per entità.
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def batch_matches_mongo(request):
+    params = request.query_params
+    try:
+        team_ids, league_ids, window = batch_options(params)
+        fields, exclude = parse_selection(params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    projection = mongo_projection(fields, exclude, keep=BATCH_KEYS) or {"_id": 0}
+    cursor = get_collection().find(batch_query(team_ids, league_ids, window), projection)
+    docs = list(cursor.sort(MATCH_ORDER).limit(BATCH_LIMIT + 1))
+    return render(batch_result(team_ids, league_ids, docs, fields, exclude))
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def calendar_month_mongo(request, month):
+    # Un mese di calendario = una lettura per _id del bucket precalcolato dall'ingestione
+    # (partite raggruppate per giorno + conteggi per giorno), per tutte le partite o per lega/squadra.
+    if parse_month(month) is None:
+        return Response({"error": "Invalid month, expected yyyy-mm"}, status=400)
+    league_id = request.query_params.get("league")
+    team_id = request.query_params.get("team")
+    if league_id and team_id:
+        return Response({"error": "Filter by league or by team, not both"}, status=400)
+    scope = ALL
+    try:
+        if league_id:
+            scope = f"league:{int(league_id)}"
+        elif team_id:
+            scope = f"team:{int(team_id)}"
+    except ValueError:
+        return Response({"error": "Invalid league or team id"}, status=400)
+    try:
+        fields, exclude = parse_selection(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    calendar = get_collection("calendar")
+    bucket = calendar.find_one({"_id": bucket_id(month, scope)})
+    if bucket is None and calendar.find_one({}, {"_id": 1}) is None:
+        # Calendario non ancora costruito dall'ingestione: si calcola al volo.
+        buckets = build_month_buckets(month, month_matches(get_collection(), month))
+        bucket = next((b for b in buckets if b["scope"] == scope), None)
+    if bucket is None:
+        # Nessuna partita nel mese per questo filtro (anche id inesistenti): nessuna scansione.
+        bucket = empty_bucket(month, scope)
+    del bucket["_id"]
+    # Il bucket è un documento unico precalcolato: fields/exclude si applicano alle partite in Python.
+    if fields is not None or exclude:
+        bucket["days"] = {day: [select(m, fields, exclude) for m in matches] for day, matches in bucket["days"].items()}
+    return render(bucket)
+
+@conditional_response
+@cache_response
+@api_view(["GET"])
+@authentication_classes([])
+def standings_mongo(request):
+    # Classifica di una lega: un documento per (lega, stagione) tenuto aggiornato dall'ingestione,
+    # letto per _id; qui si ordinano solo le sue righe, una per squadra.
+    # Senza ?season= si usa l'ultima stagione della lega.
+    try:
+        league_id = int(request.query_params.get("league", ""))
+    except ValueError:
+        return Response({"error": "Invalid or missing league id"}, status=400)
+    collection = get_collection("standings")
+    season = request.query_params.get("season")
+    if season:
+        doc = collection.find_one({"_id": standing_id(league_id, season)})
+    else:
+        doc = collection.find_one({"league.id": league_id}, sort=[("season", -1)])
+    if doc is None:
+        return Response({"error": "No standings for this league and season"}, status=404)
+    return render({"league": doc["league"], "season": doc["season"], "table": ranked(doc)})
+
+# Prossime partite da adesso, per orario di inizio UTC. Dipende dall'ora oltre che dai dati,
+# quindi niente cache per generazione né ETag.
+@api_view(["GET"])
+@authentication_classes([])
+def upcoming_matches_mongo(request):
+    try:
+        query, limit = upcoming_options(request.query_params, datetime.now(timezone.utc))
+        fields, exclude = parse_selection(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    projection = mongo_projection(fields, exclude) or {"_id": 0}
+    return render(list(get_collection().find(query, projection).sort(KICKOFF_ORDER).limit(limit)))
+
+@api_view(["GET"])
+@authentication_classes([])
+def response_cache_stats(request):
+    return Response(get_response_cache().stats())
@@ -0,0 +1,118 @@
+import base64
+import binascii
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from matches_calendar.field_selection import mongo_projection, select
+from utils.mongo import MATCH_ORDER
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+CURSOR_FIELDS = ("date", "time", "_id")
+
+
+def encode_cursor(doc):
+    """Opaque token for the position right after ``doc`` in MATCH_ORDER."""
+    position = [doc.get("date"), doc.get("time"), str(doc["_id"])]
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date, time, match_id = json.loads(raw)
+        return date, time, ObjectId(match_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+
+def _equal(field, value):
+    # In Mongo {"field": None} matches both null and missing values, which sort together.
+    return {field: value}
+
+
+def _after(field, value):
+    # null/missing sort before every string, so "after null" means "not null".
+    return {field: {"$ne": None}} if value is None else {field: {"$gt": value}}
+
+
+def keyset_filter(date, time, match_id):
+    """Matches strictly after (date, time, _id) in MATCH_ORDER.
+
+    The leading ``date >= last date`` bound turns the page into a single range
+    scan of the (…, date, time, _id) index starting at the cursor, however deep
+    the client pages; the ``$or`` only discards the few keys that share the date.
+    """
+    position = {"$or": [
+        _after("date", date),
+        {**_equal("date", date), **_after("time", time)},
+        {**_equal("date", date), **_equal("time", time), "_id": {"$gt": match_id}},
+    ]}
+    if date is None:
+        return position
+    return {"$and": [{"date": {"$gte": date}}, position]}
+
+
+def parse_page_size(value):
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError("Invalid page_size")
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return size
+
+
+def page_query(query, cursor=None, page_size=None, fields=None, exclude=()):
+    """``(query, projection, size)`` of a page: the position filter added, the sort keys always fetched."""
+    size = parse_page_size(page_size)
+    if cursor:
+        position = keyset_filter(*decode_cursor(cursor))
+        query = {"$and": [query, position]} if query else position
+    return query, mongo_projection(fields, exclude, keep=CURSOR_FIELDS), size
+
+
+def page_result(docs, size, fields=None, exclude=()):
+    """The page built from up to ``size + 1`` documents fetched in MATCH_ORDER."""
+    next_token = encode_cursor(docs[size - 1]) if len(docs) > size else None
+    results = []
+    for doc in docs[:size]:
+        del doc["_id"]
+        results.append(select(doc, fields, exclude))
+    return {"next": next_token, "results": results}
+
+
+def paginate(collection, query, cursor=None, page_size=None, fields=None, exclude=()):
+    """One page of ``query`` in MATCH_ORDER: ``{"next": token or None, "results": [...]}``.
+
+    ``fields`` / ``exclude`` (see field_selection) become a projection; the sort
+    keys are always fetched for the cursor and trimmed from the results.
+    """
+    query, projection, size = page_query(query, cursor, page_size, fields, exclude)
+    docs = list(collection.find(query, projection).sort(MATCH_ORDER).limit(size + 1))
+    return page_result(docs, size, fields, exclude)
+
+
+def mark_truncated(response, request, next_token, page_size):
+    """Flag a plain list cut at its limit: ``X-Truncated: true`` and a ``Link`` (rel="next") to the
+    cursor page that continues it. Does nothing when nothing was left out."""
+    if next_token is None:
+        return response
+    params = request.GET.copy()
+    params["cursor"] = next_token
+    params["page_size"] = str(page_size)
+    response["X-Truncated"] = "true"
+    response["Link"] = f'<{request.path}?{params.urlencode()}>; rel="next"'
+    return response
+
+
+async def apaginate(collection, query, cursor=None, page_size=None, fields=None, exclude=()):
+    """``paginate()`` on a collection of the async client."""
+    query, projection, size = page_query(query, cursor, page_size, fields, exclude)
+    docs = await collection.find(query, projection).sort(MATCH_ORDER).limit(size + 1).to_list()
+    return page_result(docs, size, fields, exclude)
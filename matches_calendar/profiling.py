@@ -0,0 +1,112 @@
+import cProfile
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Worker-side timings reported by parse_season_file for every season file.
+PARSE_STAGES = ("read", "json", "dates", "normalize")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command the client sends, i.e. the real Mongo round trips."""
+
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    @property
+    def total(self):
+        return sum(self.commands.values())
+
+
+class IngestProfiler:
+    """Per-stage timings, per-file and per-league breakdowns of an ingestion run.
+
+    Stage times measured in the writer process are wall-clock; the parse stages
+    (``PARSE_STAGES``) are summed over files and so are worker CPU time when a
+    process pool is used.
+    """
+
+    def __init__(self, cprofile_path=None):
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.files = []
+        self.leagues = defaultdict(Counter)
+        self.mongo = CommandCounter()
+        self.cprofile_path = cprofile_path
+        self._cprofile = cProfile.Profile() if cprofile_path else None
+        if self._cprofile:
+            self._cprofile.enable()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - started
+
+    def record_file(self, json_file, status, fixtures=0, seconds=0.0, timings=None):
+        for name, value in (timings or {}).items():
+            self.stages[name] += value
+        self.files.append({
+            "file": os.path.basename(json_file),
+            "status": status,
+            "fixtures": fixtures,
+            "seconds": round(seconds, 4),
+            "timings": {name: round(value, 4) for name, value in (timings or {}).items()},
+        })
+
+    def count(self, league_name, outcome, n=1):
+        self.leagues[league_name][outcome] += n
+
+    def report(self, stats, **extra):
+        duration = time.perf_counter() - self.started
+        parse_seconds = sum(self.stages[name] for name in PARSE_STAGES)
+        write_seconds = self.stages["resolve"] + self.stages["mongo_write"]
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(duration, 3),
+            **extra,
+            "counts": {key: value for key, value in stats.items() if isinstance(value, int)},
+            "stages": {name: round(value, 4) for name, value in sorted(self.stages.items())},
+            "throughput": {
+                "parsed_fixtures_per_second": rate(stats.get("parsed", 0), parse_seconds),
+                "written_fixtures_per_second": rate(stats.get("written", 0), write_seconds),
+                "fixtures_per_second": rate(stats.get("parsed", 0), duration),
+            },
+            "mongo": {"round_trips": self.mongo.total, "commands": dict(self.mongo.commands)},
+            "files": self.files,
+            "leagues": {name: dict(counts) for name, counts in sorted(self.leagues.items())},
+        }
+
+    def finish(self, report, report_path=None):
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            logger.info(f"cProfile data written to {self.cprofile_path}")
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, default=str)
+            logger.info(f"Ingestion report written to {report_path}")
+
+
+def rate(count, seconds):
+    return round(count / seconds) if seconds > 0 else 0
@@ -0,0 +1,203 @@
+"""Query-string parsing and Mongo queries shared by the sync and async Mongo views.
+
+Invalid input raises ValueError with the message the views send back in a 400.
+"""
+
+from datetime import datetime, timedelta
+
+from django.utils.dateparse import parse_date
+
+from .field_selection import parse_selection, select
+from .streaming import STREAM_FORMATS
+
+LIST_LIMIT = 1000
+MAX_BATCH_IDS = 100
+BATCH_LIMIT = 2000
+BATCH_KEYS = ("home_team.id", "away_team.id", "league.id")
+UPCOMING_LIMIT = 10
+MAX_UPCOMING_LIMIT = 100
+UPCOMING_DAYS = 30
+MAX_UPCOMING_DAYS = 366
+# With ?live=1 matches that kicked off this long ago are still listed (in progress).
+LIVE_WINDOW = timedelta(hours=2, minutes=30)
+
+
+def list_options(params):
+    """``(fields, exclude, stream)`` of a match list request."""
+    fields, exclude = parse_selection(params)
+    stream = params.get("stream")
+    if stream and stream not in STREAM_FORMATS:
+        raise ValueError(f"stream must be one of: {', '.join(STREAM_FORMATS)}")
+    return fields, exclude, stream
+
+
+def filter_query(params):
+    query = {}
+
+    # Filter by league
+    league_id = params.get("league")
+    if league_id:
+        try:
+            query["league.id"] = int(league_id)
+        except ValueError:
+            raise ValueError("Invalid league id")
+
+    # Filter by team (either home or away)
+    team_id = params.get("team")
+    if team_id:
+        try:
+            team_id = int(team_id)
+        except ValueError:
+            raise ValueError("Invalid team id")
+        query["team_ids"] = team_id
+
+    # Filter by single date
+    date = params.get("date")
+    if date:
+        parsed_date = parse_date(date)
+        if not parsed_date:
+            raise ValueError("Invalid date format")
+        query["date"] = parsed_date.strftime("%Y-%m-%d")
+
+    # Filter by date range
+    start = params.get("start_date")
+    end = params.get("end_date")
+    if start and end:
+        try:
+            start_d = datetime.strptime(start, "%Y-%m-%d").date().isoformat()
+            end_d = datetime.strptime(end, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            raise ValueError("Invalid date range format")
+        query["date"] = {"$gte": start_d, "$lte": end_d}
+
+    return query
+
+
+def teams_query(params):
+    # Filter by league membership
+    league_id = params.get("league")
+    if not league_id:
+        return {}
+    try:
+        return {"leagues": int(league_id)}
+    except ValueError:
+        raise ValueError("Invalid league id")
+
+
+def teams_pipeline(query):
+    """Aggregation listing the teams from the matches, used until the teams collection exists."""
+    match = [{"$match": {"league.id": query["leagues"]}}] if query else []
+    return match + [
+        {"$project": {"teams": ["$home_team", "$away_team"]}},
+        {"$unwind": "$teams"},
+        {"$group": {"_id": "$teams.id", "name": {"$first": "$teams.name"}}},
+        {"$project": {"id": "$_id", "name": 1, "_id": 0}},
+        {"$sort": {"name": 1}}
+    ]
+
+
+def parse_ids(params, name):
+    ids = []
+    for value in params.getlist(name):
+        for part in value.split(","):
+            if part.strip():
+                ids.append(int(part))
+    return list(dict.fromkeys(ids))
+
+
+def batch_options(params):
+    """``(team_ids, league_ids, date window)`` of a batch request; the window may be empty or open-ended."""
+    try:
+        team_ids, league_ids = parse_ids(params, "teams"), parse_ids(params, "leagues")
+    except ValueError:
+        raise ValueError("Invalid team or league id")
+    if not team_ids and not league_ids:
+        raise ValueError("Pass at least one id in teams or leagues")
+    if len(team_ids) + len(league_ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} teams and leagues per request")
+
+    window = {}
+    try:
+        if params.get("start_date"):
+            window["$gte"] = datetime.strptime(params["start_date"], "%Y-%m-%d").date().isoformat()
+        if params.get("end_date"):
+            window["$lte"] = datetime.strptime(params["end_date"], "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError("Invalid date range format")
+    return team_ids, league_ids, window
+
+
+def team_branches(team_ids):
+    return [{"team_ids": {"$in": team_ids}}] if team_ids else []
+
+
+def league_branches(league_ids):
+    return [{"league.id": {"$in": league_ids}}] if league_ids else []
+
+
+def batch_query(team_ids, league_ids, window):
+    """The one query of a batch request, shared by the sync and async views: read in MATCH_ORDER
+    with ``limit(BATCH_LIMIT + 1)`` and passed to ``batch_result()``."""
+    query = {"$or": team_branches(team_ids) + league_branches(league_ids)}
+    if window:
+        query["date"] = window
+    return query
+
+
+def batch_result(team_ids, league_ids, docs, fields=None, exclude=()):
+    """Batch response body; ``truncated`` when the query matched more than ``BATCH_LIMIT`` matches."""
+    teams, leagues = group_batch(team_ids, league_ids, docs[:BATCH_LIMIT], fields, exclude)
+    return {"teams": teams, "leagues": leagues, "truncated": len(docs) > BATCH_LIMIT}
+
+
+def group_batch(team_ids, league_ids, docs, fields=None, exclude=()):
+    """``(teams, leagues)``: the matches of every requested id, keyed by id; a match can be in several groups."""
+    teams = {str(team_id): [] for team_id in team_ids}
+    leagues = {str(league_id): [] for league_id in league_ids}
+    for doc in docs:
+        match = select(doc, fields, exclude)
+        home, away = (doc.get("home_team") or {}).get("id"), (doc.get("away_team") or {}).get("id")
+        for team_id in {home, away}:
+            if str(team_id) in teams:
+                teams[str(team_id)].append(match)
+        league_id = (doc.get("league") or {}).get("id")
+        if str(league_id) in leagues:
+            leagues[str(league_id)].append(match)
+    return teams, leagues
+
+
+def _bounded(params, name, default, maximum):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}")
+    if not 1 <= number <= maximum:
+        raise ValueError(f"{name} must be between 1 and {maximum}")
+    return number
+
+
+def upcoming_options(params, now):
+    """``(query, limit)`` of the next matches from ``now`` (an aware datetime).
+
+    The kickoff range is bounded on both sides (``days`` ahead), so with a league
+    or team it is one range scan of the ``(league.id | team_ids, kickoff, _id)`` index.
+    """
+    limit = _bounded(params, "limit", UPCOMING_LIMIT, MAX_UPCOMING_LIMIT)
+    days = _bounded(params, "days", UPCOMING_DAYS, MAX_UPCOMING_DAYS)
+    start = now - LIVE_WINDOW if params.get("live") in ("1", "true") else now
+    kickoff = {"$gte": start, "$lt": now + timedelta(days=days)}
+
+    league_id, team_id = params.get("league"), params.get("team")
+    if league_id and team_id:
+        raise ValueError("Filter by league or by team, not both")
+    try:
+        if league_id:
+            return {"league.id": int(league_id), "kickoff": kickoff}, limit
+        if team_id:
+            return {"team_ids": int(team_id), "kickoff": kickoff}, limit
+    except ValueError:
+        raise ValueError("Invalid league or team id")
+    return {"kickoff": kickoff}, limit
@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+PLACEHOLDER_TEAM = "N.N."
+
+
+class FixtureResolver:
+    """Finds the stored document an incoming fixture corresponds to, in memory.
+
+    All fixtures of a (league, season) are loaded with a single query the first
+    time that league-season is seen, and indexed by (matchday, date). Lookups then
+    need no query: an exact home/away match wins, otherwise a stored fixture whose
+    teams are still "N.N." placeholders is promoted to the real teams. Each stored
+    fixture is claimed at most once per run, so two knockout ties played on the
+    same day cannot collapse onto the same placeholder document.
+
+    Only the ``projection`` fields are loaded, and ``drop()`` releases a
+    league-season once it is no longer needed, so memory follows the files in
+    progress rather than the whole collection.
+    """
+
+    def __init__(self, matches_col, projection=None):
+        self.matches_col = matches_col
+        self.projection = projection
+        self.by_season = {}
+        self.slots = defaultdict(list)
+        self.claimed = set()
+
+    def load(self, league_name, season):
+        """Load a league-season if needed. Returns True when a query was made."""
+        if (league_name, season) in self.by_season:
+            return False
+        docs = self.by_season[(league_name, season)] = []
+        for doc in self.matches_col.find({"league.name": league_name, "season": season}, self.projection):
+            docs.append(doc)
+            self.slots[(league_name, season, doc.get("matchday"), doc.get("date"))].append(doc)
+        return True
+
+    def drop(self, league_name, season):
+        """Forget a loaded league-season. Claims are kept, so a later reload cannot claim a fixture twice."""
+        for doc in self.by_season.pop((league_name, season), []):
+            self.slots.pop((league_name, season, doc.get("matchday"), doc.get("date")), None)
+
+    def existing(self, league_name, season):
+        """Every stored fixture of a loaded league-season."""
+        return self.by_season.get((league_name, season), [])
+
+    def resolve(self, doc):
+        """Return and claim the stored document ``doc`` should update, or None for a new fixture."""
+        slot = self.slots.get((doc["league"]["name"], doc["season"], doc["matchday"], doc["date"]), ())
+        home, away = doc["home_team"]["name"], doc["away_team"]["name"]
+
+        best, best_placeholders = None, 3
+        for stored in slot:
+            if stored["_id"] in self.claimed:
+                continue
+            stored_home = stored.get("home_team", {}).get("name")
+            stored_away = stored.get("away_team", {}).get("name")
+            if stored_home not in (home, PLACEHOLDER_TEAM) or stored_away not in (away, PLACEHOLDER_TEAM):
+                continue
+            placeholders = (stored_home != home) + (stored_away != away)
+            if placeholders < best_placeholders:
+                best, best_placeholders = stored, placeholders
+                if not placeholders:
+                    break
+
+        if best is not None:
+            self.claimed.add(best["_id"])
+        return best
@@ -0,0 +1,118 @@
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _JsonStream:
+    """Minimal pull reader over a JSON text file, decoding one value at a time.
+
+    Only the unread tail of the file is buffered, so memory is bounded by the
+    largest single value decoded (one matchday), not by the file size.
+    """
+
+    def __init__(self, f, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON file")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: grow the buffer geometrically so a large value
+                # is not re-scanned once per chunk.
+                if not self._fill(max(self.chunk_size, len(self.buf) - self.pos)):
+                    raise
+                continue
+            # A number or literal touching the end of the buffer may be truncated.
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_top_level(f, chunk_size):
+    """Yield ``(key, value)`` for the season object, one ``("matchday", md)`` per matchday."""
+    stream = _JsonStream(f, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "matchdays" and stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() != "]":
+                while True:
+                    yield "matchday", stream.value()
+                    if stream.peek() != ",":
+                        break
+                    stream.expect(",")
+            stream.expect("]")
+        else:
+            yield key, stream.value()
+        if stream.peek() != ",":
+            break
+        stream.expect(",")
+    stream.expect("}")
+
+
+def iter_season_file(json_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a season file as ``(league_name, season, matchday)`` tuples.
+
+    Equivalent to ``json.load`` followed by a walk of ``data["matchdays"]``, but
+    only one matchday is held in memory at a time. If the matchdays precede the
+    ``league``/``season`` keys, the file is scanned once more to read them first.
+    """
+    meta = {}
+    with open(json_file, "r", encoding="utf-8") as f:
+        for key, value in _iter_top_level(f, chunk_size):
+            if key != "matchday":
+                meta[key] = value
+                continue
+            if "league" not in meta or "season" not in meta:
+                break
+            yield meta["league"], meta["season"], value
+        else:
+            return
+
+    with open(json_file, "r", encoding="utf-8") as f:
+        for key, value in _iter_top_level(f, chunk_size):
+            if key != "matchday":
+                meta[key] = value
+    league_name = meta.get("league", "Unknown League")
+    season = meta.get("season", "Unknown Season")
+    with open(json_file, "r", encoding="utf-8") as f:
+        for key, value in _iter_top_level(f, chunk_size):
+            if key == "matchday":
+                yield league_name, season, value
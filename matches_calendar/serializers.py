@@ -1,6 +1,49 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from .field_selection import parse_selection
 from .models import Match, League, Team
 
+
+# ?fields= / ?exclude= sulle letture: i campi non richiesti vengono tolti dal serializer,
+# così non vengono nemmeno calcolati. Percorsi puntati (home_team.name) per i serializer annidati.
+class DynamicFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        try:
+            fields, exclude = parse_selection(request.query_params, allowed=None)
+        except ValueError as e:
+            raise serializers.ValidationError({'fields': [str(e)]})
+        if fields is None and not exclude:
+            return
+
+        known = set(self.fields)
+        for name, field in self.fields.items():
+            if isinstance(field, serializers.Serializer):
+                known.update(f'{name}.{sub}' for sub in field.fields)
+        unknown = (fields or exclude) - known
+        if unknown:
+            raise serializers.ValidationError({'fields': [f"Unknown fields: {', '.join(sorted(unknown))}"]})
+
+        for name in list(self.fields):
+            subs = {path.partition('.')[2] for path in (fields or exclude) if path.startswith(name + '.')}
+            if fields is not None:
+                if name in fields:
+                    continue
+                if not subs:
+                    self.fields.pop(name)
+                    continue
+                nested = self.fields[name].fields
+                for sub in set(nested) - subs:
+                    nested.pop(sub)
+            elif name in exclude:
+                self.fields.pop(name)
+            else:
+                for sub in subs:
+                    self.fields[name].fields.pop(sub)
+
 # Serializer per la Squadra
 class TeamSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,7 +57,7 @@ class LeagueSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 # Serializer per la Partita
-class MatchSerializer(serializers.ModelSerializer):
+class MatchSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     home_team = TeamSerializer()
     away_team = TeamSerializer()
     league = LeagueSerializer()
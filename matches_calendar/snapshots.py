@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+try:
+    import brotli
+except ImportError:  # optional: only the .gz variants are written
+    brotli = None
+
+from utils.mongo import MATCH_ORDER
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+KINDS = ("leagues", "teams", "months")
+
+
+def _default(value):
+    # Datetimes read by the ingestion client are naive UTC.
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc).isoformat() if value.tzinfo is None else value.isoformat()
+    return str(value)
+
+
+def encode(docs):
+    return json.dumps(docs, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def season_slug(season):
+    return str(season).replace("/", "-")
+
+
+def _group_queries(matches_col):
+    """League-season, team-season and month snapshots as ``{kind: [(path, query)]}``, sorted by path.
+
+    Only the group keys are read here; the matches of each group are loaded when it is written.
+    """
+    groups = {kind: [] for kind in KINDS}
+    for league_id in matches_col.distinct("league.id"):
+        if league_id is None:
+            continue
+        for season in matches_col.distinct("season", {"league.id": league_id}):
+            if season:
+                groups["leagues"].append((f"leagues/{league_id}/{season_slug(season)}.json",
+                                          {"league.id": league_id, "season": season}))
+    # team_ids never holds the placeholder team.
+    for team_id in matches_col.distinct("team_ids"):
+        for season in matches_col.distinct("season", {"team_ids": team_id, "league.id": {"$ne": None}}):
+            if season:
+                groups["teams"].append((f"teams/{team_id}/{season_slug(season)}.json",
+                                        {"team_ids": team_id, "season": season, "league.id": {"$ne": None}}))
+    months = {date[:7] for date in matches_col.distinct("date") if isinstance(date, str) and len(date) >= 7}
+    for month in months:
+        groups["months"].append((f"months/{month}.json", {"date": {"$gte": month, "$lt": f"{month}~"}}))
+    for entries in groups.values():
+        entries.sort()
+    return groups
+
+
+def _meta(kind, query, docs):
+    if kind == "leagues":
+        return {"id": query["league.id"], "name": docs[0]["league"].get("name"), "season": query["season"]}
+    if kind == "teams":
+        side = "home_team" if docs[0]["home_team"].get("id") == query["team_ids"] else "away_team"
+        return {"id": query["team_ids"], "name": docs[0][side].get("name"), "season": query["season"]}
+    return {"month": query["date"]["$gte"]}
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_variants(out_dir, path, body):
+    _write_atomic(os.path.join(out_dir, path), body)
+    # mtime=0 keeps the .gz byte-identical between runs for unchanged data.
+    _write_atomic(os.path.join(out_dir, path + ".gz"), gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(os.path.join(out_dir, path + ".br"), brotli.compress(body))
+    elif os.path.exists(os.path.join(out_dir, path + ".br")):
+        # A static server would prefer the outdated .br over the new file.
+        os.remove(os.path.join(out_dir, path + ".br"))
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {entry["path"]: entry["sha256"] for kind in KINDS for entry in manifest.get(kind, [])}
+
+
+def write_snapshots(matches_col, out_dir, generation=None):
+    """Write pre-serialized, pre-compressed JSON snapshots of every league-season,
+    team-season and month, plus ``manifest.json`` listing them.
+
+    Snapshots whose content did not change are left untouched (CDN caches and
+    ETags stay valid), snapshots that no longer exist are deleted, and every
+    file is replaced atomically so a static server never sees a partial one.
+    Matches are read one snapshot at a time, so memory is bounded by the
+    largest snapshot rather than by the whole collection.
+    """
+    previous = _load_manifest(out_dir)
+    groups = _group_queries(matches_col)
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "generation": generation,
+        "encodings": ["gzip", "br"] if brotli is not None else ["gzip"],
+    }
+    written = unchanged = 0
+    for kind in KINDS:
+        entries = []
+        for path, query in groups[kind]:
+            docs = list(matches_col.find(query, {"_id": 0}).sort(MATCH_ORDER))
+            if not docs:  # deleted since the keys were read
+                continue
+            meta = _meta(kind, query, docs)
+            body = encode(docs)
+            digest = hashlib.sha256(body).hexdigest()
+            if previous.get(path) == digest and os.path.exists(os.path.join(out_dir, path)):
+                unchanged += 1
+            else:
+                _write_variants(out_dir, path, body)
+                written += 1
+            entries.append({**meta, "path": path, "matches": len(docs), "bytes": len(body), "sha256": digest})
+        manifest[kind] = entries
+
+    current = {entry["path"] for kind in KINDS for entry in manifest[kind]}
+    removed = 0
+    for path in set(previous) - current:
+        for variant in (path, path + ".gz", path + ".br"):
+            try:
+                os.remove(os.path.join(out_dir, variant))
+                removed += variant == path
+            except FileNotFoundError:
+                pass
+
+    _write_atomic(os.path.join(out_dir, MANIFEST), json.dumps(manifest, ensure_ascii=False, indent=1).encode())
+    logger.info(f"Snapshots in {out_dir}: {written} written, {unchanged} unchanged, {removed} removed.")
+    return {"written": written, "unchanged": unchanged, "removed": removed}
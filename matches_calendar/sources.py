@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIRROR_DIR = '.football_calendar_mirror'
+
+
+def _git(*args, cwd=None):
+    result = subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+class GitMirrorSource:
+    """Persistent clone of the data repository, refreshed with an incremental fetch.
+
+    The first run clones ``branch`` into ``mirror_dir``; later runs only fetch the
+    new commits. ``changed_files`` lists what changed since a previously ingested
+    commit, so unchanged season files are never opened.
+    """
+
+    def __init__(self, repo_url, branch='main', mirror_dir=DEFAULT_MIRROR_DIR):
+        self.repo_url = repo_url
+        self.branch = branch
+        self.mirror_dir = mirror_dir
+        self.revision = None
+
+    @property
+    def state_id(self):
+        return f"source:git:{self.repo_url}#{self.branch}"
+
+    def prepare(self):
+        if os.path.isdir(os.path.join(self.mirror_dir, '.git')):
+            try:
+                _git('fetch', '--quiet', 'origin', self.branch, cwd=self.mirror_dir)
+                _git('reset', '--quiet', '--hard', 'FETCH_HEAD', cwd=self.mirror_dir)
+                logger.info(f"Fetched {self.branch} into existing mirror {self.mirror_dir}")
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Mirror update failed ({e.stderr.strip()}), cloning again.")
+                shutil.rmtree(self.mirror_dir, ignore_errors=True)
+
+        if not os.path.isdir(os.path.join(self.mirror_dir, '.git')):
+            if os.path.exists(self.mirror_dir):
+                shutil.rmtree(self.mirror_dir, ignore_errors=True)
+            _git('clone', '--quiet', '--single-branch', '-b', self.branch, self.repo_url, self.mirror_dir)
+            logger.info(f"Cloned {self.repo_url} into mirror {self.mirror_dir}")
+
+        self.revision = _git('rev-parse', 'HEAD', cwd=self.mirror_dir)
+        return self.mirror_dir
+
+    def changed_files(self, since_revision, folder):
+        """Paths under ``folder`` added or modified since ``since_revision``.
+
+        Returns None when the answer is unknown (no previous revision, or one the
+        mirror does not have), meaning every file must be considered.
+        """
+        if not since_revision or not self.revision:
+            return None
+        try:
+            _git('cat-file', '-e', f'{since_revision}^{{commit}}', cwd=self.mirror_dir)
+            names = _git('diff', '--name-only', '--diff-filter=ACMR', since_revision, self.revision,
+                         '--', folder, cwd=self.mirror_dir)
+        except subprocess.CalledProcessError:
+            return None
+        return [os.path.join(self.mirror_dir, name) for name in names.splitlines() if name]
+
+    def cleanup(self):
+        pass
+
+
+class LocalDirectorySource:
+    """Season files already on disk, e.g. a checkout made by CI."""
+
+    def __init__(self, path):
+        self.path = path
+        self.revision = None
+
+    @property
+    def state_id(self):
+        return f"source:dir:{os.path.abspath(self.path)}"
+
+    def prepare(self):
+        if not os.path.isdir(self.path):
+            raise FileNotFoundError(f"Source directory '{self.path}' does not exist.")
+        return self.path
+
+    def changed_files(self, since_revision, folder):
+        return None
+
+    def cleanup(self):
+        pass
+
+
+class TarballSource:
+    """A ``.tar.gz`` snapshot of the data repository, from a local path or a URL."""
+
+    def __init__(self, location):
+        self.location = location
+        self.revision = None
+        self._tmp = None
+
+    @property
+    def state_id(self):
+        return f"source:tarball:{self.location}"
+
+    def prepare(self):
+        self._tmp = tempfile.mkdtemp(prefix='football_calendar_')
+        archive = self.location
+        if archive.startswith(('http://', 'https://')):
+            archive = os.path.join(self._tmp, 'source.tar.gz')
+            urllib.request.urlretrieve(self.location, archive)
+
+        digest = hashlib.sha256()
+        with open(archive, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self.revision = digest.hexdigest()
+
+        root = os.path.join(self._tmp, 'root')
+        with tarfile.open(archive) as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(root, filter='data')
+            else:
+                tar.extractall(root)
+
+        # GitHub archives wrap everything in a single "<repo>-<ref>/" directory.
+        entries = os.listdir(root)
+        if len(entries) == 1 and os.path.isdir(os.path.join(root, entries[0])):
+            root = os.path.join(root, entries[0])
+        return root
+
+    def changed_files(self, since_revision, folder):
+        return None
+
+    def cleanup(self):
+        if self._tmp:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            self._tmp = None
@@ -0,0 +1,171 @@
+import logging
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("played", "won", "drawn", "lost", "goals_for", "goals_against", "points")
+SCORE_FIELDS = {"_id": 0, "season": 1, "is_cancelled": 1, "score_home": 1, "score_away": 1,
+                "league.id": 1, "league.name": 1, "home_team.id": 1, "home_team.name": 1,
+                "away_team.id": 1, "away_team.name": 1}
+
+
+def standing_id(league_id, season):
+    return f"{league_id}:{season}"
+
+
+def contributions(doc):
+    """``[(team, counters)]`` a match adds to its league-season table; empty unless it has a final score."""
+    if not doc or doc.get("is_cancelled") or (doc.get("league") or {}).get("id") is None:
+        return []
+    home_score, away_score = doc.get("score_home"), doc.get("score_away")
+    if home_score is None or away_score is None:
+        return []
+    rows = []
+    for side, scored, conceded in (("home_team", home_score, away_score), ("away_team", away_score, home_score)):
+        team = doc.get(side) or {}
+        if team.get("id") is None:
+            continue
+        rows.append((team, {
+            "played": 1, "won": int(scored > conceded), "drawn": int(scored == conceded),
+            "lost": int(scored < conceded), "goals_for": scored, "goals_against": conceded,
+            "points": 3 if scored > conceded else int(scored == conceded),
+        }))
+    return rows
+
+
+def compute_tables(docs):
+    """Full recompute: ``{standing id: standings document}`` from every match of the given docs."""
+    tables = {}
+    for doc in docs:
+        for team, counters in contributions(doc):
+            league, season = doc["league"], doc.get("season")
+            table = tables.setdefault(standing_id(league["id"], season), {
+                "_id": standing_id(league["id"], season),
+                "league": {"id": league["id"], "name": league.get("name")}, "season": season, "rows": {},
+            })
+            row = table["rows"].setdefault(str(team["id"]), {
+                "team": {"id": team["id"], "name": team.get("name")}, **dict.fromkeys(COUNTERS, 0),
+            })
+            for name, value in counters.items():
+                row[name] += value
+    return tables
+
+
+def ranked(doc):
+    """The table of a standings document: rows by points, goal difference, goals scored, then name."""
+    rows = [
+        {**row, "goal_difference": row["goals_for"] - row["goals_against"]}
+        for row in doc.get("rows", {}).values() if row.get("played")
+    ]
+    rows.sort(key=lambda row: (-row["points"], -row["goal_difference"], -row["goals_for"], row["team"]["name"] or ""))
+    return [{"position": position, **row} for position, row in enumerate(rows, 1)]
+
+
+def _comparable(doc):
+    # Rows left at zero by corrections (e.g. a renamed team) are not part of the table.
+    return {team: {name: row.get(name, 0) for name in COUNTERS}
+            for team, row in (doc or {}).get("rows", {}).items() if row.get("played")}
+
+
+class Standings:
+    """League tables of the ``standings`` collection, one document per league-season, kept by ingestion.
+
+    For every fixture it writes or deletes, ingestion passes the stored and the
+    new version to ``change()``, which marks the league-season dirty when its
+    contribution to the table changes. ``save()`` records the dirty tables in
+    ``meta`` before the matches are written, and ``flush()`` recomputes them from
+    the stored matches (one query per table), so a run that dies in between is
+    repaired by the next one. Documents look like:
+
+        {_id: "<league id>:<season>", league: {id, name}, season,
+         rows: {"<team id>": {team: {id, name}, played, won, drawn, lost, goals_for, goals_against, points}}}
+    """
+
+    MARKER = "standings_dirty"
+
+    def __init__(self, db):
+        self.collection = db["standings"]
+        self.meta = db["meta"]
+        self.dirty = set()
+        self.saved = set()
+
+    def is_empty(self):
+        return self.collection.find_one({}, {"_id": 1}) is None
+
+    def change(self, old, new):
+        """Record a fixture going from ``old`` to ``new`` (either None for an insert or a deletion)."""
+        if contributions(old) == contributions(new):
+            return
+        for doc in (old, new):
+            if contributions(doc):
+                self.dirty.add((doc["league"]["id"], doc.get("season")))
+
+    def save(self):
+        """Record the dirty tables not saved yet; call it before writing the matches that changed them."""
+        unsaved = self.dirty - self.saved
+        if unsaved:
+            self.meta.update_one({"_id": self.MARKER},
+                                 {"$addToSet": {"tables": {"$each": [list(table) for table in sorted(unsaved, key=str)]}}},
+                                 upsert=True)
+            self.saved |= unsaved
+
+    def flush(self, matches_col):
+        """Recompute the dirty tables, including those left by an interrupted run. Returns their number."""
+        marker = self.meta.find_one({"_id": self.MARKER}) or {}
+        tables = self.dirty | {tuple(table) for table in marker.get("tables", [])}
+        for league_id, season in sorted(tables, key=str):
+            _id = standing_id(league_id, season)
+            docs = matches_col.find({"league.id": league_id, "season": season, "score_home": {"$ne": None}},
+                                    SCORE_FIELDS)
+            table = compute_tables(docs).get(_id)
+            if table:
+                self.collection.replace_one({"_id": _id}, table, upsert=True)
+            else:
+                self.collection.delete_one({"_id": _id})
+        if marker:
+            self.meta.delete_one({"_id": self.MARKER})
+        self.dirty.clear()
+        self.saved.clear()
+        return len(tables)
+
+    def rebuild(self, matches_col):
+        """Recompute every table from the stored matches and replace the collection's documents."""
+        self.dirty.clear()
+        self.saved.clear()
+        self.meta.delete_one({"_id": self.MARKER})
+        tables = compute_tables(matches_col.find({"score_home": {"$ne": None}}, SCORE_FIELDS))
+        if tables:
+            self.collection.bulk_write([ReplaceOne({"_id": _id}, doc, upsert=True) for _id, doc in tables.items()],
+                                       ordered=False)
+        self.collection.delete_many({"_id": {"$nin": list(tables)}})
+        logger.info(f"Built {len(tables)} standings tables from stored matches.")
+        return len(tables)
+
+    def verify(self, matches_col, fix=False):
+        """Compare every stored table with a full recompute from the matches.
+
+        Returns ``{standing id: {team id: {counter: [stored, expected]}}}`` for the
+        tables that differ (a missing or extra table shows all its rows). With
+        ``fix`` those tables are replaced by the recomputed ones.
+        """
+        expected = compute_tables(matches_col.find({"score_home": {"$ne": None}}, SCORE_FIELDS))
+        stored = {doc["_id"]: doc for doc in self.collection.find({})}
+        mismatches = {}
+        for _id in sorted(set(expected) | set(stored)):
+            want, have = _comparable(expected.get(_id)), _comparable(stored.get(_id))
+            rows = {}
+            for team in sorted(set(want) | set(have)):
+                empty = dict.fromkeys(COUNTERS, 0)
+                diff = {name: [have.get(team, empty)[name], value]
+                        for name, value in want.get(team, empty).items() if have.get(team, empty)[name] != value}
+                if diff:
+                    rows[team] = diff
+            if rows:
+                mismatches[_id] = rows
+        if fix and mismatches:
+            for _id in mismatches:
+                if _id in expected:
+                    self.collection.replace_one({"_id": _id}, expected[_id], upsert=True)
+                else:
+                    self.collection.delete_one({"_id": _id})
+        return mismatches
@@ -0,0 +1,89 @@
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from utils.mongo import MATCH_ORDER
+from .fast_json import dumps
+
+STREAM_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+BATCH_SIZE = 500
+
+
+def _batches(cursor, batch_size):
+    batch = []
+    for doc in cursor.batch_size(batch_size):
+        batch.append(dumps(doc))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_encoded(cursor, fmt, batch_size=BATCH_SIZE):
+    """Encode a cursor one batch at a time: each yielded chunk is one cursor batch.
+
+    Only the current batch and its encoding are held in memory, so memory and
+    time-to-first-byte do not depend on the size of the result.
+    """
+    try:
+        if fmt == "ndjson":
+            for batch in _batches(cursor, batch_size):
+                yield b"\n".join(batch) + b"\n"
+            return
+        yield b"["
+        for i, batch in enumerate(_batches(cursor, batch_size)):
+            yield (b"," if i else b"") + b",".join(batch)
+        yield b"]"
+    finally:
+        cursor.close()
+
+
+async def aiter_encoded(cursor, fmt, batch_size=BATCH_SIZE):
+    # Under ASGI Django buffers synchronous iterators completely before sending
+    # anything, so the cursor is drained one batch per thread hop instead.
+    chunks = iter_encoded(cursor, fmt, batch_size)
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=False)()
+
+
+async def aiter_async_cursor(cursor, fmt, batch_size=BATCH_SIZE):
+    """``iter_encoded()`` for a cursor of the async client: no thread hops, batches are awaited."""
+    try:
+        first = True
+        if fmt == "json":
+            yield b"["
+        while batch := await cursor.to_list(batch_size):
+            encoded = [dumps(doc) for doc in batch]
+            if fmt == "ndjson":
+                yield b"\n".join(encoded) + b"\n"
+            else:
+                yield (b"" if first else b",") + b",".join(encoded)
+            first = False
+        if fmt == "json":
+            yield b"]"
+    finally:
+        await cursor.close()
+
+
+def stream_matches(request, collection, query, fmt, projection=None):
+    """StreamingHttpResponse with every match of ``query`` in MATCH_ORDER."""
+    cursor = collection.find(query, projection or {"_id": 0}).sort(MATCH_ORDER)
+    # DRF's Request proxies the ASGIRequest, which is the only one with a scope.
+    if getattr(request, "scope", None) is not None:
+        content = aiter_encoded(cursor, fmt)
+    else:
+        content = iter_encoded(cursor, fmt)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[fmt])
+
+
+def astream_matches(collection, query, fmt, projection=None):
+    """``stream_matches()`` for a collection of the async client."""
+    cursor = collection.find(query, projection or {"_id": 0}).sort(MATCH_ORDER).batch_size(BATCH_SIZE)
+    return StreamingHttpResponse(aiter_async_cursor(cursor, fmt), content_type=STREAM_FORMATS[fmt])
@@ -1,3 +1,1444 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gc
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import subprocess
+import sys
+import tarfile
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest import mock, skipUnless
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from bson import ObjectId
+from django.core.management import CommandError, call_command
+from django.test import AsyncRequestFactory, Client, SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+try:
+    import mongomock
+except ImportError:  # requirements-dev.txt
+    mongomock = None
+
+from football_calendar_backend.lifespan import LifespanApplication, warm_up
+import utils.mongo
+from matches_calendar import async_views, data_version, fast_json
+from matches_calendar.cache import ResponseCache, get_response_cache
+from matches_calendar.field_selection import mongo_projection, parse_selection, select
+from matches_calendar.models import League, Match, MatchParticipation, Team
+from matches_calendar.pagination import CURSOR_FIELDS, decode_cursor, encode_cursor, paginate
+from matches_calendar.profiling import IngestProfiler
+from matches_calendar.resolver import FixtureResolver
+from matches_calendar.serializers import MatchSerializer
+from matches_calendar.snapshots import write_snapshots
+from matches_calendar.sources import GitMirrorSource, LocalDirectorySource, TarballSource
+from matches_calendar.standings import Standings, contributions
+from matches_calendar.streaming import aiter_encoded, iter_encoded
+from matches_calendar.utils import (
+    iter_parsed_files, iter_season_docs, iter_season_file_docs, to_utc, update_matches_from_remote_repo,
+    write_match_batch,
+)
+
+
+def write_synthetic_season(path, matchdays, matches_per_matchday=50, league="Synthetic League"):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"league": league, "season": "2024/25"})[:-1] + ', "matchdays": [')
+        for md in range(matchdays):
+            if md:
+                f.write(",")
+            json.dump({
+                "matchday": f"Matchday {md + 1}",
+                "matches": [
+                    {
+                        "date": "2024-08-17",
+                        "time": "18:30",
+                        "home_team": f"Home Team {i}",
+                        "away_team": f"Away Team {i}",
+                        "result": {"full_time": "2-1"},
+                    }
+                    for i in range(matches_per_matchday)
+                ],
+            }, f)
+        f.write("]}")
+
+
+def peak_memory(iterable):
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iterable)
+        return count, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class StreamingSeasonParserTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def season_file(self, name, matchdays):
+        path = os.path.join(self.tmp.name, name)
+        write_synthetic_season(path, matchdays)
+        return path
+
+    def test_streaming_matches_full_load(self):
+        path = self.season_file("(2024_25) small.json", 5)
+        with open(path, encoding="utf-8") as f:
+            expected = list(iter_season_docs(json.load(f)))
+        self.assertEqual(list(iter_season_file_docs(path)), expected)
+
+    def test_peak_memory_is_flat_in_file_size(self):
+        small = self.season_file("(2024_25) small.json", 20)
+        large = self.season_file("(2024_25) large.json", 800)
+        self.assertGreater(os.path.getsize(large), 5 * 1024 * 1024)
+
+        small_count, small_peak = peak_memory(iter_season_file_docs(small))
+        large_count, large_peak = peak_memory(iter_season_file_docs(large))
+
+        self.assertEqual(large_count, 800 * 50)
+        self.assertLess(large_peak, 1024 * 1024)
+        self.assertLess(large_peak, small_peak * 2)
+
+
+class ParsePoolTests(SimpleTestCase):
+    def test_in_flight_files_are_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(12):
+                paths.append(os.path.join(tmp, f"(2024_25) league_{i}.json"))
+                write_synthetic_season(paths[-1], 1, 2)
+
+            submitted = []
+
+            class CountingPool(ThreadPoolExecutor):
+                def submit(self, fn, *args):
+                    submitted.append(args[0])
+                    return super().submit(fn, *args)
+
+            with mock.patch("matches_calendar.utils.ProcessPoolExecutor", CountingPool):
+                results = []
+                for result in iter_parsed_files(paths, {}, workers=3):
+                    self.assertLessEqual(len(submitted) - len(results), 6)
+                    results.append(result)
+
+        self.assertEqual(sorted(result["file"] for result in results), sorted(paths))
+        self.assertEqual(len(submitted), 12)
+
+class SourceAdapterTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.origin = os.path.join(self.tmp.name, "origin")
+        os.makedirs(os.path.join(self.origin, "parsed_json"))
+        self.git("init", "--quiet", "-b", "main")
+        self.commit_file("(2024_25) serie_a.json", {"league": "Serie A"})
+        self.commit_file("(2024_25) la_liga.json", {"league": "La Liga"})
+
+    def git(self, *args):
+        subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                       cwd=self.origin, check=True, capture_output=True)
+
+    def commit_file(self, name, data):
+        with open(os.path.join(self.origin, "parsed_json", name), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        self.git("add", "-A")
+        self.git("commit", "--quiet", "-m", f"Update {name}")
+
+    def test_git_mirror_fetches_incrementally_and_lists_changed_files(self):
+        mirror_dir = os.path.join(self.tmp.name, "mirror")
+        source = GitMirrorSource(f"file://{self.origin}", mirror_dir=mirror_dir)
+
+        root = source.prepare()
+        first = source.revision
+        self.assertTrue(os.path.exists(os.path.join(root, "parsed_json", "(2024_25) la_liga.json")))
+        self.assertIsNone(source.changed_files(None, "parsed_json"))
+
+        self.commit_file("(2024_25) serie_a.json", {"league": "Serie A", "season": "2024/25"})
+        source = GitMirrorSource(f"file://{self.origin}", mirror_dir=mirror_dir)
+        self.assertEqual(source.prepare(), root)
+
+        self.assertNotEqual(source.revision, first)
+        self.assertEqual(
+            source.changed_files(first, "parsed_json"),
+            [os.path.join(mirror_dir, "parsed_json", "(2024_25) serie_a.json")],
+        )
+        self.assertIsNone(source.changed_files("0" * 40, "parsed_json"))
+
+    def test_local_directory_and_tarball_sources(self):
+        self.assertEqual(LocalDirectorySource(self.origin).prepare(), self.origin)
+
+        archive = os.path.join(self.tmp.name, "data.tar.gz")
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(os.path.join(self.origin, "parsed_json"), arcname="football_calendar_project-main/parsed_json")
+        source = TarballSource(archive)
+        try:
+            root = source.prepare()
+            self.assertTrue(os.path.exists(os.path.join(root, "parsed_json", "(2024_25) serie_a.json")))
+            self.assertEqual(len(source.revision), 64)
+        finally:
+            source.cleanup()
+
+
+def match(date, home, away, score=None, time="18:30"):
+    return {"date": date, "time": time, "home_team": home, "away_team": away,
+            **({"result": {"full_time": score}} if score else {})}
+
+
+class AsyncFakeCursor:
+    """Async client cursor API over a mongomock cursor, for the async views."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, limit):
+        self.cursor.limit(limit)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        return list(itertools.islice(self.cursor, length))
+
+    async def close(self):
+        self.cursor.close()
+
+
+class AsyncFakeCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncFakeCursor(self.collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def distinct(self, *args, **kwargs):
+        return self.collection.distinct(*args, **kwargs)
+
+    async def aggregate(self, pipeline):
+        return AsyncFakeCursor(self.collection.aggregate(pipeline))
+
+
+class AsyncFakeDatabase:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        return AsyncFakeCollection(self.db[name])
+
+
+@skipUnless(mongomock, "mongomock is not installed")
+@override_settings(DATA_VERSION_TTL=0, ALLOWED_HOSTS=["testserver"])
+class MongoTestCase(SimpleTestCase):
+    """Ingestion and API on one in-memory mongomock client, as they share one MongoDB in production."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        os.makedirs(os.path.join(self.tmp.name, "parsed_json"))
+        # One store, seen tz-aware by the API and naive by ingestion, like their real clients.
+        self.client = mongomock.MongoClient(tz_aware=True)
+        ingestion_client = mongomock.MongoClient(_store=self.client._store)
+        for target, value in (("matches_calendar.utils.MongoClient", lambda uri, **kwargs: ingestion_client),
+                              ("utils.mongo._client", self.client)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        data_version.reset()
+        self.addCleanup(data_version.reset)
+        get_response_cache().clear()
+        self.addCleanup(get_response_cache().clear)
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def client_get(self, path):
+        return Client().get(path)
+
+    @property
+    def db(self):
+        return utils.mongo.get_db()
+
+    def write_season(self, league, season, matches, name=None):
+        name = name or f"({season.replace('/', '_')}) {league.lower().replace(' ', '_')}.json"
+        with open(os.path.join(self.tmp.name, "parsed_json", name), "w", encoding="utf-8") as f:
+            json.dump({"league": league, "season": season,
+                       "matchdays": [{"matchday": "Matchday 1", "matches": matches}]}, f)
+
+    def ingest_report(self, **kwargs):
+        path = os.path.join(self.tmp.name, "report.json")
+        self.ingest(report_path=path, **kwargs)
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    @contextmanager
+    def match_writes(self):
+        """Collects the operations of every bulk_write sent to the matches collection."""
+        ops = []
+        collection_type = type(self.db["matches"])
+        bulk_write = collection_type.bulk_write
+
+        def recording(collection, requests, *args, **kwargs):
+            if collection.name == "matches":
+                ops.extend(requests)
+            return bulk_write(collection, requests, *args, **kwargs)
+
+        with mock.patch.object(collection_type, "bulk_write", recording):
+            yield ops
+
+    def ingest(self, **kwargs):
+        source = LocalDirectorySource(self.tmp.name)
+        kwargs.setdefault("min_season_start", None)
+        return update_matches_from_remote_repo(None, mongo_uri="mongodb://test", source=source, **kwargs)
+
+
+class BulkUpsertTests(MongoTestCase):
+    FIXTURES = [match("2024-08-17", "Genoa", "Inter", "2-2"), match("2024-08-18", "Milan", "Torino", "2-2"),
+                match("2024-08-24", "Inter", "Lecce")]
+
+    def test_first_sync_inserts(self):
+        self.write_season("Serie A", "2024/25", self.FIXTURES)
+        with self.match_writes() as ops:
+            counts = self.ingest_report()["counts"]
+        self.assertEqual((counts["inserted"], counts["updated"], counts["unchanged"]), (3, 0, 0))
+        self.assertEqual(len(ops), 3)
+        self.assertEqual(self.db["matches"].count_documents({}), 3)
+
+    def test_resync_of_the_same_data_writes_nothing(self):
+        self.write_season("Serie A", "2024/25", self.FIXTURES)
+        self.ingest()
+        # Forced, so the files are not skipped and every fixture is compared with what is stored.
+        with self.match_writes() as ops:
+            counts = self.ingest_report(force=True)["counts"]
+        self.assertEqual((counts["inserted"], counts["updated"], counts["unchanged"]), (0, 0, 3))
+        self.assertEqual(ops, [])
+
+    def test_changed_score_is_one_update(self):
+        self.write_season("Serie A", "2024/25", self.FIXTURES)
+        self.ingest()
+        self.write_season("Serie A", "2024/25", [*self.FIXTURES[:2], match("2024-08-24", "Inter", "Lecce", "2-0")])
+        with self.match_writes() as ops:
+            counts = self.ingest_report(force=True)["counts"]
+        self.assertEqual((counts["inserted"], counts["updated"], counts["unchanged"]), (0, 1, 2))
+        self.assertEqual(len(ops), 1)
+        self.assertEqual(self.db["matches"].count_documents({}), 3)
+        self.assertEqual(self.db["matches"].find_one({"home_team.name": "Inter"})["score_home"], 2)
+
+
+class IngestStateTests(MongoTestCase):
+    FIXTURES = BulkUpsertTests.FIXTURES
+
+    def test_unchanged_file_is_not_parsed(self):
+        self.write_season("Serie A", "2024/25", self.FIXTURES)
+        self.ingest()
+        with self.match_writes() as ops:
+            report = self.ingest_report()
+        self.assertEqual((report["counts"]["parsed"], report["counts"]["skipped_files"]), (0, 1))
+        self.assertEqual([f["status"] for f in report["files"]], ["unchanged"])
+        self.assertEqual(ops, [])
+
+    def test_only_the_edited_fixture_is_written(self):
+        self.write_season("Serie A", "2024/25", self.FIXTURES)
+        self.ingest()
+        self.write_season("Serie A", "2024/25", [*self.FIXTURES[:2], match("2024-08-24", "Inter", "Lecce", "2-0")])
+        written = []
+
+        def recording_batch(matches_col, docs, *args):
+            written.extend(doc["match_key"] for doc in docs)
+            return write_match_batch(matches_col, docs, *args)
+
+        with self.match_writes() as ops, mock.patch("matches_calendar.utils.write_match_batch", recording_batch):
+            counts = self.ingest_report()["counts"]
+        self.assertEqual((counts["parsed"], counts["written"], counts["updated"], counts["unchanged"]), (3, 1, 1, 2))
+        self.assertEqual(written, [self.db["matches"].find_one({"home_team.name": "Inter"})["match_key"]])
+        self.assertEqual(len(ops), 1)
+
+
+class DryRunTests(MongoTestCase):
+    def contents(self):
+        return {name: sorted(map(repr, self.db[name].find())) for name in self.db.list_collection_names()}
+
+    def test_dry_run_reports_the_diff_and_writes_nothing(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-18", "Milan", "Torino")])
+        self.ingest()
+        before = self.contents()
+        self.assertTrue({"matches", "meta", "ingest_state", "teams", "leagues", "calendar", "standings"} <= set(before))
+
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "3-2"),
+                                                 match("2024-08-25", "Lecce", "Atalanta")])
+        report_path = os.path.join(self.tmp.name, "report.json")
+        diff = self.ingest(dry_run=True, prune=True, report_path=report_path)
+
+        self.assertEqual(self.contents(), before)
+        self.assertEqual(diff["summary"], {"inserts": 1, "updates": 1, "deletes": 1})
+        self.assertEqual([(d["home_team"], d["away_team"]) for d in diff["inserts"]], [("Lecce", "Atalanta")])
+        self.assertEqual(diff["updates"][0]["changes"], {"score_home": [2, 3]})
+        self.assertEqual([(d["home_team"], d["away_team"]) for d in diff["deletes"]], [("Milan", "Torino")])
+        with open(report_path, encoding="utf-8") as f:
+            counts = json.load(f)["counts"]
+        self.assertEqual((counts["inserted"], counts["updated"], counts["deleted"], counts["written"]), (1, 1, 1, 0))
+
+
+class SharedDatabaseTests(MongoTestCase):
+    def test_ingestion_bumps_the_version_the_api_reads(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        self.assertEqual(data_version.current_version()["generation"], 1)
+        self.assertEqual(self.db["matches"].count_documents({}), 1)
+
+    def test_interrupted_sync_bumps_on_the_next_run(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        with mock.patch("matches_calendar.utils.bump_data_version", side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                self.ingest()
+        self.assertEqual(self.db["matches"].count_documents({}), 1)
+        self.assertEqual(data_version.current_version()["generation"], 0)
+
+        self.ingest()  # nothing left to write, but the stored data is newer than generation 0
+        self.assertEqual(data_version.current_version()["generation"], 1)
+        self.ingest()
+        self.assertEqual(data_version.current_version()["generation"], 1)
+        self.assertNotIn("pending", self.db["meta"].find_one())
+
+    def test_cached_responses_are_invalidated_by_a_sync(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        first = self.client_get("/api/leagues-mongo/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(self.client_get("/api/leagues-mongo/")["X-Cache"], "HIT")
+
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona", "1-0")])
+        self.ingest()
+        second = self.client_get("/api/leagues-mongo/")
+        self.assertEqual(second["X-Cache"], "MISS")
+        self.assertEqual([league["name"] for league in json.loads(second.content)], ["La Liga", "Serie A"])
+
+
+
+class RegistryIdsTests(MongoTestCase):
+    def test_stored_matches_outside_the_run_get_registry_ids(self):
+        # An older season stored with hash() ids, and a match left by migrate_to_mongo.py with Postgres ids
+        # that collide with the registry's small sequential ones.
+        self.db["matches"].insert_many([
+            {"date": "2019-09-14", "time": "20:45:00", "season": "2019/20", "matchday": "Matchday 3",
+             "home_team": {"id": 8812734402, "name": "Inter"}, "away_team": {"id": -4412, "name": "Udinese"},
+             "league": {"id": 77120031, "name": "Serie A"}, "score_home": 1, "score_away": 0},
+            {"id": 5, "date": "2020-09-19", "time": "15:00:00", "season": "2020/21", "matchday": "Matchday 1",
+             "home_team": {"id": 2, "name": "Fiorentina"}, "away_team": {"id": 1, "name": "Torino"},
+             "league": {"id": 1, "name": "Serie A"}, "team_ids": [2, 1], "score_home": 1, "score_away": 0},
+        ])
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+
+        genoa = self.db["matches"].find_one({"season": "2024/25"})["home_team"]["id"]
+        inter = self.db["matches"].find_one({"season": "2024/25"})["away_team"]["id"]
+        old = self.db["matches"].find_one({"season": "2019/20"})
+        self.assertEqual((old["home_team"]["id"], old["league"]["id"]), (inter, 1))
+        self.assertEqual(old["team_ids"], [inter, old["away_team"]["id"]])
+        migrated = self.db["matches"].find_one({"season": "2020/21"})
+        self.assertNotIn(genoa, migrated["team_ids"])
+        self.assertNotIn(inter, migrated["team_ids"])
+
+        def dates(path):
+            return sorted(m["date"] for m in json.loads(self.client_get(path).content))
+        self.assertEqual(dates(f"/api/matches-mongo/filter/?team={inter}"), ["2019-09-14", "2024-08-17"])
+        self.assertEqual(dates(f"/api/matches-mongo/filter/?team={genoa}"), ["2024-08-17"])
+        self.assertEqual(self.db["standings"].count_documents({}), 3)
+        teams = json.loads(self.client_get("/api/teams-mongo/").content)
+        self.assertEqual({team["name"]: team["id"] for team in teams}["Inter"], inter)
+
+        # Done once: a later sync does not scan the stored matches again.
+        with mock.patch("matches_calendar.utils.ensure_registry_ids") as remap:
+            self.ingest()
+        remap.assert_not_called()
+
+
+class CatalogTests(MongoTestCase):
+    def test_teams_by_league_replaces_migrated_documents(self):
+        # Left by migrate_to_mongo.py: Postgres ids and no league memberships.
+        self.db["teams"].insert_many([{"id": 1, "name": "Genoa"}, {"id": 2, "name": "Betis"}])
+        self.db["leagues"].insert_one({"id": 1, "name": "Serie A"})
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona", "1-0")])
+        self.ingest()
+
+        leagues = {league["name"]: league["id"] for league in json.loads(self.client_get("/api/leagues-mongo/").content)}
+        self.assertEqual(set(leagues), {"Serie A", "La Liga"})
+        teams = json.loads(self.client_get(f"/api/teams-mongo/?league={leagues['Serie A']}").content)
+        self.assertEqual([team["name"] for team in teams], ["Genoa", "Inter"])
+        teams = json.loads(self.client_get("/api/teams-mongo/").content)
+        self.assertEqual([team["name"] for team in teams], ["Betis", "Genoa", "Girona", "Inter"])
+        self.assertEqual(self.client_get("/api/teams-mongo/?league=x").status_code, 400)
+
+    def test_forced_run_keeps_teams_of_older_seasons(self):
+        self.write_season("Serie A", "2023/24", [match("2023-08-19", "Juventus", "Roma", "1-0")])
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        # As on the first sync with the catalog, which may be a forced one.
+        self.db["teams"].drop()
+        self.db["leagues"].drop()
+        self.ingest(force=True, min_season_start=2024)
+
+        teams = json.loads(self.client_get("/api/teams-mongo/").content)
+        self.assertEqual([team["name"] for team in teams], ["Genoa", "Inter", "Juventus", "Roma"])
+        leagues = json.loads(self.client_get("/api/leagues-mongo/").content)
+        self.assertEqual([league["name"] for league in leagues], ["Serie A"])
+        self.assertEqual(self.db["leagues"].find_one({})["seasons"], ["2023/24", "2024/25"])
+
+class SyncIndexesTests(MongoTestCase):
+    def test_create_recreate_and_drop(self):
+        # mongomock does not keep partialFilterExpression, so not MATCH_INDEXES.
+        specs = [{"keys": [("name", 1)]}, {"keys": [("code", 1)], "options": {"unique": True}},
+                 {"keys": [("league", 1), ("name", -1)]}]
+        collection = self.db["things"]
+        collection.create_index([("code", 1)], name="code_1")
+        collection.create_index([("legacy", 1)], name="legacy_1")
+
+        planned = utils.mongo.sync_indexes(collection, specs, dry_run=True)
+        self.assertEqual(planned, {"created": ["name_1", "league_1_name_-1"], "recreated": ["code_1"],
+                                   "dropped": ["legacy_1"], "unchanged": []})
+        self.assertEqual(set(collection.index_information()), {"_id_", "code_1", "legacy_1"})
+
+        self.assertEqual(utils.mongo.sync_indexes(collection, specs), planned)
+        info = collection.index_information()
+        self.assertEqual(set(info), {"_id_", "name_1", "code_1", "league_1_name_-1"})
+        self.assertTrue(info["code_1"]["unique"])
+        self.assertEqual(list(info["league_1_name_-1"]["key"]), [("league", 1), ("name", -1)])
+
+        self.assertEqual(utils.mongo.sync_indexes(collection, specs), {
+            "created": [], "recreated": [], "dropped": [], "unchanged": ["name_1", "code_1", "league_1_name_-1"],
+        })
+        collection.create_index([("legacy", 1)], name="legacy_1")
+        self.assertEqual(utils.mongo.sync_indexes(collection, specs, drop_unknown=False)["dropped"], [])
+        self.assertIn("legacy_1", collection.index_information())
+
+    def test_ingestion_keeps_undeclared_indexes(self):
+        self.db["matches"].create_index([("legacy", 1)], name="legacy_1")
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        self.assertIn("legacy_1", self.db["matches"].index_information())
+        self.assertIn("league.id_1_date_1_time_1__id_1", self.db["matches"].index_information())
+
+    def test_command(self):
+        self.db["teams"].create_index([("legacy", 1)], name="legacy_1")
+        out = io.StringIO()
+        call_command("sync_indexes", "--dry-run", stdout=out)
+        self.assertIn("teams: Would have dropped: legacy_1", out.getvalue())
+        self.assertIn("matches: Would have created: date_1_time_1__id_1", out.getvalue())
+        self.assertIn("legacy_1", self.db["teams"].index_information())
+
+        call_command("sync_indexes", "--keep-unknown", stdout=io.StringIO())
+        self.assertIn("legacy_1", self.db["teams"].index_information())
+        self.assertIn("leagues_1_name_1", self.db["teams"].index_information())
+        call_command("sync_indexes", stdout=out)
+        self.assertNotIn("legacy_1", self.db["teams"].index_information())
+
+
+class ConditionalResponseTests(MongoTestCase):
+    def test_only_successful_responses_carry_validators(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        ok = self.client_get("/api/matches-mongo/filter/?league=1")
+        self.assertEqual(ok.status_code, 200)
+        self.assertTrue(ok.has_header("ETag") and ok.has_header("Last-Modified"))
+        revalidated = Client().get("/api/matches-mongo/filter/?league=1", HTTP_IF_NONE_MATCH=ok["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+        bad = self.client_get("/api/matches-mongo/filter/?league=x")
+        self.assertEqual(bad.status_code, 400)
+        self.assertFalse(bad.has_header("ETag") or bad.has_header("Last-Modified"))
+        self.assertIn("no-cache", bad["Cache-Control"])
+
+class CalendarTests(MongoTestCase):
+    def test_month_is_one_bucket_read(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-18", "Milan", "Torino")])
+        self.ingest()
+        month = json.loads(self.client_get("/api/calendar/2024-08/").content)
+        self.assertEqual((month["total"], month["counts"]), (2, {"2024-08-17": 1, "2024-08-18": 1}))
+
+        with mock.patch("matches_calendar.mongo_views.month_matches") as scan:
+            for path in ("/api/calendar/2024-09/", "/api/calendar/2024-08/?team=999"):
+                empty = json.loads(self.client_get(path).content)
+                self.assertEqual((empty["total"], empty["days"]), (0, {}))
+        scan.assert_not_called()
+
+    def test_month_is_computed_before_the_first_build(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        self.db["calendar"].drop()
+        month = json.loads(self.client_get("/api/calendar/2024-08/?league=1").content)
+        self.assertEqual(month["counts"], {"2024-08-17": 1})
+
+    def test_rebuilt_month_is_never_empty(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        inter = self.db["matches"].find_one({})["away_team"]["id"]
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Milan", "2-2")])
+        calendar = self.db["calendar"]
+        delete_many = type(calendar).delete_many
+
+        def checked_delete_many(collection, query):
+            result = delete_many(collection, query)
+            if collection.name == "calendar":
+                self.assertIsNotNone(calendar.find_one({"_id": "2024-08:all"}))
+            return result
+
+        with mock.patch.object(type(calendar), "delete_many", checked_delete_many):
+            self.ingest(prune=True)
+        self.assertIsNone(calendar.find_one({"_id": f"2024-08:team:{inter}"}))
+        month = json.loads(self.client_get("/api/calendar/2024-08/").content)
+        self.assertEqual(month["days"]["2024-08-17"][0]["away_team"]["name"], "Milan")
+
+    def test_forced_run_builds_months_of_older_seasons(self):
+        self.write_season("Serie A", "2023/24", [match("2023-09-16", "Juventus", "Roma", "1-0")])
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        self.db["calendar"].drop()
+        self.ingest(force=True, min_season_start=2024)
+        month = json.loads(self.client_get("/api/calendar/2023-09/").content)
+        self.assertEqual(month["counts"], {"2023-09-16": 1})
+
+
+class SnapshotTests(MongoTestCase):
+    def read_snapshot(self, path):
+        with open(os.path.join(self.tmp.name, "snapshots", path), "rb") as f:
+            body = f.read()
+        with gzip.open(os.path.join(self.tmp.name, "snapshots", path + ".gz")) as f:
+            self.assertEqual(f.read(), body)
+        return json.loads(body)
+
+    def test_manifest_and_snapshots(self):
+        self.write_season("Serie A", "2024/25", [match("2024-09-01", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-17", "Genoa", "Milan", "1-0")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona")])
+        snapshot_dir = os.path.join(self.tmp.name, "snapshots")
+        self.ingest(snapshot_dir=snapshot_dir)
+
+        with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        ids = {doc["home_team"]["name"]: doc["home_team"]["id"] for doc in self.db["matches"].find({})}
+        ids.update({doc["league"]["name"]: doc["league"]["id"] for doc in self.db["matches"].find({})})
+        self.assertEqual([(entry["name"], entry["matches"]) for entry in manifest["leagues"]],
+                         sorted([("Serie A", 2), ("La Liga", 1)], key=lambda e: ids[e[0]]))
+        self.assertEqual({entry["name"]: entry["matches"] for entry in manifest["teams"]},
+                         {"Genoa": 2, "Inter": 1, "Milan": 1, "Betis": 1, "Girona": 1})
+        self.assertEqual([(entry["month"], entry["matches"]) for entry in manifest["months"]],
+                         [("2024-08", 2), ("2024-09", 1)])
+
+        genoa = self.read_snapshot(f"teams/{ids['Genoa']}/2024-25.json")
+        self.assertEqual([doc["date"] for doc in genoa], ["2024-08-17", "2024-09-01"])
+        august = self.read_snapshot("months/2024-08.json")
+        self.assertEqual([doc["league"]["name"] for doc in august], ["Serie A", "La Liga"])
+        league = next(entry for entry in manifest["leagues"] if entry["name"] == "La Liga")
+        self.assertEqual(self.read_snapshot(league["path"])[0]["away_team"]["name"], "Girona")
+
+        # One score change rewrites only the snapshots holding that match.
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona", "1-0")])
+        finds = []
+        find = type(self.db["matches"]).find
+
+        def recording(collection, *args, **kwargs):
+            if collection.name == "matches":
+                finds.append(args[0] if args else kwargs.get("filter"))
+            return find(collection, *args, **kwargs)
+
+        self.ingest()
+        with mock.patch.object(type(self.db["matches"]), "find", recording):
+            counts = write_snapshots(self.db["matches"], snapshot_dir)
+        self.assertEqual(counts, {"written": 4, "unchanged": 5, "removed": 0})
+        # Every match is read through the query of one snapshot, never all at once.
+        self.assertNotIn({}, finds)
+        self.assertEqual(self.read_snapshot(league["path"])[0]["score_home"], 1)
+
+
+class KickoffTimezoneTests(MongoTestCase):
+    def test_league_outside_central_european_time(self):
+        local = datetime.datetime(2024, 8, 17, 15, 0)
+        self.assertEqual(to_utc(local, "Premier League"), datetime.datetime(2024, 8, 17, 14, 0))
+        self.assertEqual(to_utc(local, "Serie A"), datetime.datetime(2024, 8, 17, 13, 0))
+
+    def test_daylight_saving_boundaries(self):
+        for league, local, utc in (
+            ("Serie A", datetime.datetime(2024, 10, 26, 20, 45), datetime.datetime(2024, 10, 26, 18, 45)),
+            ("Serie A", datetime.datetime(2024, 10, 27, 20, 45), datetime.datetime(2024, 10, 27, 19, 45)),
+            ("Premier League", datetime.datetime(2025, 3, 29, 15, 0), datetime.datetime(2025, 3, 29, 15, 0)),
+            ("Premier League", datetime.datetime(2025, 3, 30, 15, 0), datetime.datetime(2025, 3, 30, 14, 0)),
+        ):
+            self.assertEqual(to_utc(local, league), utc, (league, local))
+
+    def test_stored_kickoffs_follow_the_timezone_settings(self):
+        self.write_season("Premier League", "2024/25", [match("2024-08-17", "Arsenal", "Wolves", time="15:00")])
+        self.ingest()
+        kickoff = lambda: self.db["matches"].find_one({})["kickoff"].replace(tzinfo=None)
+        self.assertEqual(kickoff(), datetime.datetime(2024, 8, 17, 14, 0))
+
+        with mock.patch.dict("matches_calendar.utils._LEAGUE_ZONES", {"premier league": ZoneInfo("Europe/Rome")}):
+            self.ingest()
+            self.assertEqual(kickoff(), datetime.datetime(2024, 8, 17, 13, 0))
+        self.ingest()
+        self.assertEqual(kickoff(), datetime.datetime(2024, 8, 17, 14, 0))
+
+
+class StandingsTests(MongoTestCase):
+    def test_contributions(self):
+        doc = {"season": "2024/25", "league": {"id": 1}, "score_home": 2, "score_away": 1,
+               "home_team": {"id": 1, "name": "Genoa"}, "away_team": {"id": 2, "name": "Inter"}}
+        (home, won), (away, lost) = contributions(doc)
+        self.assertEqual((home["id"], won["points"], won["won"], won["goals_for"]), (1, 3, 1, 2))
+        self.assertEqual((away["id"], lost["points"], lost["lost"], lost["goals_against"]), (2, 0, 1, 2))
+        self.assertEqual([c["points"] for _, c in contributions({**doc, "score_away": 2})], [1, 1])
+        self.assertEqual(contributions({**doc, "is_cancelled": True}), [])
+        self.assertEqual(contributions({**doc, "score_home": None}), [])
+        self.assertEqual(contributions(None), [])
+
+    def test_change_marks_only_tables_whose_scores_changed(self):
+        standings = Standings(self.db)
+        doc = {"season": "2024/25", "league": {"id": 1}, "score_home": 2, "score_away": 1,
+               "home_team": {"id": 1, "name": "Genoa"}, "away_team": {"id": 2, "name": "Inter"}}
+        standings.change(doc, {**doc, "time": "20:45:00"})
+        standings.change(None, {**doc, "score_home": None})
+        self.assertEqual(standings.dirty, set())
+        standings.change(doc, {**doc, "score_home": 3})
+        standings.change(doc, None)
+        self.assertEqual(standings.dirty, {(1, "2024/25")})
+
+    def table(self):
+        response = self.client_get("/api/standings/?league=1")
+        self.assertEqual(response.status_code, 200)
+        return {row["team"]["name"]: (row["played"], row["points"]) for row in json.loads(response.content)["table"]}
+
+    def test_flush_recomputes_changed_tables(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-24", "Inter", "Milan")])
+        self.ingest()
+        self.assertEqual(self.table(), {"Genoa": (1, 1), "Inter": (1, 1)})
+
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-1"),
+                                                 match("2024-08-24", "Inter", "Milan", "0-1")])
+        self.ingest()
+        self.assertEqual(self.table(), {"Genoa": (1, 3), "Milan": (1, 3), "Inter": (2, 0)})
+        self.assertEqual(Standings(self.db).verify(self.db["matches"]), {})
+
+    def test_verify_reports_and_fixes_drift(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-1")])
+        self.ingest()
+        self.db["standings"].update_one({"_id": "1:2024/25"}, {"$inc": {"rows.1.points": 1}})
+        standings = Standings(self.db)
+        self.assertEqual(standings.verify(self.db["matches"]), {"1:2024/25": {"1": {"points": [4, 3]}}})
+        standings.verify(self.db["matches"], fix=True)
+        self.assertEqual(standings.verify(self.db["matches"]), {})
+
+    def test_sync_interrupted_before_the_flush_is_repaired(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest()
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "3-0")])
+        with mock.patch.object(Standings, "flush", side_effect=RuntimeError("killed")), \
+                self.assertRaises(RuntimeError):
+            self.ingest()
+        self.assertNotEqual(Standings(self.db).verify(self.db["matches"]), {})
+
+        # The matches are already stored: the rerun writes nothing and repairs the table from the marker.
+        self.ingest()
+        self.assertEqual(Standings(self.db).verify(self.db["matches"]), {})
+        self.assertEqual(self.table(), {"Genoa": (1, 3), "Inter": (1, 0)})
+
+    def test_check_standings_reads_the_ingested_tables(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-1")])
+        self.ingest()
+        out = io.StringIO()
+        call_command("check_standings", stdout=out)
+        self.assertIn("Standings match the matches.", out.getvalue())
+
+        self.db["standings"].delete_many({})
+        with self.assertRaises(CommandError):
+            call_command("check_standings", stdout=io.StringIO())
+        call_command("check_standings", "--fix", stdout=io.StringIO())
+        self.assertEqual(self.table(), {"Genoa": (1, 3), "Inter": (1, 0)})
+
+
+class TeamIdsTests(MongoTestCase):
+    def test_placeholder_is_not_a_team(self):
+        self.write_season("Champions League", "2024/25", [match("2025-05-31", "Inter", "N.N.")])
+        self.ingest()
+        doc = self.db["matches"].find_one({})
+        self.assertEqual(doc["team_ids"], [doc["home_team"]["id"]])
+
+    def test_stored_placeholder_ids_are_dropped(self):
+        self.write_season("Champions League", "2024/25", [match("2025-05-31", "Inter", "N.N.")])
+        self.ingest()
+        doc = self.db["matches"].find_one({})
+        self.db["matches"].update_one({"_id": doc["_id"]},
+                                       {"$set": {"team_ids": [doc["home_team"]["id"], doc["away_team"]["id"]]}})
+        self.ingest()
+        self.assertEqual(self.db["matches"].find_one({})["team_ids"], [doc["home_team"]["id"]])
+
+
+class IngestProfilerTests(MongoTestCase):
+    def test_report_breaks_the_run_down_by_file_league_and_stage(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-18", "Milan", "Torino")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona", "1-0")])
+        with open(os.path.join(self.tmp.name, "parsed_json", "(2024_25) broken.json"), "w") as f:
+            f.write("{not json")
+        with self.assertLogs("matches_calendar.utils", "ERROR"):
+            report = self.ingest_report(batch_size=2)
+
+        self.assertEqual({key: report["counts"][key] for key in ("inserted", "parsed", "written", "failed_files")},
+                         {"inserted": 3, "parsed": 3, "written": 3, "failed_files": 1})
+        self.assertEqual(sorted((f["file"], f["status"], f["fixtures"]) for f in report["files"]), [
+            ("(2024_25) broken.json", "failed", 0),
+            ("(2024_25) la_liga.json", "ingested", 1),
+            ("(2024_25) serie_a.json", "ingested", 2),
+        ])
+        self.assertEqual(report["leagues"], {"La Liga": {"fixtures": 1, "inserted": 1},
+                                             "Serie A": {"fixtures": 2, "inserted": 2}})
+        self.assertLessEqual({"read", "json", "dates", "normalize", "resolve", "mongo_write", "state_save"},
+                             set(report["stages"]))
+        self.assertEqual(set(report["throughput"]),
+                         {"parsed_fixtures_per_second", "written_fixtures_per_second", "fixtures_per_second"})
+        self.assertEqual((report["options"]["batch_size"], report["source"]),
+                         (2, f"source:dir:{os.path.abspath(self.tmp.name)}"))
+
+        with self.assertLogs("matches_calendar.utils", "ERROR"):
+            rerun = self.ingest_report()
+        self.assertEqual({f["file"]: f["status"] for f in rerun["files"]}["(2024_25) serie_a.json"], "unchanged")
+        self.assertEqual(rerun["counts"]["parsed"], 0)
+
+    def test_round_trips_and_cprofile_output(self):
+        cprofile_path = os.path.join(self.tmp.name, "ingest.prof")
+        report_path = os.path.join(self.tmp.name, "report.json")
+        profiler = IngestProfiler(cprofile_path=cprofile_path)
+        for name in ("find", "find", "update"):
+            profiler.mongo.started(mock.Mock(command_name=name))
+        with profiler.stage("mongo_write"):
+            pass
+        profiler.record_file("/data/a.json", "ingested", 4, 0.5, {"read": 0.25, "json": 0.25})
+        report = profiler.report({"parsed": 4, "written": 4, "label": "ignored"})
+        profiler.finish(report, report_path)
+
+        self.assertEqual(report["mongo"], {"round_trips": 3, "commands": {"find": 2, "update": 1}})
+        self.assertEqual(report["counts"], {"parsed": 4, "written": 4})
+        self.assertEqual(report["stages"]["read"], 0.25)
+        self.assertEqual(report["files"][0]["file"], "a.json")
+        with open(report_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["mongo"]["round_trips"], 3)
+        self.assertGreater(pstats.Stats(cprofile_path).total_calls, 0)
+
+
+class IngestMemoryTests(MongoTestCase):
+    def ingest_files(self, files, clear_stored=False):
+        """Ingest `files` season files; returns, for each file, the memory held by matches_calendar code
+        and the number of saved file states just before it is parsed."""
+        os.makedirs(os.path.join(self.tmp.name, str(files), "parsed_json"))
+        for i in range(files):
+            write_synthetic_season(os.path.join(self.tmp.name, str(files), "parsed_json", f"(2024_25) league_{i}.json"),
+                                   2, league=f"League {i}")
+        held, saved = [], []
+        ours = [tracemalloc.Filter(True, os.path.join(os.path.dirname(os.path.abspath(__file__)), "*"))]
+
+        def measured(*args, **kwargs):
+            for parsed in iter_parsed_files(*args, **kwargs):
+                saved.append(self.db["ingest_state"].count_documents({"kind": "file"}))
+                if clear_stored:
+                    # Stored strings are shared with the documents built for them, so what the
+                    # database keeps would show up as held by the pipeline.
+                    for name in ("matches", "ingest_state", "calendar"):
+                        self.db[name].delete_many({})
+                gc.collect()
+                snapshot = tracemalloc.take_snapshot().filter_traces(ours)
+                held.append(sum(stat.size for stat in snapshot.statistics("filename")))
+                yield parsed
+
+        self.client.drop_database(utils.mongo.DB_NAME)
+        tracemalloc.start()
+        try:
+            with mock.patch("matches_calendar.utils.iter_parsed_files", measured):
+                update_matches_from_remote_repo(
+                    None, mongo_uri="mongodb://test", min_season_start=None, streaming=True, batch_size=100,
+                    source=LocalDirectorySource(os.path.join(self.tmp.name, str(files))),
+                )
+        finally:
+            tracemalloc.stop()
+        return held, saved
+
+    def test_file_state_is_saved_before_the_next_file(self):
+        _, saved = self.ingest_files(4)
+        self.assertEqual(saved, [0, 1, 2, 3])
+        self.assertEqual(self.db["teams"].count_documents({}), 100)
+
+    def test_memory_is_flat_in_the_number_of_files(self):
+        few, _ = self.ingest_files(2, clear_stored=True)
+        many, _ = self.ingest_files(6, clear_stored=True)
+        self.assertLess(max(many) - max(few), 32 * 1024)
+
+
+class ResolverMemoryTests(MongoTestCase):
+    def test_finished_league_seasons_are_released(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona")])
+        self.ingest()
+        self.db["matches"].update_many({}, {"$set": {"legacy": "x" * 1000}})
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "3-2")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona", "1-0")])
+
+        resolvers, loaded = [], []
+
+        class TrackedResolver(FixtureResolver):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                resolvers.append(self)
+
+            def load(self, league_name, season):
+                made = super().load(league_name, season)
+                if made:
+                    loaded.append(dict(self.by_season))
+                return made
+
+        with mock.patch("matches_calendar.utils.FixtureResolver", TrackedResolver):
+            self.ingest(batch_size=1)
+
+        self.assertEqual(resolvers[0].by_season, {})
+        # Each league-season was held alone, without the fields ingestion does not compare.
+        self.assertEqual([len(snapshot) for snapshot in loaded], [1, 1])
+        self.assertNotIn("legacy", next(iter(loaded[0].values()))[0])
+        self.assertEqual(self.db["matches"].count_documents({"score_home": {"$in": [3, 1]}}), 2)
+
+    def test_pruning_keeps_league_seasons_until_the_end(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-18", "Milan", "Torino")])
+        self.ingest()
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2")])
+        self.ingest(prune=True)
+        self.assertEqual(self.db["matches"].count_documents({}), 1)
+
+class FastJsonTests(MongoTestCase):
+    DOCS = [
+        {"kickoff": datetime.datetime(2024, 8, 17, 16, 30, tzinfo=datetime.timezone.utc),
+         "local": datetime.datetime(2024, 8, 17, 18, 30, tzinfo=ZoneInfo("Europe/Rome")),
+         "naive": datetime.datetime(2024, 8, 17, 16, 30, 0, 250000)},
+        {"name": "Città \u00fc \u2028 \u2029 \"quoted\" \\ \t", "score": None, "ok": True, "ratio": 1.5,
+         "nested": [{"id": 1}, [], {}]},
+        [],
+    ]
+
+    def test_dumps_is_byte_for_byte_drf(self):
+        for encoder in ("orjson", "stdlib"):
+            with mock.patch("matches_calendar.fast_json.orjson", fast_json.orjson if encoder == "orjson" else None):
+                for doc in self.DOCS:
+                    self.assertEqual(fast_json.dumps(doc), JSONRenderer().render(doc), (encoder, doc))
+
+    def test_views_are_byte_for_byte_drf(self):
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-18", "Città", "Torino")])
+        self.ingest()
+        for path in ("/api/matches-mongo/", "/api/matches-mongo/?page_size=1", "/api/matches-mongo/filter/?league=1",
+                     "/api/teams-mongo/", "/api/leagues-mongo/", "/api/matches-mongo/batch/?leagues=1"):
+            fast = self.client_get(path)
+            get_response_cache().clear()
+            with override_settings(MONGO_FAST_JSON=False):
+                drf = self.client_get(path)
+            get_response_cache().clear()
+            self.assertEqual(fast.content, drf.content, path)
+        self.assertIn(b'"kickoff":"2024-08-17T16:30:00Z"', self.client_get("/api/matches-mongo/").content)
+
+
+class StreamingResponseTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_season("Serie A", "2024/25", [match(f"2024-08-{day:02d}", "Genoa", f"Città {day}", "1-0")
+                                                 for day in range(10, 17)])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona")])
+        self.ingest()
+
+    def streamed(self, response):
+        self.assertTrue(response.streaming)
+        if response.is_async:
+            async def collect():
+                return [chunk async for chunk in response.streaming_content]
+            return b"".join(asyncio.run(collect()))
+        return b"".join(response.streaming_content)
+
+    def test_stream_matches_the_plain_response(self):
+        league = self.db["matches"].find_one({"league.name": "Serie A"})["league"]["id"]
+        for path in ("/api/matches-mongo/", f"/api/matches-mongo/filter/?league={league}&fields=date,away_team.name"):
+            plain = self.client_get(path).content
+            separator = "&" if "?" in path else "?"
+            self.assertEqual(self.streamed(self.client_get(f"{path}{separator}stream=json")), plain, path)
+            ndjson = self.streamed(self.client_get(f"{path}{separator}stream=ndjson"))
+            self.assertEqual([json.loads(line) for line in ndjson.splitlines()], json.loads(plain), path)
+
+    def test_async_stream_matches_the_plain_response(self):
+        db = AsyncFakeDatabase(self.db)
+        plain = self.client_get("/api/matches-mongo/").content
+        get_response_cache().clear()
+        with mock.patch("matches_calendar.async_views.get_async_collection",
+                        lambda name=utils.mongo.MATCHES_COLLECTION: db[name]), \
+                mock.patch("matches_calendar.data_version.get_async_db", lambda: db):
+            response = asyncio.run(async_views.all_matches_mongo(AsyncRequestFactory().get("/api/matches-mongo/?stream=json")))
+        self.assertEqual(self.streamed(response), plain)
+
+    def test_chunks_are_cursor_batches(self):
+        plain = self.client_get("/api/matches-mongo/").content
+        for fmt in ("json", "ndjson"):
+            cursor = self.db["matches"].find({}, {"_id": 0}).sort(utils.mongo.MATCH_ORDER)
+            with mock.patch.object(cursor, "close", wraps=cursor.close) as close:
+                chunks = list(iter_encoded(cursor, fmt, batch_size=3))
+            close.assert_called_once()
+            if fmt == "json":
+                self.assertEqual((len(chunks), b"".join(chunks)), (5, plain))  # [, 3 + 3 + 2, ]
+            else:
+                self.assertEqual([chunk.count(b"\n") for chunk in chunks], [3, 3, 2])
+
+        async def collect():
+            cursor = self.db["matches"].find({}, {"_id": 0}).sort(utils.mongo.MATCH_ORDER)
+            return [chunk async for chunk in aiter_encoded(cursor, "json", batch_size=3)]
+        self.assertEqual(b"".join(asyncio.run(collect())), plain)
+
+    def test_empty_stream(self):
+        path = "/api/matches-mongo/filter/?league=999"
+        self.assertEqual(self.streamed(self.client_get(f"{path}&stream=json")), b"[]")
+        self.assertEqual(self.streamed(self.client_get(f"{path}&stream=ndjson")), b"")
+
+
+class BatchEndpointTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-25", "Inter", "Milan"),
+                                                 match("2024-09-01", "Milan", "Torino")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona")])
+        self.ingest()
+        self.ids = {}
+        for doc in self.db["matches"].find({}):
+            for side in ("home_team", "away_team", "league"):
+                self.ids[doc[side]["name"]] = doc[side]["id"]
+
+    def batch(self, query):
+        response = self.client_get(f"/api/matches-mongo/batch/?{query}")
+        return response.status_code, json.loads(response.content)
+
+    def test_matches_are_grouped_by_team_and_league(self):
+        genoa, inter, serie_a, la_liga = (self.ids[name] for name in ("Genoa", "Inter", "Serie A", "La Liga"))
+        status, batch = self.batch(f"teams={genoa},{inter}&teams=999&leagues={la_liga}&fields=date")
+        self.assertEqual(status, 200)
+        self.assertEqual(batch, {
+            "teams": {str(genoa): [{"date": "2024-08-17"}], str(inter): [{"date": "2024-08-17"}, {"date": "2024-08-25"}],
+                      "999": []},
+            "leagues": {str(la_liga): [{"date": "2024-08-18"}]},
+            "truncated": False,
+        })
+        _, window = self.batch(f"leagues={serie_a}&start_date=2024-08-20&end_date=2024-08-31")
+        self.assertEqual([m["away_team"]["name"] for m in window["leagues"][str(serie_a)]], ["Milan"])
+        self.assertEqual(window["teams"], {})
+
+    def test_caps_and_bad_requests(self):
+        too_many = ",".join(str(i) for i in range(101))
+        for query, error in (("", "Pass at least one id in teams or leagues"),
+                             ("teams=x", "Invalid team or league id"),
+                             (f"teams={too_many}", "At most 100 teams and leagues per request"),
+                             ("leagues=1&start_date=17-08-2024", "Invalid date range format")):
+            self.assertEqual(self.batch(query), (400, {"error": error}), query)
+
+    def test_truncated_at_the_batch_limit(self):
+        serie_a, la_liga = self.ids["Serie A"], self.ids["La Liga"]
+        with mock.patch("matches_calendar.queries.BATCH_LIMIT", 2), \
+                mock.patch("matches_calendar.mongo_views.BATCH_LIMIT", 2):
+            _, batch = self.batch(f"leagues={serie_a},{la_liga}&fields=date")
+        # The first two matches in date order, whatever group they fall in.
+        self.assertEqual(batch, {"teams": {}, "leagues": {str(serie_a): [{"date": "2024-08-17"}],
+                                                          str(la_liga): [{"date": "2024-08-18"}]},
+                                 "truncated": True})
+        get_response_cache().clear()
+        _, complete = self.batch(f"leagues={serie_a},{la_liga}&fields=date")
+        self.assertFalse(complete["truncated"])
+        self.assertEqual(len(complete["leagues"][str(serie_a)]), 3)
+
+
+class CursorPaginationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [
+            ("2024-08-17", "18:30:00"), ("2024-08-17", "18:30:00"), ("2024-08-17", None), ("2024-08-17", "20:45:00"),
+            ("2024-08-18", None), ("2024-08-18", "12:30:00"), (None, None), (None, "15:00:00"), (None, "15:00:00"),
+            ("2024-08-19", "18:30:00"),
+        ]
+        docs = [{"match_key": f"m{i}", "date": date, "time": time} for i, (date, time) in enumerate(rows)]
+        del docs[6]["time"]  # missing sorts like null
+        self.db["matches"].insert_many(docs)
+        self.expected = [doc["match_key"] for doc in self.db["matches"].find().sort(utils.mongo.MATCH_ORDER)]
+
+    def pages(self, path, page_size):
+        keys, cursor = [], None
+        while True:
+            url = f"{path}?page_size={page_size}&fields=match_key" + (f"&cursor={cursor}" if cursor else "")
+            response = self.client_get(url)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.content)
+            keys += [match["match_key"] for match in page["results"]]
+            cursor = page["next"]
+            if cursor is None:
+                return keys
+
+    def test_pages_cover_null_dates_and_times_once(self):
+        self.assertEqual(self.expected[:3], ["m6", "m7", "m8"])
+        for page_size in (1, 2, 3, 4, 10):
+            self.assertEqual(self.pages("/api/matches-mongo/", page_size), self.expected)
+
+    def test_paginate_directly(self):
+        first = paginate(self.db["matches"], {}, page_size=4)
+        second = paginate(self.db["matches"], {}, cursor=first["next"], page_size=4)
+        self.assertEqual([m["match_key"] for m in first["results"] + second["results"]], self.expected[:8])
+        self.assertNotIn("_id", first["results"][0])
+
+    def test_truncated_list_links_to_the_rest(self):
+        complete = self.client_get("/api/matches-mongo/?fields=match_key")
+        self.assertFalse(complete.has_header("X-Truncated") or complete.has_header("Link"))
+        self.assertEqual([m["match_key"] for m in json.loads(complete.content)], self.expected)
+
+        get_response_cache().clear()
+        with mock.patch("matches_calendar.mongo_views.LIST_LIMIT", 4):
+            for _ in range(2):  # the cached response keeps the headers
+                response = self.client_get("/api/matches-mongo/?fields=match_key")
+                self.assertEqual([m["match_key"] for m in json.loads(response.content)], self.expected[:4])
+                self.assertEqual(response["X-Truncated"], "true")
+            self.assertEqual(response["X-Cache"], "HIT")
+        link, rel = response["Link"].split("; ")
+        self.assertEqual(rel, 'rel="next"')
+        rest = json.loads(self.client_get(link.strip("<>")).content)
+        self.assertEqual([m["match_key"] for m in rest["results"]], self.expected[4:8])
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        valid = encode_cursor({"date": None, "time": None, "_id": ObjectId()})
+        for cursor in ("not-a-cursor", "WyIxIl0", valid[:-4], encode_cursor({"_id": "x" * 24})[:-2] + "zz"):
+            response = self.client_get(f"/api/matches-mongo/?cursor={cursor}")
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(json.loads(response.content), {"error": "Invalid cursor"})
+        self.assertEqual(self.client_get("/api/matches-mongo/?page_size=0").status_code, 400)
+        with self.assertRaises(ValueError):
+            decode_cursor("bm90IGpzb24")
+
+class FieldSelectionTests(SimpleTestCase):
+    doc = {"date": "2024-08-17", "time": "18:30:00", "home_team": {"id": 1, "name": "Genoa"},
+           "away_team": {"id": 2, "name": "Inter"}, "league": {"id": 1, "name": "Serie A"}}
+
+    def test_mongo_projection(self):
+        self.assertIsNone(mongo_projection(None, set()))
+        self.assertEqual(mongo_projection({"home_team", "home_team.name", "date"}, set()),
+                         {"home_team": 1, "date": 1, "_id": 0})
+        self.assertEqual(mongo_projection({"home_team.name"}, set(), keep=CURSOR_FIELDS),
+                         {"home_team.name": 1, "date": 1, "time": 1, "_id": 1})
+        self.assertEqual(mongo_projection(None, {"league", "time"}), {"league": 0, "time": 0, "_id": 0})
+        # Grouping keys survive excluding their parent object.
+        self.assertEqual(mongo_projection(None, {"home_team", "time"}, keep=("home_team.id",)), {"time": 0, "_id": 0})
+
+    def test_select_keeps_document_order(self):
+        selected = select(self.doc, {"league.name", "date", "home_team"}, set())
+        self.assertEqual(list(selected), ["date", "home_team", "league"])
+        self.assertEqual(selected["league"], {"name": "Serie A"})
+        excluded = select(self.doc, None, {"time", "away_team.id"})
+        self.assertEqual(list(excluded), ["date", "home_team", "away_team", "league"])
+        self.assertEqual(excluded["away_team"], {"name": "Inter"})
+        self.assertIs(select(self.doc, None, set()), self.doc)
+
+    def test_parse_selection(self):
+        self.assertEqual(parse_selection({"fields": "date, home_team.name,"}), ({"date", "home_team.name"}, set()))
+        for params in ({"fields": "date", "exclude": "time"}, {"fields": "password"}):
+            with self.assertRaises(ValueError):
+                parse_selection(params)
+
+
+class DynamicFieldsSerializerTests(SimpleTestCase):
+    def serialize(self, query):
+        match = Match(id=7, date=datetime.date(2024, 8, 17), score_home=2, score_away=2,
+                      home_team=Team(id=1, name="Genoa"), away_team=Team(id=2, name="Inter"),
+                      league=League(id=1, name="Serie A"))
+        request = Request(APIRequestFactory().get(f"/api/matches/{query}"))
+        return MatchSerializer(match, context={"request": request}).data
+
+    def test_fields_and_exclude(self):
+        self.assertEqual(self.serialize("?fields=date,home_team.name"),
+                         {"home_team": {"name": "Genoa"}, "date": "2024-08-17"})
+        data = self.serialize("?exclude=league,away_team.id,time")
+        self.assertNotIn("league", data)
+        self.assertEqual(data["away_team"], {"name": "Inter"})
+        self.assertEqual(len(self.serialize("")), 9)
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            self.serialize("?fields=date,home_team.city")
+
+class ResponseCacheTests(SimpleTestCase):
+    def test_a_new_generation_drops_older_entries(self):
+        cache = ResponseCache(max_entries=2)
+        key = ResponseCache.key(1, "/api/leagues-mongo/", "")
+        cache.set(key, 1, b"old")
+        self.assertEqual(cache.get(key, 1), b"old")
+
+        self.assertIsNone(cache.get(ResponseCache.key(2, "/api/leagues-mongo/", ""), 2))
+        self.assertIsNone(cache.get(key, 1))
+        self.assertEqual(cache.stats()["invalidations"], 1)
+        # A request still holding the old generation cannot put its response back.
+        cache.set(key, 1, b"old")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        for name in ("a", "b", "c"):
+            cache.set(name, 1, name.encode())
+        self.assertIsNone(cache.get("a", 1))
+        self.assertEqual(cache.get("c", 1), b"c")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class MatchParticipationTests(TestCase):
+    def setUp(self):
+        self.league = League.objects.create(name="Serie A")
+        self.genoa, self.inter, self.milan = (Team.objects.create(name=name) for name in ("Genoa", "Inter", "Milan"))
+
+    def participations(self):
+        return sorted(MatchParticipation.objects.values_list("match_id", "team__name", "date"))
+
+    def team_dates(self, team):
+        response = self.client.get(f"/api/matches/?team={team.id}")
+        self.assertEqual(response.status_code, 200)
+        return [m["date"] for m in response.json()["results"]]
+
+    def test_save_keeps_participations_and_team_order(self):
+        later = Match.objects.create(date=datetime.date(2024, 9, 1), home_team=self.inter, away_team=self.genoa,
+                                     league=self.league, season="2024/25")
+        earlier = Match.objects.create(date=datetime.date(2024, 8, 17), home_team=self.genoa, away_team=self.milan,
+                                       league=self.league, season="2024/25")
+        self.assertEqual(self.participations(), [
+            (later.id, "Genoa", datetime.date(2024, 9, 1)), (later.id, "Inter", datetime.date(2024, 9, 1)),
+            (earlier.id, "Genoa", datetime.date(2024, 8, 17)), (earlier.id, "Milan", datetime.date(2024, 8, 17)),
+        ])
+        self.assertEqual(self.team_dates(self.genoa), ["2024-08-17", "2024-09-01"])
+
+        earlier.away_team = self.inter
+        earlier.date = datetime.date(2024, 9, 15)
+        earlier.save()
+        self.assertEqual(self.team_dates(self.inter), ["2024-09-01", "2024-09-15"])
+        self.assertEqual(self.team_dates(self.milan), [])
+
+    def test_bulk_paths_keep_participations(self):
+        created = Match.objects.bulk_create([
+            Match(date=datetime.date(2024, 8, 17), home_team=self.genoa, away_team=self.inter, league=self.league),
+            Match(date=datetime.date(2024, 8, 18), home_team=self.milan, away_team=self.inter, league=self.league),
+        ])
+        self.assertEqual(MatchParticipation.objects.count(), 4)
+
+        Match.objects.filter(date=datetime.date(2024, 8, 17)).update(date=datetime.date(2024, 8, 25))
+        self.assertEqual(self.team_dates(self.genoa), ["2024-08-25"])
+
+        created[1].away_team = self.genoa
+        Match.objects.bulk_update(created[1:], ["away_team"])
+        self.assertEqual(self.team_dates(self.genoa), ["2024-08-18", "2024-08-25"])
+        self.assertEqual(self.team_dates(self.inter), ["2024-08-25"])
+
+        Match.objects.filter(pk=created[0].pk).delete()
+        self.assertEqual(MatchParticipation.objects.filter(match_id=created[0].pk).count(), 0)
+
+
+class LazyClientTests(SimpleTestCase):
+    def test_import_opens_no_connection(self):
+        code = (
+            "import sys, django; django.setup(); import football_calendar_backend.urls, utils.mongo; "
+            "print(utils.mongo._client is None, 'matches_calendar.views' in sys.modules)"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "football_calendar_backend.settings",
+               "MONGODB_URI": "mongodb+srv://unresolvable.invalid/db"}
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                                env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.stdout.split(), ["True", "False"], result.stderr)
+
+    def test_client_is_created_once_and_closed(self):
+        with mock.patch("utils.mongo._client", None), mock.patch("utils.mongo.MongoClient") as client_class:
+            self.assertIs(utils.mongo.get_client(), utils.mongo.get_client())
+            client_class.assert_called_once()
+            utils.mongo.close_client()
+            client_class.return_value.close.assert_called_once()
+            self.assertIsNone(utils.mongo._client)
+
+
+class LifespanTests(SimpleTestCase):
+    def run_lifespan(self, app, messages):
+        sent = []
+
+        async def receive():
+            return {"type": messages.pop(0)}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app({"type": "lifespan"}, receive, send))
+        return sent
+
+    def test_startup_and_shutdown(self):
+        calls = []
+
+        async def async_startup():
+            calls.append("async_startup")
+            return {"mongo_async": 0.0}
+
+        async def async_shutdown():
+            calls.append("async_shutdown")
+
+        app = LifespanApplication(
+            mock.Mock(), on_startup=lambda: calls.append("startup") or {"urlconf": 0.0},
+            on_shutdown=lambda: calls.append("shutdown"),
+            on_async_startup=async_startup, on_async_shutdown=async_shutdown,
+        )
+        sent = self.run_lifespan(app, ["lifespan.startup", "lifespan.shutdown"])
+        self.assertEqual([m["type"] for m in sent], ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+        self.assertEqual(calls, ["startup", "async_startup", "shutdown", "async_shutdown"])
+        app.app.assert_not_called()
+
+    def test_failed_startup_is_reported(self):
+        def startup():
+            raise RuntimeError("no urlconf")
+
+        sent = self.run_lifespan(LifespanApplication(mock.Mock(), on_startup=startup), ["lifespan.startup"])
+        self.assertEqual(sent, [{"type": "lifespan.startup.failed", "message": "no urlconf"}])
+
+    def test_other_scopes_go_to_django(self):
+        async def django_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 204})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(LifespanApplication(django_app)({"type": "http"}, None, send))
+        self.assertEqual(sent, [{"type": "http.response.start", "status": 204}])
+
+    def test_warm_up_survives_an_unreachable_mongo(self):
+        with mock.patch("utils.mongo.ping", side_effect=ConnectionError("down")), \
+                self.assertLogs("football_calendar_backend.lifespan", "WARNING"):
+            timings = warm_up()
+        self.assertEqual(set(timings), {"urlconf", "mongo"})
+
+
+class AsyncClientTests(SimpleTestCase):
+    def test_one_client_per_loop_closed_with_it(self):
+        closed = []
+
+        class FakeAsyncClient:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            async def close(self):
+                closed.append(self)
+
+        async def use():
+            client = utils.mongo.get_async_client()
+            self.assertIs(utils.mongo.get_async_client(), client)
+            await asyncio.sleep(0)
+            return client
+
+        async def use_and_shut_down():
+            client = utils.mongo.get_async_client()
+            await utils.mongo.close_async_client()
+            return client
+
+        with mock.patch("utils.mongo.AsyncMongoClient", FakeAsyncClient):
+            first, second = asyncio.run(use()), asyncio.run(use())
+            self.assertIsNot(first, second)
+            self.assertEqual(closed, [first, second])
+            # Closed once, on shutdown, even if no request used it.
+            third = asyncio.run(use_and_shut_down())
+            self.assertEqual(closed, [first, second, third])
+        self.assertEqual(utils.mongo._async_clients, {})
+
+
+class AsyncViewTests(MongoTestCase):
+    """The async views answer like the sync ones, on an async wrapper of the same mongomock store."""
+
+    def setUp(self):
+        super().setUp()
+        db = AsyncFakeDatabase(self.db)
+        for target, value in (("matches_calendar.async_views.get_async_collection",
+                               lambda name=utils.mongo.MATCHES_COLLECTION: db[name]),
+                              ("matches_calendar.data_version.get_async_db", lambda: db)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.write_season("Serie A", "2024/25", [match("2024-08-17", "Genoa", "Inter", "2-2"),
+                                                 match("2024-08-18", "Milan", "Torino"),
+                                                 match("2024-08-25", "Inter", "Milan")])
+        self.write_season("La Liga", "2024/25", [match("2024-08-18", "Betis", "Girona", "1-0")])
+        self.ingest()
+
+    def async_get(self, view, path):
+        get_response_cache().clear()
+        data_version.reset()
+        return asyncio.run(view(AsyncRequestFactory().get(path)))
+
+    def assert_same_response(self, view, path):
+        expected = self.client_get(path)
+        response = self.async_get(view, path)
+        self.assertEqual(response.status_code, expected.status_code, path)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content), path)
+
+    def test_lists_match_the_sync_views(self):
+        inter = self.db["matches"].find_one({"home_team.name": "Inter"})["home_team"]["id"]
+        league = self.db["matches"].find_one({"league.name": "La Liga"})["league"]["id"]
+        for view, path in (
+            (async_views.all_matches_mongo, "/api/matches-mongo/"),
+            (async_views.all_matches_mongo, "/api/matches-mongo/?page_size=2&fields=date,home_team.name"),
+            (async_views.filter_matches_mongo, f"/api/matches-mongo/filter/?team={inter}"),
+            (async_views.filter_matches_mongo, f"/api/matches-mongo/filter/?league={league}&date=2024-08-18"),
+            (async_views.filter_matches_mongo, "/api/matches-mongo/filter/?league=x"),
+            (async_views.all_leagues_mongo, "/api/leagues-mongo/"),
+            (async_views.all_teams_mongo, f"/api/teams-mongo/?league={league}"),
+            (async_views.batch_matches_mongo, f"/api/matches-mongo/batch/?teams={inter}&leagues={league}"),
+            (async_views.batch_matches_mongo, "/api/matches-mongo/batch/"),
+        ):
+            self.assert_same_response(view, path)
+
+    def test_batch_is_one_query_with_one_limit(self):
+        inter = self.db["matches"].find_one({"home_team.name": "Inter"})["home_team"]["id"]
+        league = self.db["matches"].find_one({"league.name": "La Liga"})["league"]["id"]
+        path = f"/api/matches-mongo/batch/?teams={inter}&leagues={league}"
+        with mock.patch("matches_calendar.queries.BATCH_LIMIT", 2), \
+                mock.patch("matches_calendar.mongo_views.BATCH_LIMIT", 2), \
+                mock.patch("matches_calendar.async_views.BATCH_LIMIT", 2):
+            self.assert_same_response(async_views.batch_matches_mongo, path)
+            batch = json.loads(self.async_get(async_views.batch_matches_mongo, path).content)
+        self.assertTrue(batch["truncated"])
+        self.assertEqual(sum(len(docs) for docs in batch["teams"].values()) + len(batch["leagues"][str(league)]), 2)
+
+    def test_page_cursor_is_followed(self):
+        first = self.async_get(async_views.all_matches_mongo, "/api/matches-mongo/?page_size=3")
+        page = json.loads(first.content)
+        second = json.loads(self.async_get(async_views.all_matches_mongo,
+                                           f"/api/matches-mongo/?page_size=3&cursor={page['next']}").content)
+        self.assertEqual(len(page["results"]) + len(second["results"]), 4)
+        self.assertIsNone(second["next"])
+
+    def test_truncated_list_is_flagged(self):
+        with mock.patch("matches_calendar.async_views.LIST_LIMIT", 3), \
+                mock.patch("matches_calendar.mongo_views.LIST_LIMIT", 3):
+            self.assert_same_response(async_views.all_matches_mongo, "/api/matches-mongo/")
+            response = self.async_get(async_views.all_matches_mongo, "/api/matches-mongo/")
+        self.assertEqual((len(json.loads(response.content)), response["X-Truncated"]), (3, "true"))
+        self.assertIn("page_size=3", response["Link"])
@@ -1,18 +1,50 @@
+from importlib import import_module
+from django.conf import settings
 from django.urls import path
-from .views import LeagueListView, MatchListView, TeamListView, MatchDetailView, LeagueDetailView, TeamDetailView, MatchListFromLocalFile
-from .views import all_leagues_mongo, all_matches_mongo, all_teams_mongo, filter_matches_mongo
+from django.views.decorators.csrf import csrf_exempt
+from .mongo_views import calendar_month_mongo, response_cache_stats, standings_mongo
+
+# Sotto ASGI (MONGO_ASYNC_VIEWS) le liste Mongo usano le viste async sul client async di pymongo.
+if settings.MONGO_ASYNC_VIEWS:
+    from .async_views import all_leagues_mongo, all_matches_mongo, all_teams_mongo, batch_matches_mongo, filter_matches_mongo
+    from .async_views import upcoming_matches_mongo
+else:
+    from .mongo_views import all_leagues_mongo, all_matches_mongo, all_teams_mongo, batch_matches_mongo, filter_matches_mongo
+    from .mongo_views import upcoming_matches_mongo
+
+
+def lazy_view(name):
+    """Vista ORM importata da .views solo alla prima richiesta che la usa.
+
+    Le viste DRF fanno già il loro controllo CSRF, come as_view() anche il wrapper è csrf_exempt.
+    """
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = getattr(import_module('matches_calendar.views'), name).as_view()
+        return view(request, *args, **kwargs)
+
+    return wrapper
 
 
 urlpatterns = [
-    path('leagues/', LeagueListView.as_view(), name='league-list'),
-    path('leagues/<int:pk>/', LeagueDetailView.as_view(), name='league-detail'),
-    path('matches/', MatchListView.as_view(), name='match-list'),
-    path('matches/<int:pk>/', MatchDetailView.as_view(), name='match-detail'),
-    path('matches-from-local/', MatchListFromLocalFile.as_view(), name='match-list-local'),
-    path('teams/', TeamListView.as_view(), name='team-list'),
-    path('teams/<int:pk>/', TeamDetailView.as_view(), name='team-detail'),
+    path('leagues/', lazy_view('LeagueListView'), name='league-list'),
+    path('leagues/<int:pk>/', lazy_view('LeagueDetailView'), name='league-detail'),
+    path('matches/', lazy_view('MatchListView'), name='match-list'),
+    path('matches/<int:pk>/', lazy_view('MatchDetailView'), name='match-detail'),
+    path('matches-from-local/', lazy_view('MatchListFromLocalFile'), name='match-list-local'),
+    path('teams/', lazy_view('TeamListView'), name='team-list'),
+    path('teams/<int:pk>/', lazy_view('TeamDetailView'), name='team-detail'),
     path("matches-mongo/", all_matches_mongo, name="all-matches-mongo"),
     path("matches-mongo/filter/", filter_matches_mongo, name="filter-matches-mongo"),
+    path("matches-mongo/batch/", batch_matches_mongo, name="batch-matches-mongo"),
     path("leagues-mongo/", all_leagues_mongo, name="all-leagues-mongo"),
     path("teams-mongo/", all_teams_mongo, name="all-teams-mongo"),
+    path("upcoming/", upcoming_matches_mongo, name="upcoming-matches-mongo"),
+    path("calendar/<str:month>/", calendar_month_mongo, name="calendar-month-mongo"),
+    path("standings/", standings_mongo, name="standings-mongo"),
+    path("cache-stats/", response_cache_stats, name="response-cache-stats"),
 ]
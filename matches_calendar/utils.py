@@ -1,159 +1,829 @@
 import os
 import glob
+import hashlib
+import itertools
 import json
-import shutil
-import stat
-import subprocess
 import time
 import re
-from datetime import datetime
-from pymongo import MongoClient
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
 
+from matches_calendar.calendar_buckets import CalendarBuckets
+from matches_calendar.catalog import Catalog
+from matches_calendar.changeset import ChangeSet
+from matches_calendar.id_registry import IdRegistry
+from matches_calendar.profiling import PARSE_STAGES, IngestProfiler, rate
+from matches_calendar.resolver import PLACEHOLDER_TEAM, FixtureResolver
+from matches_calendar.season_reader import iter_season_file
+from matches_calendar.snapshots import MANIFEST, write_snapshots
+from matches_calendar.sources import GitMirrorSource
+from matches_calendar.standings import Standings
+from utils.mongo import (
+    CALENDAR_INDEXES, DB_NAME, LEAGUE_INDEXES, MATCH_INDEXES, STANDINGS_INDEXES, TEAM_INDEXES, bump_data_version,
+    clear_data_pending, mark_data_pending, read_data_version, sync_indexes,
+)
+
 import logging
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
-
-def on_rm_error(func, path, exc_info):
-    try:
-        os.chmod(path, stat.S_IWRITE)
-        func(path)
-    except Exception as e:
-        logger.error(f"Failed to remove {path}: {e}")
+DEFAULT_BATCH_SIZE = 500
+# Fixture times in the season files are local times of the competition, without an offset:
+# LEAGUE_TIMEZONES for the leagues not on Central European time, MATCH_TIMEZONE for the others.
+# MATCH_TIMEZONES (a JSON object of league name -> zone) adds or overrides entries.
+SOURCE_TIMEZONE = ZoneInfo(os.getenv("MATCH_TIMEZONE", "Europe/Rome"))
+LEAGUE_TIMEZONES = {
+    "Premier League": "Europe/London",
+    "English Premier League": "Europe/London",
+    "Championship": "Europe/London",
+    "EFL Championship": "Europe/London",
+    "League One": "Europe/London",
+    "League Two": "Europe/London",
+    "Scottish Premiership": "Europe/London",
+    "Primeira Liga": "Europe/Lisbon",
+    "Liga Portugal": "Europe/Lisbon",
+    "Süper Lig": "Europe/Istanbul",
+    "Super League Greece": "Europe/Athens",
+    "Russian Premier League": "Europe/Moscow",
+    "Major League Soccer": "America/New_York",
+    "Liga MX": "America/Mexico_City",
+    "Brasileirão": "America/Sao_Paulo",
+    "J1 League": "Asia/Tokyo",
+}
+LEAGUE_TIMEZONES.update(json.loads(os.getenv("MATCH_TIMEZONES") or "{}"))
+_LEAGUE_ZONES = {name.casefold(): ZoneInfo(zone) for name, zone in LEAGUE_TIMEZONES.items()}
 
 
 def is_season_valid(filename, min_season_start=2024):
     match = re.match(r"\((\d{4})_\d{2}\)", os.path.basename(filename))
     if match:
         year = int(match.group(1))
-        return year >= min_season_start
+        return min_season_start is None or year >= min_season_start
     return False
 
 
-def update_matches_from_remote_repo(repo_url, branch='main', folder='parsed_json', mongo_uri=None):
+def make_match_key(league_name, season, matchday, date, home_team, away_team):
+    # Natural key of a fixture; stable across runs and processes (unlike hash()).
+    raw = "\x1f".join(str(part) for part in (league_name, season, matchday, date, home_team, away_team))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def league_timezone(league_name):
+    return _LEAGUE_ZONES.get((league_name or "").casefold(), SOURCE_TIMEZONE)
+
+
+def timezone_settings():
+    """The zones kickoffs are computed with; stored kickoffs are recomputed when this changes."""
+    return {"default": SOURCE_TIMEZONE.key, "leagues": {name: zone.key for name, zone in sorted(_LEAGUE_ZONES.items())}}
+
+
+def to_utc(local, league_name=None):
+    """Naive UTC datetime (what pymongo stores and returns) of a naive datetime local to the league."""
+    return local.replace(tzinfo=league_timezone(league_name)).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Every field ingestion writes on a match (build_match_doc + assign_ids): what stored fixtures are compared on.
+MATCH_DOC_FIELDS = (
+    "match_key", "date", "time", "kickoff", "matchday", "season", "is_cancelled", "score_home", "score_away",
+    "home_team", "away_team", "league", "team_ids",
+)
+
+
+def build_match_doc(m, league_name, season, md_name, timings=None):
+    date_str = m.get("date")
+    time_str = m.get("time", "00:00")
+    started = time.perf_counter() if timings is not None else None
+    try:
+        dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    except:
+        dt = None
+    if started is not None:
+        timings["dates"] += time.perf_counter() - started
+
+    result = m.get("result", {})
+    score_home, score_away = None, None
+    if isinstance(result, dict):
+        full_time = result.get("full_time")
+        if full_time and '-' in full_time:
+            try:
+                score_home, score_away = map(int, full_time.split('-'))
+            except:
+                pass
+
+    home_team = m.get("home_team")
+    away_team = m.get("away_team")
+    date = dt.strftime("%Y-%m-%d") if dt else None
+
+    return {
+        "match_key": make_match_key(league_name, season, md_name, date, home_team, away_team),
+        "date": date,
+        "time": dt.strftime("%H:%M:%S") if dt else None,
+        "kickoff": to_utc(dt, league_name) if dt else None,
+        "matchday": md_name,
+        "season": season,
+        "is_cancelled": m.get("cancelled", False),
+        "score_home": score_home,
+        "score_away": score_away,
+        "home_team": {"id": None, "name": home_team},
+        "away_team": {"id": None, "name": away_team},
+        "league": {"id": None, "name": league_name},
+    }
+
+
+def assign_ids(doc, registry):
+    # Runs in the writer process, which owns the id registry.
+    doc["home_team"]["id"] = registry.get("team", doc["home_team"]["name"])
+    doc["away_team"]["id"] = registry.get("team", doc["away_team"]["name"])
+    doc["league"]["id"] = registry.get("league", doc["league"]["name"])
+    doc["team_ids"] = team_ids(doc)
+
+
+def team_ids(doc):
+    """Both sides in one multikey field: a team filter is a single index range, not a home/away $or.
+    The "N.N." placeholder of undecided knockout fixtures is not a team and is left out."""
+    return [team.get("id") for team in (doc.get("home_team") or {}, doc.get("away_team") or {})
+            if team.get("name") != PLACEHOLDER_TEAM]
+
+
+def iter_season_docs(data, timings=None):
+    league_name = data.get("league", "Unknown League")
+    season = data.get("season", "Unknown Season")
+
+    for md in data.get("matchdays", []):
+        md_name = md.get("matchday", "Unknown Matchday")
+        for m in md.get("matches", []):
+            yield build_match_doc(m, league_name, season, md_name, timings)
+
+
+def iter_season_file_docs(json_file, timings=None):
+    """Streaming counterpart of ``iter_season_docs``: one matchday in memory at a time."""
+    matchdays = iter_season_file(json_file)
+    while True:
+        started = time.perf_counter()
+        item = next(matchdays, None)
+        if timings is not None:
+            timings["json"] += time.perf_counter() - started
+        if item is None:
+            return
+        league_name, season, md = item
+        md_name = md.get("matchday", "Unknown Matchday")
+        for m in md.get("matches", []):
+            yield build_match_doc(m, league_name, season, md_name, timings)
+
+
+def file_sha256(json_file, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(json_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fixture_hash(doc):
+    # Ids are a fixed function of the names (see IdRegistry), so only the names are hashed.
+    content = dict(doc)
+    for field in ("home_team", "away_team", "league"):
+        content[field] = doc[field]["name"]
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def file_state_id(folder, json_file):
+    return f"file:{folder}/{os.path.basename(json_file)}"
+
+
+def parse_season_file(json_file, known_hash=None, streaming=False):
+    """Load and normalize one season file. Runs in the parse worker pool.
+
+    Returns a plain dict (picklable) with the file hash and ``(doc, fixture_hash)``
+    pairs; ``skipped`` is set when the file hash equals ``known_hash``. With
+    ``streaming`` the pairs are produced lazily, so the caller must consume them
+    in this process; ``seconds`` and ``timings`` then keep growing meanwhile.
+    ``timings`` splits ``seconds`` into PARSE_STAGES, "normalize" being the rest.
+    """
+    started = time.perf_counter()
+    timings = dict.fromkeys(PARSE_STAGES, 0.0)
+    result = {"file": json_file, "sha256": None, "skipped": False, "docs": [], "error": None,
+              "seconds": 0.0, "timings": timings}
+    try:
+        if streaming:
+            result["sha256"] = file_sha256(json_file)
+            timings["read"] = time.perf_counter() - started
+            if result["sha256"] == known_hash:
+                result["skipped"] = True
+            else:
+                result["docs"] = _timed_docs(iter_season_file_docs(json_file, timings), result)
+        else:
+            with open(json_file, 'rb') as f:
+                raw = f.read()
+            result["sha256"] = hashlib.sha256(raw).hexdigest()
+            timings["read"] = time.perf_counter() - started
+            if result["sha256"] == known_hash:
+                result["skipped"] = True
+            else:
+                decode_started = time.perf_counter()
+                data = json.loads(raw)
+                timings["json"] = time.perf_counter() - decode_started
+                result["docs"] = [(doc, fixture_hash(doc)) for doc in iter_season_docs(data, timings)]
+    except Exception as e:
+        result["error"] = str(e)
+    _add_seconds(result, time.perf_counter() - started)
+    return result
+
+
+def _add_seconds(result, seconds):
+    timings = result["timings"]
+    result["seconds"] += seconds
+    timings["normalize"] = result["seconds"] - timings["read"] - timings["json"] - timings["dates"]
+
+
+def _timed_docs(docs, result):
+    while True:
+        started = time.perf_counter()
+        try:
+            doc = next(docs)
+            digest = fixture_hash(doc)
+        except StopIteration:
+            return
+        finally:
+            _add_seconds(result, time.perf_counter() - started)
+        yield doc, digest
+
+
+def _guard_parse_errors(docs, errors):
+    # Only exceptions raised while producing docs land here, not the caller's.
+    try:
+        yield from docs
+    except Exception as e:
+        errors.append(e)
+
+
+def iter_parsed_files(json_files, known_hashes, workers=1, streaming=False):
+    """Yield ``parse_season_file`` results, in completion order when using a pool.
+
+    At most ``2 * workers`` files are in flight: a new one is submitted only once
+    the caller has taken a result, so a slow writer does not make the parent
+    buffer the parsed output of the whole run.
+    """
+    if workers <= 1:
+        for json_file in json_files:
+            yield parse_season_file(json_file, known_hashes.get(json_file), streaming)
+        return
+
+    files = iter(json_files)
+
+    def submit(pool, count):
+        return {pool.submit(parse_season_file, f, known_hashes.get(f)) for f in itertools.islice(files, count)}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = submit(pool, 2 * workers)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                pending |= submit(pool, 1)
+
+
+def ensure_match_keys(matches_col, batch_size=DEFAULT_BATCH_SIZE):
+    """Backfill ``match_key`` on documents written before keyed upserts existed."""
+    ops = []
+    backfilled = 0
+    duplicates = 0
+
+    def flush():
+        nonlocal backfilled, duplicates
+        try:
+            backfilled += matches_col.bulk_write(ops, ordered=False).modified_count
+        except BulkWriteError as e:
+            backfilled += e.details.get("nModified", 0)
+            duplicates += len(e.details.get("writeErrors", []))
+        ops.clear()
+
+    legacy = matches_col.find(
+        {"match_key": {"$exists": False}},
+        {"date": 1, "season": 1, "matchday": 1, "league.name": 1, "home_team.name": 1, "away_team.name": 1},
+    )
+    for doc in legacy:
+        key = make_match_key(
+            doc.get("league", {}).get("name"), doc.get("season"), doc.get("matchday"), doc.get("date"),
+            doc.get("home_team", {}).get("name"), doc.get("away_team", {}).get("name"),
+        )
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"match_key": key}}))
+        if len(ops) >= batch_size:
+            flush()
+    if ops:
+        flush()
+
+    if backfilled:
+        logger.info(f"Backfilled match_key on {backfilled} existing matches.")
+    if duplicates:
+        logger.warning(f"{duplicates} duplicate legacy matches left without match_key.")
+
+
+def ensure_kickoffs(matches_col, state_col, batch_size=DEFAULT_BATCH_SIZE):
+    """Backfill ``kickoff`` on documents written before it existed, and recompute every stored kickoff
+    when the timezone settings changed since the last run. Returns the dates of the updated matches."""
+    zones = timezone_settings()
+    recompute = (state_col.find_one({"_id": "kickoff_timezones"}) or {}).get("timezones") != zones
+    query = {} if recompute else {"kickoff": {"$exists": False}}
+    ops = []
+    dates = set()
+    for doc in matches_col.find(query, {"date": 1, "time": 1, "kickoff": 1, "league.name": 1}):
+        try:
+            local = datetime.strptime(f"{doc.get('date')} {doc.get('time')}", "%Y-%m-%d %H:%M:%S")
+            kickoff = to_utc(local, (doc.get("league") or {}).get("name"))
+        except (TypeError, ValueError):
+            kickoff = None
+        if isinstance(doc.get("kickoff"), datetime) and doc["kickoff"].replace(tzinfo=None) == kickoff:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"kickoff": kickoff}}))
+        dates.add(doc.get("date"))
+        if len(ops) >= batch_size:
+            matches_col.bulk_write(ops, ordered=False)
+            ops.clear()
+    if ops:
+        matches_col.bulk_write(ops, ordered=False)
+
+    if recompute:
+        state_col.replace_one({"_id": "kickoff_timezones"}, {"kind": "timezones", "timezones": zones}, upsert=True)
+    if dates:
+        logger.info(f"Backfilled or corrected kickoff on existing matches of {len(dates)} dates.")
+    return dates
+
+
+def ensure_team_ids(matches_col, batch_size=DEFAULT_BATCH_SIZE):
+    """Backfill ``team_ids`` on documents written before it existed, and drop the placeholder id from
+    those written before it was left out. Returns the dates of the updated matches."""
+    ops = []
+    dates = set()
+    query = {"$or": [{"team_ids": {"$exists": False}},
+                     {"home_team.name": PLACEHOLDER_TEAM}, {"away_team.name": PLACEHOLDER_TEAM}]}
+    for doc in matches_col.find(query, {"date": 1, "team_ids": 1, "home_team": 1, "away_team": 1}):
+        ids = team_ids(doc)
+        if doc.get("team_ids") == ids:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"team_ids": ids}}))
+        dates.add(doc.get("date"))
+        if len(ops) >= batch_size:
+            matches_col.bulk_write(ops, ordered=False)
+            ops.clear()
+    if ops:
+        matches_col.bulk_write(ops, ordered=False)
+
+    if dates:
+        logger.info(f"Backfilled team_ids on existing matches of {len(dates)} dates.")
+    return dates
+
+
+def ensure_registry_ids(matches_col, registry, batch_size=DEFAULT_BATCH_SIZE):
+    """Rewrite the team and league ids of every stored match from the registry, by name.
+
+    Matches stored before the registry existed carry per-process ``hash()`` ids and
+    those written by migrate_to_mongo.py Postgres ids, both of which collide with
+    registry ids. New names are registered before any match referencing them is
+    written. Returns the dates of the rewritten matches.
+    """
+    ops = []
+    dates = set()
+
+    def flush():
+        registry.flush()
+        matches_col.bulk_write(ops, ordered=False)
+        ops.clear()
+
+    fields = {"date": 1, "team_ids": 1, "league.id": 1, "league.name": 1,
+              "home_team.id": 1, "home_team.name": 1, "away_team.id": 1, "away_team.name": 1}
+    for doc in matches_col.find({}, fields):
+        home, away, league = (doc.get(field) or {} for field in ("home_team", "away_team", "league"))
+        remapped = {
+            "home_team": {**home, "id": registry.get("team", home.get("name"))},
+            "away_team": {**away, "id": registry.get("team", away.get("name"))},
+            "league": {**league, "id": registry.get("league", league.get("name"))},
+        }
+        remapped["team_ids"] = team_ids(remapped)
+        if all(doc.get(field) == value for field, value in remapped.items()):
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "home_team.id": remapped["home_team"]["id"], "away_team.id": remapped["away_team"]["id"],
+            "league.id": remapped["league"]["id"], "team_ids": remapped["team_ids"],
+        }}))
+        dates.add(doc.get("date"))
+        if len(ops) >= batch_size:
+            flush()
+    if ops:
+        flush()
+
+    if dates:
+        logger.info(f"Rewrote team and league ids with registry ids on existing matches of {len(dates)} dates.")
+    return dates
+
+
+def write_match_batch(matches_col, docs, stats, resolver, changes=None, profiler=None, standings=None):
+    """Write a batch of fixtures with a single bulk_write.
+
+    Stored counterparts are found by ``resolver`` (one read per league-season for
+    the whole run); fixtures identical to what is stored are not sent at all.
+    With a ``changes`` ChangeSet (dry run) the writes are recorded there instead.
+    ``standings`` receives the stored and new version of every written fixture and
+    saves the tables they touch before the write.
+    """
+    profiler = profiler or IngestProfiler()
+    ops = []
+    with profiler.stage("resolve"):
+        for doc in docs:
+            league_name = doc["league"]["name"]
+            resolver.load(league_name, doc["season"])
+            stored = resolver.resolve(doc)
+            if stored is None:
+                ops.append(UpdateOne({"match_key": doc["match_key"]}, {"$set": doc}, upsert=True))
+                profiler.count(league_name, "inserted")
+                if changes is not None:
+                    changes.insert(doc)
+                if standings is not None:
+                    standings.change(None, doc)
+            elif all(stored.get(field) == value for field, value in doc.items()):
+                stats["unchanged"] += 1
+                profiler.count(league_name, "unchanged")
+            else:
+                ops.append(UpdateOne({"_id": stored["_id"]}, {"$set": doc}))
+                profiler.count(league_name, "updated")
+                if changes is not None:
+                    changes.update(stored, doc)
+                if standings is not None:
+                    standings.change(stored, doc)
+    if not ops or changes is not None:
+        return
+
+    with profiler.stage("mongo_write"):
+        if standings is not None:
+            standings.save()
+        try:
+            result = matches_col.bulk_write(ops, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            stats["write_errors"] += len(result.get("writeErrors", []))
+            logger.error(f"{len(result.get('writeErrors', []))} match writes failed: {result['writeErrors'][:1]}")
+    stats["inserted"] += result.get("nUpserted", 0)
+    stats["updated"] += result.get("nModified", 0)
+    stats["unchanged"] += result.get("nMatched", 0) - result.get("nModified", 0)
+
+
+def stale_fixtures(resolver, seasons):
+    """Stored fixtures of fully ingested league-seasons that no incoming fixture claimed."""
+    return [
+        doc for league_season in sorted(seasons, key=str) for doc in resolver.existing(*league_season)
+        if doc["_id"] not in resolver.claimed
+    ]
+
+
+def update_matches_from_remote_repo(repo_url, branch='main', folder='parsed_json', mongo_uri=None,
+                                    batch_size=DEFAULT_BATCH_SIZE, force=False, workers=1,
+                                    min_season_start=2024, streaming=False, source=None, dry_run=False,
+                                    prune=False, report_path=None, cprofile_path=None, snapshot_dir=None):
+    """Sync season files from ``source`` (a git mirror of ``repo_url`` by default) into MongoDB.
+
+    With ``dry_run`` nothing is written and the computed change set is returned as
+    a dict; ``prune`` deletes stored fixtures that disappeared from their season file.
+    ``report_path`` receives a JSON profiling report, ``cprofile_path`` a cProfile dump.
+    ``snapshot_dir`` receives static JSON snapshots whenever the data changed.
+    """
     if not mongo_uri:
         raise ValueError("Missing MongoDB URI")
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    if workers < 1:
+        raise ValueError("workers must be a positive integer")
+    if streaming and workers > 1:
+        raise ValueError("streaming parsing runs in the writer process and requires workers=1")
 
-    start_time = time.time()
-    temp_dir = 'temp_repo'
+    profiler = IngestProfiler(cprofile_path)
+    if source is None:
+        source = GitMirrorSource(repo_url, branch)
 
-    client = MongoClient(mongo_uri)
-    db = client["football_calendar"]
+    client = MongoClient(mongo_uri, event_listeners=[profiler.mongo])
+    db = client[DB_NAME]
     matches_col = db["matches"]
+    state_col = db["ingest_state"]
+    registry = IdRegistry(db["id_registry"])
+    resolver = FixtureResolver(matches_col, projection=dict.fromkeys(MATCH_DOC_FIELDS, 1))
+    catalog = Catalog(db)
+    calendar = CalendarBuckets(db)
+    standings = Standings(db)
 
     logger.info("Starting match update process...")
-    logger.info(f"Repository: {repo_url}")
-    logger.info(f"Branch: {branch}")
+    logger.info(f"Source: {source.state_id}")
     logger.info(f"Target folder inside repo: {folder}")
+    logger.info(f"Batch size: {batch_size}, parse workers: {workers}, streaming: {streaming}")
+    if dry_run:
+        logger.info("Dry run: nothing will be written.")
 
-    # Cleanup temp repo
-    if os.path.exists(temp_dir):
-        shutil.rmtree(temp_dir, onerror=on_rm_error)
-
-    try:
-        subprocess.run(['git', 'clone', '--depth', '1', '-b', branch, repo_url, temp_dir], check=True)
-    except Exception as e:
-        logger.error(f"Error cloning repository: {e}")
-        return
+    with profiler.stage("source"):
+        try:
+            root = source.prepare()
+        except Exception as e:
+            logger.error(f"Error preparing source: {e}")
+            source.cleanup()
+            return
 
-    parsed_json_path = os.path.join(temp_dir, folder)
+    parsed_json_path = os.path.join(root, folder)
     if not os.path.exists(parsed_json_path):
-        logger.error(f"Folder '{folder}' not found in the cloned repo.")
+        logger.error(f"Folder '{folder}' not found in the source.")
+        source.cleanup()
         return
 
-    json_files = [f for f in glob.glob(os.path.join(parsed_json_path, '*.json')) if is_season_valid(f)]
+    json_files = [
+        f for f in glob.glob(os.path.join(parsed_json_path, '*.json')) if is_season_valid(f, min_season_start)
+    ]
     logger.info(f"Found {len(json_files)} valid .json files.")
 
-    inserted = 0
-    updated = 0
+    backfilled_dates = set()
+    interrupted = False
+    with profiler.stage("setup"):
+        if not dry_run:
+            # Before any write: if this run dies before the bump, the next one still bumps.
+            interrupted = mark_data_pending(db)
+            if interrupted:
+                logger.warning("The previous sync did not finish, the data version will be bumped.")
+            ensure_match_keys(matches_col, batch_size)
+            backfilled_dates = ensure_kickoffs(matches_col, state_col, batch_size) | ensure_team_ids(matches_col, batch_size)
+            sync_indexes(matches_col, MATCH_INDEXES, drop_unknown=False)
+            sync_indexes(catalog.teams_col, TEAM_INDEXES, drop_unknown=False)
+            sync_indexes(catalog.leagues_col, LEAGUE_INDEXES, drop_unknown=False)
+            sync_indexes(calendar.collection, CALENDAR_INDEXES, drop_unknown=False)
+            sync_indexes(standings.collection, STANDINGS_INDEXES, drop_unknown=False)
+            registry.ensure_indexes()
+        registry.load()
+        # Once per database (migrate_to_mongo.py clears the marker): ids stored before the registry existed
+        # are remapped by name, including matches of seasons this run does not read.
+        remapped = set()
+        if not dry_run and state_col.find_one({"_id": "registry_ids"}) is None:
+            remapped = ensure_registry_ids(matches_col, registry, batch_size)
+            backfilled_dates |= remapped
+            state_col.replace_one({"_id": "registry_ids"}, {"kind": "registry", "remapped_at": datetime.now(timezone.utc)},
+                                  upsert=True)
 
-    for json_file in json_files:
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to load JSON file {json_file}: {e}")
+        # An emptied matches collection invalidates whatever the ingest state remembers.
+        if not force and matches_col.estimated_document_count() == 0:
+            logger.info("Matches collection is empty, ignoring ingest state.")
+            force = True
+        known_states = {} if force else {
+            d["_id"]: d for d in state_col.find({"kind": "file"}, {"sha256": 1, "seasons": 1})
+        }
+        known_files = {state_id: d.get("sha256") for state_id, d in known_states.items()}
+        last_revision = None if force else (state_col.find_one({"_id": source.state_id}) or {}).get("revision")
+        # Matches skipped as unchanged never reach the catalog or the calendar, so empty ones are built
+        # from what is stored. A forced run only rewrites the files in range, not older seasons, and an
+        # interrupted one may have saved the state of files whose catalog and calendar updates were lost.
+        if not dry_run and (force or remapped or interrupted or catalog.is_empty()):
+            catalog.rebuild(matches_col)
+        if not dry_run and (force or interrupted or calendar.is_empty()):
+            calendar.rebuild(matches_col)
+        elif not dry_run:
+            for date in backfilled_dates:
+                calendar.touch(date)
+        # Tables are keyed by id, so remapped ids need them rebuilt.
+        if not dry_run and (remapped or standings.is_empty()):
+            standings.rebuild(matches_col)
+
+    # Narrow the run to what changed since the last ingested revision. Files that
+    # were never ingested (e.g. older seasons on a first backfill) are always kept.
+    with profiler.stage("source"):
+        if last_revision and last_revision == source.revision:
+            changed = set()
+        else:
+            changed = source.changed_files(last_revision, folder)
+    unchanged_files = []
+    if changed is not None:
+        changed = {os.path.normpath(f) for f in changed}
+        unchanged_files = [
+            f for f in json_files
+            if os.path.normpath(f) not in changed and file_state_id(folder, f) in known_files
+        ]
+        json_files = [f for f in json_files if f not in unchanged_files]
+        logger.info(f"{len(json_files)} files changed since revision {last_revision}.")
+        for json_file in unchanged_files:
+            profiler.record_file(json_file, "unchanged")
+
+    stats = {
+        "inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "skipped_files": len(unchanged_files),
+        "failed_files": 0, "write_errors": 0, "parsed": 0, "written": 0,
+    }
+    pending = []
+    changes = ChangeSet() if dry_run else None
+    # Deletions need every incoming fixture to claim its stored document, even
+    # the ones skipped as unchanged.
+    track_claims = dry_run or prune
+    complete_seasons = set()
+    processed_states = set()
+    # League-seasons and ingest states of finished files, released from the resolver and saved (with the
+    # catalog entries they added) once their pending fixtures are written: memory stays bounded by the
+    # files in progress, and a run that dies halfway is redone from the first file whose state was not
+    # saved. Pruning and dry runs need every loaded league-season until the end.
+    finished_seasons = set()
+    finished_states = []
+
+    def release_finished():
+        if not track_claims:
+            for league_season in finished_seasons:
+                resolver.drop(*league_season)
+        finished_seasons.clear()
+        if dry_run:
+            finished_states.clear()
+        elif stats["write_errors"]:
+            if finished_states:
+                logger.warning("Some match writes failed, not saving ingest state.")
+            finished_states.clear()
+        elif finished_states:
+            with profiler.stage("mongo_write"):
+                catalog.flush()
+            with profiler.stage("state_save"):
+                state_col.bulk_write(finished_states, ordered=False)
+            finished_states.clear()
+
+    def flush():
+        if not dry_run:
+            with profiler.stage("mongo_write"):
+                registry.flush()
+        write_match_batch(matches_col, pending, stats, resolver, changes, profiler, None if dry_run else standings)
+        if not dry_run:
+            stats["written"] += len(pending)
+        pending.clear()
+        release_finished()
+
+    known_hashes = {f: known_files.get(file_state_id(folder, f)) for f in json_files}
+    pipeline_start = time.perf_counter()
+
+    for parsed in iter_parsed_files(json_files, known_hashes, workers, streaming):
+        json_file = parsed["file"]
+        if parsed["error"]:
+            profiler.record_file(json_file, "failed", 0, parsed["seconds"], parsed["timings"])
+            stats["failed_files"] += 1
+            logger.error(f"Failed to load JSON file {json_file}: {parsed['error']}")
             continue
+        if parsed["skipped"]:
+            profiler.record_file(json_file, "unchanged", 0, parsed["seconds"], parsed["timings"])
+            stats["skipped_files"] += 1
+            continue
+
+        state_id = file_state_id(folder, json_file)
+        previous = {}
+        if state_id in known_files:
+            with profiler.stage("setup"):
+                previous = (state_col.find_one({"_id": state_id}, {"fixtures": 1}) or {}).get("fixtures", {})
 
-        league_name = data.get("league", "Unknown League")
-        season = data.get("season", "Unknown Season")
-        matchdays = data.get("matchdays", [])
-
-        for md in matchdays:
-            md_name = md.get("matchday", "Unknown Matchday")
-            matches = md.get("matches", [])
-
-            for m in matches:
-                date_str = m.get("date")
-                time_str = m.get("time", "00:00")
-                try:
-                    dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-                except:
-                    dt = None
-
-                result = m.get("result", {})
-                score_home, score_away = None, None
-                if isinstance(result, dict):
-                    full_time = result.get("full_time")
-                    if full_time and '-' in full_time:
-                        try:
-                            score_home, score_away = map(int, full_time.split('-'))
-                        except:
-                            pass
-
-                home_team = m.get("home_team")
-                away_team = m.get("away_team")
-
-                match_doc = {
-                    "date": dt.strftime("%Y-%m-%d") if dt else None,
-                    "time": dt.strftime("%H:%M:%S") if dt else None,
-                    "matchday": md_name,
-                    "season": season,
-                    "is_cancelled": m.get("cancelled", False),
-                    "score_home": score_home,
-                    "score_away": score_away,
-                    "home_team": {"id": hash(home_team) % 10000, "name": home_team},
-                    "away_team": {"id": hash(away_team) % 10000, "name": away_team},
-                    "league": {"id": hash(league_name) % 10000, "name": league_name},
-                }
-
-                query = {
-                    "date": dt.strftime("%Y-%m-%d") if dt else None,
-                    "season": season,
-                    "matchday": md_name,
-                    "league.name": league_name,
-                    "$and": [
-                        {
-                            "$or": [
-                                {"home_team.name": home_team},
-                                {"home_team.name": "N.N."}
-                            ]
-                        },
-                        {
-                            "$or": [
-                                {"away_team.name": away_team},
-                                {"away_team.name": "N.N."}
-                            ]
-                        }
-                    ]
-                }
-
-                existing = matches_col.find_one(query)
-                if existing:
-                    matches_col.update_one({"_id": existing["_id"]}, {"$set": match_doc})
-                    updated += 1
-                else:
-                    matches_col.insert_one(match_doc)
-                    inserted += 1
+        fixtures = {}
+        seasons = set()
+        errors = []
+        for match_doc, digest in _guard_parse_errors(parsed["docs"], errors):
+            stats["parsed"] += 1
+            league_name = match_doc["league"]["name"]
+            profiler.count(league_name, "fixtures")
+            fixtures[match_doc["match_key"]] = digest
+            seasons.add((league_name, match_doc["season"]))
+            if previous.get(match_doc["match_key"]) == digest:
+                stats["unchanged"] += 1
+                profiler.count(league_name, "unchanged")
+                if track_claims:
+                    with profiler.stage("resolve"):
+                        resolver.load(league_name, match_doc["season"])
+                        resolver.resolve(match_doc)
+                continue
+            assign_ids(match_doc, registry)
+            catalog.add(match_doc)
+            calendar.touch(match_doc["date"])
+            pending.append(match_doc)
+            if len(pending) >= batch_size:
+                flush()
+        finished_seasons |= seasons
+        if errors:
+            # Only reachable when streaming; the file state is not saved, so it is retried.
+            profiler.record_file(json_file, "failed", len(fixtures), parsed["seconds"], parsed["timings"])
+            logger.error(f"Failed to parse JSON file {json_file}: {errors[0]}")
+            stats["failed_files"] += 1
+            continue
+        profiler.record_file(json_file, "ingested", len(fixtures), parsed["seconds"], parsed["timings"])
+
+        complete_seasons |= seasons
+        processed_states.add(state_id)
+        finished_states.append(ReplaceOne({"_id": state_id}, {
+            "kind": "file",
+            "path": os.path.relpath(json_file, root),
+            "sha256": parsed["sha256"],
+            "seasons": sorted(seasons, key=str),
+            "fixtures": fixtures,
+            "ingested_at": datetime.now(timezone.utc),
+        }, upsert=True))
+        if not pending:
+            release_finished()
+
+    if pending:
+        flush()
+    if not dry_run:
+        with profiler.stage("mongo_write"):
+            catalog.flush()
+
+    if track_claims:
+        # A league-season is only complete if no file left out of this run contains it.
+        untouched = [d for state_id, d in known_states.items() if state_id not in processed_states]
+        if any("seasons" not in d for d in untouched):
+            logger.warning("Some ingest states predate season tracking; skipping deletions this run.")
+            complete_seasons = set()
+        for d in untouched:
+            complete_seasons -= {tuple(league_season) for league_season in d.get("seasons", [])}
+        stale = stale_fixtures(resolver, complete_seasons)
+        for doc in stale:
+            profiler.count(doc.get("league", {}).get("name"), "deleted")
+        if dry_run:
+            for doc in stale:
+                changes.delete(doc)
+            stats["inserted"], stats["updated"] = len(changes.inserts), len(changes.updates)
+            stats["deleted"] = len(changes.deletes)
+        elif stale:
+            for doc in stale:
+                standings.change(doc, None)
+            with profiler.stage("mongo_write"):
+                standings.save()
+                result = matches_col.delete_many({"_id": {"$in": [doc["_id"] for doc in stale]}})
+            stats["deleted"] = result.deleted_count
+            logger.info(f"Pruned {result.deleted_count} fixtures no longer in the source.")
+            for doc in stale:
+                calendar.touch(doc.get("date"))
+    if not dry_run:
+        with profiler.stage("calendar"):
+            months = calendar.flush(matches_col)
+        if months:
+            logger.info(f"Rebuilt calendar buckets for {months} months.")
+        with profiler.stage("standings"):
+            # Recomputed from the stored matches, so failed writes need no special case.
+            if tables := standings.flush(matches_col):
+                logger.info(f"Recomputed {tables} standings tables.")
+    pipeline_seconds = time.perf_counter() - pipeline_start
+
+    # The revision is saved last and only advanced when every file made it in, otherwise
+    # a failed file would drop out of the next changed-file list.
+    if not dry_run and not stats["write_errors"] and source.revision and not stats["failed_files"]:
+        with profiler.stage("state_save"):
+            state_col.replace_one({"_id": source.state_id}, {
+                "kind": "source",
+                "revision": source.revision,
+                "ingested_at": datetime.now(timezone.utc),
+            }, upsert=True)
+    # Bumped after the writes are done so API caches never tag old data with the new generation.
+    data_changed = not dry_run and (
+        stats["inserted"] + stats["updated"] + stats["deleted"] > 0 or bool(backfilled_dates) or interrupted
+    )
+    if data_changed:
+        with profiler.stage("state_save"):
+            version = bump_data_version(db)
+        logger.info(f"Data generation is now {version['generation']}.")
+    elif not dry_run:
+        clear_data_pending(db)
+    if snapshot_dir and not dry_run and (data_changed or not os.path.exists(os.path.join(snapshot_dir, MANIFEST))):
+        with profiler.stage("snapshots"):
+            generation = (version if data_changed else read_data_version(db))["generation"]
+            write_snapshots(matches_col, snapshot_dir, generation)
 
     # Cleanup
     try:
-        shutil.rmtree(temp_dir, onerror=on_rm_error)
+        source.cleanup()
     except Exception as e:
-        logger.warning(f"Failed to delete temp dir: {e}")
+        logger.warning(f"Failed to clean up source: {e}")
+
+    report = profiler.report(
+        stats,
+        source=source.state_id,
+        revision=source.revision,
+        options={"batch_size": batch_size, "workers": workers, "streaming": streaming, "dry_run": dry_run,
+                 "prune": prune, "force": force, "min_season_start": min_season_start,
+                 "snapshot_dir": snapshot_dir},
+    )
+    parse_seconds = sum(profiler.stages[name] for name in PARSE_STAGES)
+    write_seconds = profiler.stages["resolve"] + profiler.stages["mongo_write"]
+
+    logger.info(f"Update completed in {report['duration_seconds']}s")
+    logger.info(f"Inserted: {stats['inserted']}, Updated: {stats['updated']}, Unchanged: {stats['unchanged']}, "
+                f"Deleted: {stats['deleted']}")
+    logger.info(f"Skipped unchanged files: {stats['skipped_files']}, failed files: {stats['failed_files']}")
+    logger.info(
+        f"Parse stage: {stats['parsed']} fixtures in {parse_seconds:.2f}s worker time "
+        f"({rate(stats['parsed'], parse_seconds)} fixtures/s per worker, {workers} workers)"
+    )
+    logger.info(
+        f"Write stage: {stats['written']} fixtures in {write_seconds:.2f}s "
+        f"({rate(stats['written'], write_seconds)} fixtures/s)"
+    )
+    logger.info(f"Pipeline: {stats['parsed']} fixtures in {pipeline_seconds:.2f}s "
+                f"({rate(stats['parsed'], pipeline_seconds)} fixtures/s)")
+    logger.info("Stage timings: " + ", ".join(f"{name} {seconds}s" for name, seconds in report["stages"].items()))
+    logger.info(f"MongoDB round trips: {report['mongo']['round_trips']} {report['mongo']['commands']}")
+    profiler.finish(report, report_path)
 
-    logger.info(f"Update completed in {round(time.time() - start_time, 2)}s")
-    logger.info(f"Inserted: {inserted}, Updated: {updated}")
+    if dry_run:
+        diff = changes.as_dict()
+        logger.info(f"Dry run diff: {diff['summary']}")
+        return diff
     return "MongoDB update completed."
@@ -8,6 +8,8 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "football_calendar_backend.setti
 django.setup()
 
 from matches_calendar.models import Match, Team, League
+from matches_calendar.resolver import PLACEHOLDER_TEAM
+from utils.mongo import DB_NAME
 from django.core.serializers.json import DjangoJSONEncoder
 import json
 
@@ -23,7 +25,7 @@ print(f"Connettendosi a MongoDB URI: {MONGO_URI}")
 
 # Connessione a MongoDB
 client = MongoClient(MONGO_URI)
-db = client["football_db"]
+db = client[DB_NAME]
 matches_collection = db["matches"]
 teams_collection = db["teams"]
 leagues_collection = db["leagues"]
@@ -51,6 +53,7 @@ def serialize_match(match):
             "id": match.league.id if match.league else None,
             "name": match.league.name if match.league else None,
         },
+        "team_ids": [team.id for team in (match.home_team, match.away_team) if team.name != PLACEHOLDER_TEAM],
     }
 
 def serialize_team(team):
@@ -75,6 +78,8 @@ bulk_matches = [
 if bulk_matches:
     matches_collection.bulk_write(bulk_matches)
     print(f"Migrati {len(bulk_matches)} match su MongoDB.")
+    # I match migrati hanno gli id di Postgres: la prossima sincronizzazione li riscrive con quelli del registro.
+    db["ingest_state"].delete_one({"_id": "registry_ids"})
 
 # MIGRAZIONE TEAM
 teams = Team.objects.all()
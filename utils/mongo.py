@@ -1,30 +1,310 @@
-from pymongo import MongoClient
+import asyncio
 import os
+import threading
+from datetime import datetime, timezone
 
-MONGO_URI = os.getenv("MONGODB_URI")
-client = MongoClient(MONGO_URI)
+import pymongo
+from bson import ObjectId
+from pymongo import ASCENDING, AsyncMongoClient, MongoClient, IndexModel, ReturnDocument
 
-# Nome del database e della collezione
-db = client["football_db"]
-matches_collection = db["matches"]
+# Nome del database e della collezione. Lo stesso per API e ingestione (matches_calendar/utils.py):
+# versione dei dati, catalogo, calendario e classifiche sono stato condiviso tra le due.
+DB_NAME = os.getenv("MONGO_DB_NAME", "football_db")
+MATCHES_COLLECTION = "matches"
 
-# Funzione per creare gli indici
-def create_indexes():
-    # Indice su "date"
-    matches_collection.create_index([("date", 1)])  # Ordine crescente
+# Il client viene creato al primo utilizzo: importare questo modulo non apre connessioni
+# (né risolve il DNS di un URI mongodb+srv), così il cold start non paga Mongo finché non serve.
+_client = None
+_client_lock = threading.Lock()
 
-    # Indice combinato su "home_team", "away_team" e "league"
-    matches_collection.create_index([("home_team", 1), ("away_team", 1), ("league", 1)])
 
-    # Indici per i singoli team
-    matches_collection.create_index([("home_team", 1)])
-    matches_collection.create_index([("away_team", 1)])
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(os.getenv("MONGODB_URI"), tz_aware=True)
+    return _client
 
-    # Indice per la lega
-    matches_collection.create_index([("league", 1)])
 
-    # Puoi aggiungere altri indici se necessario
-    print("Indexes created successfully.")
+def get_db():
+    return get_client()[DB_NAME]
 
-# Creazione degli indici all'avvio
-create_indexes()
+
+def get_collection(name=MATCHES_COLLECTION):
+    return get_db()[name]
+
+
+def ping(timeout=5):
+    """Apre la connessione (usato dal warm-up all'avvio), con un timeout breve."""
+    with pymongo.timeout(timeout):
+        get_client().admin.command("ping")
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# Client async per le viste async sotto ASGI. I suoi socket appartengono all'event loop su cui
+# è stato creato, quindi c'è un client per loop. Ognuno si chiude sul suo loop quando questo
+# finisce: un generatore async avviato sul loop viene chiuso da shutdown_asyncgens() (chiamato da
+# asyncio.run, da asgiref e dai server ASGI), e il suo finally chiude il client.
+_async_clients = {}
+
+
+async def _close_with_loop(loop, client):
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await client.close()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncMongoClient(os.getenv("MONGODB_URI"), tz_aware=True)
+        closer = _close_with_loop(loop, client)
+        # Il primo passo del generatore lo registra sul loop (hook firstiter di asyncio).
+        started = loop.create_task(closer.__anext__())
+        entry = _async_clients[loop] = (client, closer, started)
+    return entry[0]
+
+
+def get_async_db():
+    return get_async_client()[DB_NAME]
+
+
+def get_async_collection(name=MATCHES_COLLECTION):
+    return get_async_db()[name]
+
+
+async def aping(timeout=5):
+    with pymongo.timeout(timeout):
+        await get_async_client().admin.command("ping")
+
+
+async def close_async_client():
+    """Chiude il client del loop corrente (allo shutdown del server)."""
+    entry = _async_clients.get(asyncio.get_running_loop())
+    if entry is not None:
+        _, closer, started = entry
+        await started
+        await closer.aclose()
+
+
+# Versione dei dati: l'ingestione incrementa "generation" a ogni sync che scrive qualcosa,
+# le API la usano per invalidare cache e ETag.
+META_COLLECTION = "meta"
+DATA_VERSION_ID = "data_version"
+
+
+def bump_data_version(db):
+    return db[META_COLLECTION].find_one_and_update(
+        {"_id": DATA_VERSION_ID},
+        {"$inc": {"generation": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}, "$unset": {"pending": ""}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+# "pending" segna un sync in corso: se resta da un sync interrotto dopo aver scritto, il
+# successivo incrementa comunque la generazione anche se non trova più nulla da scrivere.
+def mark_data_pending(db):
+    """Segna l'inizio delle scritture; True se il sync precedente non è arrivato in fondo."""
+    previous = db[META_COLLECTION].find_one_and_update(
+        {"_id": DATA_VERSION_ID}, {"$set": {"pending": True}}, upsert=True, return_document=ReturnDocument.BEFORE,
+    )
+    return bool((previous or {}).get("pending"))
+
+
+def clear_data_pending(db):
+    db[META_COLLECTION].update_one({"_id": DATA_VERSION_ID}, {"$unset": {"pending": ""}})
+
+
+def read_data_version(db):
+    return db[META_COLLECTION].find_one({"_id": DATA_VERSION_ID}) or {"generation": 0, "updated_at": None}
+
+
+async def aread_data_version(db):
+    return await db[META_COLLECTION].find_one({"_id": DATA_VERSION_ID}) or {"generation": 0, "updated_at": None}
+
+
+def __getattr__(name):
+    # Compatibilità con il vecchio `from utils.mongo import matches_collection`:
+    # funziona ancora, ma crea il client solo in quel momento.
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    if name == "matches_collection":
+        return get_collection()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Ordine stabile delle partite negli endpoint: la paginazione a cursore riparte da (date, time, _id).
+MATCH_ORDER = [("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)]
+# Ordine per orario di inizio in UTC ("kickoff"), usato da /upcoming/.
+KICKOFF_ORDER = [("kickoff", ASCENDING), ("_id", ASCENDING)]
+
+# Indici dichiarati per la collezione "matches", uno per ogni forma di query reale.
+# I nomi sono quelli di default di MongoDB (es. "league.id_1_date_1_time_1__id_1").
+# Ogni indice degli endpoint termina con il loro ordinamento (MATCH_ORDER o KICKOFF_ORDER), così
+# filtro, ordinamento e cursore diventano un'unica scansione di intervallo senza SORT in memoria.
+MATCH_INDEXES = [
+    # all_matches_mongo, filtri per data singola o intervallo
+    {"keys": MATCH_ORDER},
+    # filter_matches_mongo?league=... (+ intervallo di date)
+    {"keys": [("league.id", ASCENDING)] + MATCH_ORDER},
+    # filter_matches_mongo?team=...: team_ids = [casa, trasferta] è un indice multikey, quindi
+    # il calendario di una squadra è una sola scansione ordinata invece di un $or home/away
+    {"keys": [("team_ids", ASCENDING)] + MATCH_ORDER},
+    # /upcoming/ (anche per lega o squadra): prossime N partite da adesso, un intervallo su kickoff
+    {"keys": KICKOFF_ORDER},
+    {"keys": [("league.id", ASCENDING)] + KICKOFF_ORDER},
+    {"keys": [("team_ids", ASCENDING)] + KICKOFF_ORDER},
+    # ingestione: chiave naturale degli upsert e preload per (lega, stagione)
+    {"keys": [("match_key", ASCENDING)],
+     "options": {"unique": True, "partialFilterExpression": {"match_key": {"$exists": True}}}},
+    {"keys": [("league.name", ASCENDING), ("season", ASCENDING)]},
+]
+
+# Collezioni compatte mantenute dall'ingestione (matches_calendar/catalog.py) per /teams-mongo/ e /leagues-mongo/.
+TEAM_INDEXES = [
+    {"keys": [("name", ASCENDING)]},
+    # /teams-mongo/?league=...
+    {"keys": [("leagues", ASCENDING), ("name", ASCENDING)]},
+]
+LEAGUE_INDEXES = [
+    {"keys": [("name", ASCENDING)]},
+]
+# Bucket mensili di /calendar/<yyyy>-<mm>/ (matches_calendar/calendar_buckets.py), letti per _id.
+CALENDAR_INDEXES = [
+    {"keys": [("month", ASCENDING)]},
+]
+# Classifiche per (lega, stagione) di /standings/ (matches_calendar/standings.py); l'ultima stagione di una lega.
+STANDINGS_INDEXES = [
+    {"keys": [("league.id", ASCENDING), ("season", ASCENDING)]},
+]
+COLLECTION_INDEXES = {
+    MATCHES_COLLECTION: MATCH_INDEXES,
+    "teams": TEAM_INDEXES,
+    "leagues": LEAGUE_INDEXES,
+    "calendar": CALENDAR_INDEXES,
+    "standings": STANDINGS_INDEXES,
+}
+
+# Query rappresentative degli endpoint, verificate con explain(): (filtro, ordinamento)
+_AFTER_CURSOR = {"$and": [{"date": {"$gte": "2025-01-01"}}, {"$or": [
+    {"date": {"$gt": "2025-01-01"}},
+    {"date": "2025-01-01", "time": {"$gt": "18:00"}},
+    {"date": "2025-01-01", "time": "18:00", "_id": {"$gt": ObjectId("000000000000000000000000")}},
+]}]}
+ENDPOINT_QUERIES = {
+    "all_matches_mongo": ({}, MATCH_ORDER),
+    "all_matches_mongo?cursor": (_AFTER_CURSOR, MATCH_ORDER),
+    "filter_matches_mongo?league": ({"league.id": 1}, MATCH_ORDER),
+    "filter_matches_mongo?league&cursor": ({"$and": [{"league.id": 1}, _AFTER_CURSOR]}, MATCH_ORDER),
+    "filter_matches_mongo?team": ({"team_ids": 1}, MATCH_ORDER),
+    "filter_matches_mongo?team&start_date&end_date": (
+        {"team_ids": 1, "date": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}, MATCH_ORDER
+    ),
+    "filter_matches_mongo?date": ({"date": "2025-01-01"}, MATCH_ORDER),
+    "filter_matches_mongo?league&start_date&end_date": (
+        {"league.id": 1, "date": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}, MATCH_ORDER
+    ),
+    "batch_matches_mongo?teams&leagues": (
+        {"$or": [{"team_ids": {"$in": [1, 2]}}, {"league.id": {"$in": [1]}}]},
+        MATCH_ORDER,
+    ),
+    "upcoming_matches_mongo": (
+        {"kickoff": {"$gte": datetime(2025, 1, 1, tzinfo=timezone.utc), "$lt": datetime(2025, 2, 1, tzinfo=timezone.utc)}},
+        KICKOFF_ORDER,
+    ),
+    "upcoming_matches_mongo?team": (
+        {"team_ids": 1, "kickoff": {"$gte": datetime(2025, 1, 1, tzinfo=timezone.utc)}}, KICKOFF_ORDER
+    ),
+    "ingestion preload": ({"league.name": "Serie A", "season": "2024/25"}, None),
+}
+
+
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def index_name(spec):
+    return "_".join(f"{field}_{direction}" for field, direction in spec["keys"])
+
+
+def _index_definition(keys, options):
+    keys = [(field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys]
+    return keys, {k: options[k] for k in INDEX_OPTIONS if k in options}
+
+
+def sync_indexes(collection, specs=MATCH_INDEXES, drop_unknown=True, dry_run=False):
+    """Riconcilia gli indici della collezione con quelli dichiarati, in modo idempotente.
+
+    Crea gli indici mancanti, ricrea quelli con lo stesso nome ma definizione diversa
+    e (con ``drop_unknown``) rimuove quelli non dichiarati. Restituisce le azioni fatte.
+    """
+    existing = collection.index_information()
+    actions = {"created": [], "recreated": [], "dropped": [], "unchanged": []}
+    to_create = []
+
+    for spec in specs:
+        options = spec.get("options", {})
+        name = index_name(spec)
+        info = existing.get(name)
+        if info is None:
+            actions["created"].append(name)
+            to_create.append(spec)
+            continue
+        if _index_definition(info["key"], info) == _index_definition(spec["keys"], options):
+            actions["unchanged"].append(name)
+            continue
+        actions["recreated"].append(name)
+        to_create.append(spec)
+        if not dry_run:
+            collection.drop_index(name)
+
+    if drop_unknown:
+        declared = {index_name(spec) for spec in specs}
+        for name in existing:
+            if name != "_id_" and name not in declared:
+                actions["dropped"].append(name)
+                if not dry_run:
+                    collection.drop_index(name)
+
+    if to_create and not dry_run:
+        collection.create_indexes([
+            IndexModel(spec["keys"], name=index_name(spec), **spec.get("options", {})) for spec in to_create
+        ])
+    return actions
+
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    for child in plan.get("inputStages", []) + [plan.get("inputStage")] + [plan.get("queryPlan")]:
+        if child:
+            stages.extend(_plan_stages(child))
+    return [stage for stage in stages if stage]
+
+
+def explain_endpoint_queries(collection, queries=ENDPOINT_QUERIES):
+    """Esegue explain() per ogni query degli endpoint; ``ok`` è vero se usa solo IXSCAN."""
+    results = {}
+    for endpoint, (query, sort) in queries.items():
+        cursor = collection.find(query, {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(1000).explain()["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        results[endpoint] = {
+            "ok": "IXSCAN" in stages and "COLLSCAN" not in stages,
+            "stages": stages,
+        }
+    return results